@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, g, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, g, session, send_file, current_app, stream_template
 from werkzeug.exceptions import BadRequest
 import sqlite3
 <<<<<<< Updated upstream
@@ -7,11 +7,28 @@ from datetime import datetime, timedelta
 from datetime import datetime
 >>>>>>> Stashed changes
 import os
+import re
+import threading
+import time
+import atexit
 import traceback
-from functools import wraps
+from functools import wraps, lru_cache
 import logging
-from logging.handlers import TimedRotatingFileHandler
 import json
+from utils.pagination import KeysetPager
+from utils import lending_engine
+from utils.lending_engine import LendingError, LendingConflict
+from utils import stock_ledger
+from utils import jobs
+from utils import metrics
+from utils import sql_profiler
+from utils import logging_setup
+from utils import audit
+from utils import cache_generations
+
+# Fester Name statt __name__, damit INVENTAR_LOG_LEVELS=app=DEBUG auch greift,
+# wenn app.py direkt gestartet wird
+logger = logging.getLogger('app')
 <<<<<<< Updated upstream
 import sys
 import subprocess
@@ -36,20 +53,20 @@ def install_required_packages():
     
     for package, pip_name in required_packages.items():
         if not is_package_installed(package):
-            print(f"Installiere {package}...")
+            logger.info("Installiere %s...", package)
             try:
                 subprocess.check_call([sys.executable, "-m", "pip", "install", pip_name])
-                print(f"{package} wurde erfolgreich installiert!")
+                logger.info("%s wurde erfolgreich installiert!", package)
             except subprocess.CalledProcessError:
-                print(f"Fehler beim Installieren von {package}")
+                logger.error("Fehler beim Installieren von %s", package)
                 sys.exit(1)
 
 # Konstanten für Datenbank
 class DBConfig:
     # Pfad zum src-Verzeichnis
     SRC_DIR = os.path.dirname(os.path.abspath(__file__))
-    # Pfad zum db-Verzeichnis innerhalb von src
-    DB_DIR = os.path.join(SRC_DIR, 'db')
+    # Pfad zum db-Verzeichnis innerhalb von src (überschreibbar, z.B. für Benchmarks)
+    DB_DIR = os.environ.get('INVENTAR_DB_DIR', os.path.join(SRC_DIR, 'db'))
     
     # Stelle sicher, dass der db Ordner existiert
     os.makedirs(DB_DIR, exist_ok=True)
@@ -60,6 +77,10 @@ class DBConfig:
     CONSUMABLES_DB = os.path.join(DB_DIR, 'consumables.db')
     SYSTEM_DB = os.path.join(DB_DIR, 'system_logs.db')
     
+    # Datenbank-Layout: 'split' (fünf Dateien) oder 'single' (eine Datei)
+    DB_LAYOUT = os.environ.get('INVENTAR_DB_LAYOUT', 'split')
+    SINGLE_DB = os.path.join(DB_DIR, 'inventar.db')
+    
     # Schema Definitionen
     SCHEMAS = {
         WORKERS_DB: {
@@ -164,7 +185,9 @@ class DBConfig:
                     status TEXT DEFAULT 'Verfügbar',
                     mindestbestand INTEGER DEFAULT 0,
                     aktueller_bestand INTEGER DEFAULT 0,
-                    einheit TEXT DEFAULT 'Stück'
+                    einheit TEXT DEFAULT 'Stück',
+                    stock_version INTEGER DEFAULT 0,
+                    last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
                 );
             ''',
             'deleted_consumables': '''
@@ -180,6 +203,38 @@ class DBConfig:
                     deleted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                     deleted_by TEXT
                 );
+            ''',
+            'consumables_history': '''
+                CREATE TABLE IF NOT EXISTS consumables_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    consumable_barcode TEXT NOT NULL,
+                    worker_barcode TEXT,
+                    action TEXT NOT NULL,
+                    amount INTEGER NOT NULL,
+                    old_stock INTEGER NOT NULL,
+                    new_stock INTEGER NOT NULL,
+                    changed_by TEXT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (consumable_barcode) REFERENCES consumables(barcode)
+                );
+            ''',
+            'stock_movements': '''
+                CREATE TABLE IF NOT EXISTS stock_movements (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    consumable_barcode TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    delta INTEGER NOT NULL,
+                    worker_barcode TEXT,
+                    changed_by TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+            ''',
+            'stock_snapshots': '''
+                CREATE TABLE IF NOT EXISTS stock_snapshots (
+                    consumable_barcode TEXT NOT NULL,
+                    snapshot_date DATE NOT NULL,
+                    stock INTEGER NOT NULL
+                );
             '''
         },
         SYSTEM_DB: {
@@ -194,6 +249,65 @@ class DBConfig:
                     item_type TEXT,
                     details TEXT
                 );
+            ''',
+            'cache_generations': '''
+                CREATE TABLE IF NOT EXISTS cache_generations (
+                    name TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL DEFAULT 0
+                );
+            ''',
+            'jobs': '''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    progress INTEGER DEFAULT 0,
+                    message TEXT,
+                    result_path TEXT,
+                    result_name TEXT,
+                    mimetype TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_by TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    started_at DATETIME,
+                    heartbeat_at DATETIME,
+                    finished_at DATETIME,
+                    expires_at DATETIME
+                );
+            ''',
+            'request_metrics': '''
+                CREATE TABLE IF NOT EXISTS request_metrics (
+                    endpoint TEXT NOT NULL,
+                    method TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    le TEXT NOT NULL,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    duration_seconds REAL NOT NULL DEFAULT 0,
+                    db_seconds REAL NOT NULL DEFAULT 0,
+                    db_queries INTEGER NOT NULL DEFAULT 0
+                );
+            ''',
+            'sql_profile': '''
+                CREATE TABLE IF NOT EXISTS sql_profile (
+                    endpoint TEXT NOT NULL,
+                    statement TEXT NOT NULL,
+                    calls INTEGER NOT NULL DEFAULT 0,
+                    total_seconds REAL NOT NULL DEFAULT 0,
+                    max_seconds REAL NOT NULL DEFAULT 0,
+                    rows INTEGER NOT NULL DEFAULT 0,
+                    slow_calls INTEGER NOT NULL DEFAULT 0,
+                    plan TEXT,
+                    last_seen DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+            ''',
+            'system_logs_daily': '''
+                CREATE TABLE IF NOT EXISTS system_logs_daily (
+                    day DATE NOT NULL,
+                    action_type TEXT NOT NULL,
+                    events INTEGER NOT NULL DEFAULT 0
+                );
             '''
         }
     }
@@ -202,20 +316,20 @@ class DBConfig:
     def init_database(cls, db_path):
         """Initialisiert eine einzelne Datenbank mit allen ihren Tabellen"""
         try:
-            with sqlite3.connect(db_path) as conn:
+            with sqlite3.connect(cls.resolve(db_path)) as conn:
                 for table_name, schema in cls.SCHEMAS[db_path].items():
                     conn.execute(schema)
                 conn.commit()
             return True
         except Exception as e:
-            logging.error(f"Fehler bei der Initialisierung von {db_path}: {str(e)}")
+            logger.error(f"Fehler bei der Initialisierung von {db_path}: {str(e)}")
             return False
 
     @classmethod
     def verify_database_structure(cls, db_path):
         """Überprüft und aktualisiert die Datenbankstruktur"""
         try:
-            with sqlite3.connect(db_path) as conn:
+            with sqlite3.connect(cls.resolve(db_path)) as conn:
                 # Hole existierende Tabellen
                 existing_tables = conn.execute(
                     "SELECT name FROM sqlite_master WHERE type='table'"
@@ -225,7 +339,7 @@ class DBConfig:
                 # Überprüfe und erstelle fehlende Tabellen
                 for table_name, schema in cls.SCHEMAS[db_path].items():
                     if table_name not in existing_tables:
-                        logging.info(f"Erstelle fehlende Tabelle: {table_name}")
+                        logger.info(f"Erstelle fehlende Tabelle: {table_name}")
                         conn.execute(schema)
 
 =======
@@ -236,8 +350,8 @@ import sys
 class DBConfig:
     # Pfad zum src-Verzeichnis
     SRC_DIR = os.path.dirname(os.path.abspath(__file__))
-    # Pfad zum db-Verzeichnis innerhalb von src
-    DB_DIR = os.path.join(SRC_DIR, 'db')
+    # Pfad zum db-Verzeichnis innerhalb von src (überschreibbar, z.B. für Benchmarks)
+    DB_DIR = os.environ.get('INVENTAR_DB_DIR', os.path.join(SRC_DIR, 'db'))
     
     # Stelle sicher, dass der db Ordner existiert
     os.makedirs(DB_DIR, exist_ok=True)
@@ -248,6 +362,10 @@ class DBConfig:
     CONSUMABLES_DB = os.path.join(DB_DIR, 'consumables.db')
     SYSTEM_DB = os.path.join(DB_DIR, 'system_logs.db')
     
+    # Datenbank-Layout: 'split' (fünf Dateien) oder 'single' (eine Datei)
+    DB_LAYOUT = os.environ.get('INVENTAR_DB_LAYOUT', 'split')
+    SINGLE_DB = os.path.join(DB_DIR, 'inventar.db')
+    
     # Schema Definitionen
     SCHEMAS = {
         WORKERS_DB: {
@@ -352,7 +470,9 @@ class DBConfig:
                     status TEXT DEFAULT 'Verfügbar',
                     mindestbestand INTEGER DEFAULT 0,
                     aktueller_bestand INTEGER DEFAULT 0,
-                    einheit TEXT DEFAULT 'Stück'
+                    einheit TEXT DEFAULT 'Stück',
+                    stock_version INTEGER DEFAULT 0,
+                    last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
                 );
             ''',
             'deleted_consumables': '''
@@ -368,6 +488,38 @@ class DBConfig:
                     deleted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                     deleted_by TEXT
                 );
+            ''',
+            'consumables_history': '''
+                CREATE TABLE IF NOT EXISTS consumables_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    consumable_barcode TEXT NOT NULL,
+                    worker_barcode TEXT,
+                    action TEXT NOT NULL,
+                    amount INTEGER NOT NULL,
+                    old_stock INTEGER NOT NULL,
+                    new_stock INTEGER NOT NULL,
+                    changed_by TEXT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (consumable_barcode) REFERENCES consumables(barcode)
+                );
+            ''',
+            'stock_movements': '''
+                CREATE TABLE IF NOT EXISTS stock_movements (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    consumable_barcode TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    delta INTEGER NOT NULL,
+                    worker_barcode TEXT,
+                    changed_by TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+            ''',
+            'stock_snapshots': '''
+                CREATE TABLE IF NOT EXISTS stock_snapshots (
+                    consumable_barcode TEXT NOT NULL,
+                    snapshot_date DATE NOT NULL,
+                    stock INTEGER NOT NULL
+                );
             '''
         },
         SYSTEM_DB: {
@@ -382,6 +534,65 @@ class DBConfig:
                     item_type TEXT,
                     details TEXT
                 );
+            ''',
+            'cache_generations': '''
+                CREATE TABLE IF NOT EXISTS cache_generations (
+                    name TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL DEFAULT 0
+                );
+            ''',
+            'jobs': '''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    progress INTEGER DEFAULT 0,
+                    message TEXT,
+                    result_path TEXT,
+                    result_name TEXT,
+                    mimetype TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_by TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    started_at DATETIME,
+                    heartbeat_at DATETIME,
+                    finished_at DATETIME,
+                    expires_at DATETIME
+                );
+            ''',
+            'request_metrics': '''
+                CREATE TABLE IF NOT EXISTS request_metrics (
+                    endpoint TEXT NOT NULL,
+                    method TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    le TEXT NOT NULL,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    duration_seconds REAL NOT NULL DEFAULT 0,
+                    db_seconds REAL NOT NULL DEFAULT 0,
+                    db_queries INTEGER NOT NULL DEFAULT 0
+                );
+            ''',
+            'sql_profile': '''
+                CREATE TABLE IF NOT EXISTS sql_profile (
+                    endpoint TEXT NOT NULL,
+                    statement TEXT NOT NULL,
+                    calls INTEGER NOT NULL DEFAULT 0,
+                    total_seconds REAL NOT NULL DEFAULT 0,
+                    max_seconds REAL NOT NULL DEFAULT 0,
+                    rows INTEGER NOT NULL DEFAULT 0,
+                    slow_calls INTEGER NOT NULL DEFAULT 0,
+                    plan TEXT,
+                    last_seen DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+            ''',
+            'system_logs_daily': '''
+                CREATE TABLE IF NOT EXISTS system_logs_daily (
+                    day DATE NOT NULL,
+                    action_type TEXT NOT NULL,
+                    events INTEGER NOT NULL DEFAULT 0
+                );
             '''
         }
     }
@@ -390,20 +601,20 @@ class DBConfig:
     def init_database(cls, db_path):
         """Initialisiert eine einzelne Datenbank mit allen ihren Tabellen"""
         try:
-            with sqlite3.connect(db_path) as conn:
+            with sqlite3.connect(cls.resolve(db_path)) as conn:
                 for table_name, schema in cls.SCHEMAS[db_path].items():
                     conn.execute(schema)
                 conn.commit()
             return True
         except Exception as e:
-            logging.error(f"Fehler bei der Initialisierung von {db_path}: {str(e)}")
+            logger.error(f"Fehler bei der Initialisierung von {db_path}: {str(e)}")
             return False
 
     @classmethod
     def verify_database_structure(cls, db_path):
         """Überprüft und aktualisiert die Datenbankstruktur"""
         try:
-            with sqlite3.connect(db_path) as conn:
+            with sqlite3.connect(cls.resolve(db_path)) as conn:
                 # Hole existierende Tabellen
                 existing_tables = conn.execute(
                     "SELECT name FROM sqlite_master WHERE type='table'"
@@ -413,7 +624,7 @@ class DBConfig:
                 # Überprüfe und erstelle fehlende Tabellen
                 for table_name, schema in cls.SCHEMAS[db_path].items():
                     if table_name not in existing_tables:
-                        logging.info(f"Erstelle fehlende Tabelle: {table_name}")
+                        logger.info(f"Erstelle fehlende Tabelle: {table_name}")
                         conn.execute(schema)
 
 >>>>>>> Stashed changes
@@ -439,14 +650,440 @@ class DBConfig:
 
                         # Füge fehlende Spalten hinzu
                         for col in schema_columns - existing_columns:
-                            logging.info(f"Füge fehlende Spalte hinzu: {table_name}.{col}")
+                            logger.info(f"Füge fehlende Spalte hinzu: {table_name}.{col}")
                             conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {col}")
 
+                # Lege fehlende Indizes und Dashboard-Zähler an
+                cls.ensure_indexes(conn, db_path)
+                cls.ensure_dashboard_stats(conn, db_path)
+                cls.ensure_search_index(conn, db_path)
+                cls.ensure_stock_ledger(conn, db_path)
+                cls.ensure_audit_rollups(conn, db_path)
+
                 conn.commit()
             return True
         except Exception as e:
-            logging.error(f"Fehler bei der Strukturüberprüfung von {db_path}: {str(e)}")
+            logger.error(f"Fehler bei der Strukturüberprüfung von {db_path}: {str(e)}")
+            return False
+
+    # Verwaltete Indizes je Datenbank: name -> (tabelle, definition)
+    INDEXES = {
+        LENDINGS_DB: {
+            # Historie: je Filter ein Index in Sortierreihenfolge, der alle
+            # Filterspalten enthält - eine Seite liest nur Indexeinträge
+            'idx_lendings_history': ('lendings', '(checkout_time, item_type, worker_barcode, item_barcode)'),
+            'idx_lendings_history_type': ('lendings', '(item_type, checkout_time, worker_barcode, item_barcode)'),
+            'idx_lendings_history_worker': ('lendings', '(worker_barcode, checkout_time, item_type, item_barcode)'),
+            'idx_lendings_history_item': ('lendings', '(item_barcode, checkout_time, item_type, worker_barcode)'),
+            'idx_lendings_return_time': ('lendings', '(return_time)'),
+            # Partielle Indizes nur über offene Ausleihen
+            'idx_lendings_open_item': ('lendings', '(item_barcode) WHERE return_time IS NULL'),
+            'idx_lendings_open_worker': ('lendings', '(worker_barcode) WHERE return_time IS NULL')
+        },
+        TOOLS_DB: {
+            'idx_tools_status_ort_typ': ('tools', '(status, ort, typ)'),
+            'idx_tools_ort': ('tools', '(ort)'),
+            'idx_tools_typ': ('tools', '(typ)'),
+            # Standardsortierung der Listen inkl. Keyset-Spalte barcode
+            'idx_tools_gegenstand': ('tools', '(gegenstand, barcode)'),
+            'idx_tool_status_history_tool': ('tool_status_history', '(tool_barcode, timestamp)')
+        },
+        WORKERS_DB: {
+            'idx_workers_bereich': ('workers', '(bereich)'),
+            'idx_workers_name': ('workers', '(lastname, name, barcode)')
+        },
+        CONSUMABLES_DB: {
+            'idx_consumables_history_item': ('consumables_history', '(consumable_barcode, timestamp)'),
+            'idx_stock_movements_item': ('stock_movements', '(consumable_barcode, created_at)'),
+            'idx_stock_movements_created': ('stock_movements', '(created_at)'),
+            'idx_consumables_ort': ('consumables', '(ort)'),
+            'idx_consumables_typ': ('consumables', '(typ)'),
+            'idx_consumables_bezeichnung': ('consumables', '(bezeichnung, barcode)')
+        },
+        SYSTEM_DB: {
+            'idx_jobs_status': ('jobs', '(status)'),
+            'idx_jobs_expires': ('jobs', '(expires_at)'),
+            'idx_request_metrics_key': ('request_metrics', '(endpoint, method, status, le)'),
+            'idx_sql_profile_key': ('sql_profile', '(endpoint, statement)'),
+            'idx_system_logs_timestamp': ('system_logs', '(timestamp)'),
+            'idx_system_logs_daily_key': ('system_logs_daily', '(day, action_type)')
+        }
+    }
+
+    # Durch andere Indizes abgedeckt; werden beim Start entfernt
+    OBSOLETE_INDEXES = {
+        LENDINGS_DB: ('idx_lendings_item_checkout', 'idx_lendings_worker_checkout',
+                      'idx_lendings_checkout_time')
+    }
+
+    @classmethod
+    def ensure_indexes(cls, conn, db_path):
+        """Legt fehlende Indizes aus INDEXES idempotent an und entfernt überholte"""
+        existing = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'index')"
+        ).fetchall()}
+        for index_name in cls.OBSOLETE_INDEXES.get(db_path, ()):
+            if index_name in existing:
+                logger.info(f"Entferne überholten Index: {index_name}")
+                conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+        created = []
+        for index_name, (table_name, definition) in cls.INDEXES.get(db_path, {}).items():
+            if index_name in existing or table_name not in existing:
+                continue
+            logger.info(f"Erstelle fehlenden Index: {index_name}")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} {definition}")
+            created.append(table_name)
+        for table_name in set(created):
+            conn.execute(f"ANALYZE {table_name}")
+        return created
+
+    # Per Trigger gepflegte Dashboard-Zähler je Datenbank (Trigger können nur
+    # Tabellen der eigenen Datei schreiben): tabelle -> [(name, bedingung)]
+    # {row} wird durch NEW/OLD bzw. beim Neuaufbau durch den Tabellennamen ersetzt
+    DASHBOARD_COUNTERS = {
+        TOOLS_DB: {
+            'tools': [
+                ("'total_tools'", "1"),
+                ("'borrowed_tools'", "{row}.status = 'Ausgeliehen'"),
+                ("'defect_tools'", "{row}.status = 'Defekt'")
+            ],
+            'deleted_tools': [("'deleted_tools'", "1")]
+        },
+        WORKERS_DB: {
+            'workers': [
+                ("'total_workers'", "1"),
+                ("'workers_bereich:' || {row}.bereich", "{row}.bereich IS NOT NULL")
+            ],
+            'deleted_workers': [("'deleted_workers'", "1")]
+        },
+        LENDINGS_DB: {
+            'lendings': [
+                ("'active_lendings'", "{row}.return_time IS NULL"),
+                # Tageszähler nach lokalem Datum (die Spalten sind UTC), gelesen
+                # in admin_panel mit datetime.now(); geänderte Trigger lösen beim
+                # Start einen Neuaufbau aus (ensure_dashboard_stats)
+                ("'checkouts:' || date({row}.checkout_time, 'localtime')", "{row}.checkout_time IS NOT NULL"),
+                ("'returns:' || date({row}.return_time, 'localtime')", "{row}.return_time IS NOT NULL")
+            ]
+        },
+        CONSUMABLES_DB: {
+            'consumables': [
+                ("'total_consumables'", "1"),
+                ("'reorder_consumables'",
+                 "{row}.aktueller_bestand <= {row}.mindestbestand AND {row}.aktueller_bestand > 0"),
+                ("'empty_consumables'", "{row}.aktueller_bestand = 0")
+            ],
+            'deleted_consumables': [("'deleted_consumables'", "1")]
+        }
+    }
+
+    DASHBOARD_STATS_SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS dashboard_stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    '''
+
+    @classmethod
+    def _dashboard_triggers(cls, db_path):
+        """Erzeugt name -> CREATE TRIGGER für alle Zähler einer Datenbank"""
+        def upsert(name, condition, row, sign):
+            return (f"INSERT INTO dashboard_stats (name, value) "
+                    f"SELECT {name.format(row=row)}, {sign}1 WHERE {condition.format(row=row)} "
+                    f"ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;")
+
+        triggers = {}
+        for table_name, counters in cls.DASHBOARD_COUNTERS.get(db_path, {}).items():
+            events = {
+                'insert': [upsert(n, c, 'NEW', '+') for n, c in counters],
+                'delete': [upsert(n, c, 'OLD', '-') for n, c in counters],
+                'update': [upsert(n, c, 'OLD', '-') for n, c in counters] +
+                          [upsert(n, c, 'NEW', '+') for n, c in counters]
+            }
+            for event, statements in events.items():
+                trigger_name = f"trg_dashboard_{table_name}_{event}"
+                body = '\n    '.join(statements)
+                triggers[trigger_name] = (
+                    f"CREATE TRIGGER {trigger_name} AFTER {event.upper()} ON {table_name}\n"
+                    f"BEGIN\n    {body}\nEND"
+                )
+        return triggers
+
+    @classmethod
+    def ensure_dashboard_stats(cls, conn, db_path):
+        """Legt dashboard_stats samt Triggern an; bei fehlenden/veralteten Triggern Neuaufbau"""
+        if db_path not in cls.DASHBOARD_COUNTERS:
+            return False
+        existing = dict(conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_dashboard_%'"
+        ).fetchall())
+        wanted = cls._dashboard_triggers(db_path)
+        if all(existing.get(name) == sql for name, sql in wanted.items()):
             return False
+        logger.info(f"Baue Dashboard-Zähler für {os.path.basename(db_path)} neu auf")
+        cls.rebuild_dashboard_stats(conn, db_path)
+        return True
+
+    @classmethod
+    def rebuild_dashboard_stats(cls, conn, db_path):
+        """Erstellt die Trigger neu und zählt alle Werte aus den Tabellen nach"""
+        tables = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        ).fetchall()}
+        conn.execute(cls.DASHBOARD_STATS_SCHEMA)
+        counters = cls.DASHBOARD_COUNTERS.get(db_path, {})
+        for trigger_name, sql in cls._dashboard_triggers(db_path).items():
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+            table_name = trigger_name[len('trg_dashboard_'):].rsplit('_', 1)[0]
+            if table_name in tables:
+                conn.execute(sql)
+
+        # Nur die eigenen Zähler löschen - im Ein-Datei-Layout teilen sich alle eine Tabelle
+        for name in (n for entries in counters.values() for n, _ in entries):
+            literal = name.split(' || ')[0]
+            if ' || ' in name:
+                conn.execute(f"DELETE FROM dashboard_stats WHERE name GLOB {literal[:-1]}*'")
+            else:
+                conn.execute(f"DELETE FROM dashboard_stats WHERE name = {literal}")
+        for table_name, entries in counters.items():
+            if table_name not in tables:
+                continue
+            for name, condition in entries:
+                conn.execute(f'''
+                    INSERT INTO dashboard_stats (name, value)
+                    SELECT {name.format(row=table_name)}, COUNT(*) FROM {table_name}
+                    WHERE {condition.format(row=table_name)}
+                    GROUP BY 1
+                    ON CONFLICT(name) DO UPDATE SET value = excluded.value
+                ''')
+        return True
+
+    # Volltextindex je Datenbank: (tabelle, fts-tabelle, spalten). External-Content-
+    # Tabellen über die implizite rowid (die Tabellen haben TEXT-Schlüssel); passt der
+    # Index nach VACUUM oder Kopieren nicht mehr zum Inhalt, baut ensure_search_index
+    # ihn beim Start neu auf
+    SEARCH_INDEXES = {
+        WORKERS_DB: ('workers', 'workers_fts', ['barcode', 'name', 'lastname', 'bereich', 'email']),
+        TOOLS_DB: ('tools', 'tools_fts', ['barcode', 'gegenstand', 'ort', 'typ']),
+        CONSUMABLES_DB: ('consumables', 'consumables_fts', ['barcode', 'bezeichnung', 'ort', 'typ'])
+    }
+
+    @classmethod
+    def _search_index_sql(cls, db_path):
+        """Erzeugt name -> CREATE-Statement für FTS-Tabelle und Sync-Trigger"""
+        table_name, fts_name, columns = cls.SEARCH_INDEXES[db_path]
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f"new.{c}" for c in columns)
+        old_values = ', '.join(f"old.{c}" for c in columns)
+        insert = f"INSERT INTO {fts_name}(rowid, {column_list}) VALUES (new.rowid, {new_values});"
+        delete = (f"INSERT INTO {fts_name}({fts_name}, rowid, {column_list}) "
+                  f"VALUES ('delete', old.rowid, {old_values});")
+        return {
+            fts_name: (
+                f"CREATE VIRTUAL TABLE {fts_name} USING fts5({column_list}, "
+                f"content='{table_name}', content_rowid='rowid', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            ),
+            f"{fts_name}_ai": f"CREATE TRIGGER {fts_name}_ai AFTER INSERT ON {table_name} BEGIN {insert} END",
+            f"{fts_name}_ad": f"CREATE TRIGGER {fts_name}_ad AFTER DELETE ON {table_name} BEGIN {delete} END",
+            f"{fts_name}_au": (
+                f"CREATE TRIGGER {fts_name}_au AFTER UPDATE OF {column_list} ON {table_name} "
+                f"BEGIN {delete} {insert} END"
+            )
+        }
+
+    @classmethod
+    def ensure_search_index(cls, conn, db_path):
+        """Legt Volltextindex und Trigger an; bei Abweichung oder defektem Index neu aufbauen"""
+        if db_path not in cls.SEARCH_INDEXES:
+            return False
+        table_name, fts_name, _ = cls.SEARCH_INDEXES[db_path]
+        wanted = cls._search_index_sql(db_path)
+        existing = dict(conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE name IN (%s)" % ', '.join('?' * len(wanted)),
+            list(wanted)
+        ).fetchall())
+        if existing == wanted:
+            try:
+                # rank=1: prüft auch, ob der Index zum Inhalt der Tabelle passt
+                conn.execute(f"INSERT INTO {fts_name}({fts_name}, rank) VALUES ('integrity-check', 1)")
+                return False
+            except sqlite3.DatabaseError as e:
+                logger.warning(f"Volltextindex {fts_name} passt nicht zur Tabelle, baue neu auf: {str(e)}")
+                conn.execute(f"INSERT INTO {fts_name}({fts_name}) VALUES ('rebuild')")
+                return True
+        if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+        ).fetchone():
+            return False
+        try:
+            logger.info(f"Baue Volltextindex {fts_name} neu auf")
+            for name in wanted:
+                if name != fts_name:
+                    conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(f"DROP TABLE IF EXISTS {fts_name}")
+            for sql in wanted.values():
+                conn.execute(sql)
+            conn.execute(f"INSERT INTO {fts_name}({fts_name}) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError as e:
+            # z.B. SQLite ohne FTS5 - Suche bleibt dann deaktiviert
+            logger.warning(f"Volltextindex {fts_name} nicht verfügbar: {str(e)}")
+            return False
+
+    # Bestandsbuch (utils/stock_ledger.py): stock_movements ist nur anhängbar.
+    # Buchungen über utils/lending_engine schreiben ihre Bewegung selbst und
+    # erhöhen stock_version; alle übrigen Bestandsänderungen erfassen die Trigger.
+    STOCK_LEDGER_TRIGGERS = {
+        'trg_stock_movements_no_update': (
+            "CREATE TRIGGER trg_stock_movements_no_update BEFORE UPDATE ON stock_movements "
+            "BEGIN SELECT RAISE(ABORT, 'stock_movements ist nur anhängbar'); END"
+        ),
+        'trg_stock_movements_no_delete': (
+            "CREATE TRIGGER trg_stock_movements_no_delete BEFORE DELETE ON stock_movements "
+            "BEGIN SELECT RAISE(ABORT, 'stock_movements ist nur anhängbar'); END"
+        ),
+        'trg_consumables_stock_insert': (
+            "CREATE TRIGGER trg_consumables_stock_insert AFTER INSERT ON consumables "
+            "WHEN COALESCE(NEW.aktueller_bestand, 0) != 0 "
+            "BEGIN INSERT INTO stock_movements (consumable_barcode, action, delta) "
+            "VALUES (NEW.barcode, 'opening', NEW.aktueller_bestand); END"
+        ),
+        'trg_consumables_stock_update': (
+            "CREATE TRIGGER trg_consumables_stock_update AFTER UPDATE OF aktueller_bestand ON consumables "
+            "WHEN COALESCE(NEW.aktueller_bestand, 0) != COALESCE(OLD.aktueller_bestand, 0) "
+            "AND NEW.stock_version IS OLD.stock_version "
+            "BEGIN INSERT INTO stock_movements (consumable_barcode, action, delta) "
+            "VALUES (NEW.barcode, 'adjust', "
+            "COALESCE(NEW.aktueller_bestand, 0) - COALESCE(OLD.aktueller_bestand, 0)); END"
+        ),
+        'trg_consumables_stock_delete': (
+            "CREATE TRIGGER trg_consumables_stock_delete AFTER DELETE ON consumables "
+            "WHEN COALESCE(OLD.aktueller_bestand, 0) != 0 "
+            "BEGIN INSERT INTO stock_movements (consumable_barcode, action, delta) "
+            "VALUES (OLD.barcode, 'closing', -OLD.aktueller_bestand); END"
+        )
+    }
+
+    @classmethod
+    def ensure_stock_ledger(cls, conn, db_path):
+        """Legt die Trigger des Bestandsbuchs an, befüllt ein leeres Buch und schreibt fällige Snapshots"""
+        if db_path != cls.CONSUMABLES_DB:
+            return False
+        conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_snapshots_item_date
+            ON stock_snapshots (consumable_barcode, snapshot_date)
+        ''')
+        existing = dict(conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN (%s)"
+            % ', '.join('?' * len(cls.STOCK_LEDGER_TRIGGERS)),
+            list(cls.STOCK_LEDGER_TRIGGERS)
+        ).fetchall())
+        for name, sql in cls.STOCK_LEDGER_TRIGGERS.items():
+            if existing.get(name) != sql:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                conn.execute(sql)
+        if not conn.execute("SELECT 1 FROM stock_movements LIMIT 1").fetchone():
+            added = stock_ledger.backfill(conn)
+            logger.info(f"Bestandsbuch aus consumables_history befüllt: {added} Bewegungen")
+        stock_ledger.take_snapshots(conn)
+        return True
+
+    @classmethod
+    def ensure_audit_rollups(cls, conn, db_path):
+        """Befüllt die Tagessummen der Systemlogs einmalig aus vorhandenen Einträgen"""
+        if db_path != cls.SYSTEM_DB:
+            return False
+        if conn.execute("SELECT 1 FROM system_logs_daily LIMIT 1").fetchone():
+            return True
+        added = conn.execute('''
+            INSERT INTO system_logs_daily (day, action_type, events)
+            SELECT date(timestamp), action_type, COUNT(*)
+            FROM system_logs
+            GROUP BY date(timestamp), action_type
+        ''').rowcount
+        if added > 0:
+            logger.info(f"Tagessummen der Systemlogs befüllt: {added} Einträge")
+        return True
+
+    @classmethod
+    def is_single_layout(cls):
+        return cls.DB_LAYOUT == 'single'
+
+    @classmethod
+    def resolve(cls, db_path):
+        """Bildet einen logischen Datenbankpfad auf die physische Datei ab"""
+        if cls.is_single_layout() and db_path in cls.SCHEMAS:
+            return cls.SINGLE_DB
+        return db_path
+
+    # Aliase, unter denen die Datenbanken in gepoolte Verbindungen eingehängt werden
+    ATTACH_ALIASES = {
+        LENDINGS_DB: 'lendings_db',
+        TOOLS_DB: 'tools_db',
+        WORKERS_DB: 'workers_db',
+        CONSUMABLES_DB: 'consumables_db'
+    }
+
+    # Verbindungspool
+    POOL_MAX_CONNECTIONS = 20      # Obergrenze pro Prozess
+    POOL_HEALTH_CHECK_INTERVAL = 30  # Sekunden bis zur erneuten Prüfung
+
+    # PRAGMA-Profil, das beim Öffnen jeder Verbindung gesetzt wird
+    PRAGMA_DEFAULTS = {
+        'busy_timeout': 5000,        # ms warten statt "database is locked"
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -8000,         # negativ = KiB
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY'
+    }
+    # Abweichungen pro Datenbank
+    PRAGMA_PROFILES = {
+        LENDINGS_DB: {'cache_size': -16000},
+        SYSTEM_DB: {'cache_size': -2000, 'mmap_size': 0}
+    }
+    # Diese PRAGMAs gelten für die ganze Verbindung, nicht pro Schema
+    CONNECTION_PRAGMAS = ('busy_timeout', 'temp_store')
+
+    @classmethod
+    def pragma_profile(cls, db_path):
+        """Liefert das effektive PRAGMA-Profil einer Datenbank"""
+        profile = dict(cls.PRAGMA_DEFAULTS)
+        profile.update(cls.PRAGMA_PROFILES.get(db_path, {}))
+        return profile
+
+    @classmethod
+    def apply_pragmas(cls, conn, db_path, schema='main'):
+        """Setzt das PRAGMA-Profil auf einer offenen Verbindung"""
+        for name, value in cls.pragma_profile(db_path).items():
+            if name in cls.CONNECTION_PRAGMAS:
+                if schema == 'main':
+                    conn.execute(f"PRAGMA {name} = {value}")
+            else:
+                conn.execute(f"PRAGMA {schema}.{name} = {value}")
+
+    @classmethod
+    def report_pragmas(cls):
+        """Prüft beim Start die effektiven Einstellungen und protokolliert sie"""
+        report = {}
+        for db_path in [cls.WORKERS_DB, cls.TOOLS_DB, cls.LENDINGS_DB,
+                        cls.CONSUMABLES_DB, cls.SYSTEM_DB]:
+            try:
+                conn = DatabaseManager.get_connection(db_path)
+                effective = {
+                    name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+                    for name in cls.pragma_profile(db_path)
+                }
+                report[db_path] = effective
+                logger.info(f"PRAGMA {os.path.basename(db_path)}: {effective}")
+                expected_mode = str(cls.pragma_profile(db_path)['journal_mode']).lower()
+                if str(effective['journal_mode']).lower() != expected_mode:
+                    logger.warning(f"{db_path} läuft im journal_mode "
+                                   f"{effective['journal_mode']} statt {expected_mode}")
+            except sqlite3.Error as e:
+                logger.error(f"PRAGMA-Prüfung für {db_path} fehlgeschlagen: {str(e)}")
+        return report
 
     @classmethod
     def init_all_dbs(cls):
@@ -465,31 +1102,191 @@ class DBConfig:
             ]
             
             for db_path in all_dbs:
-                if not os.path.exists(db_path):
+                if not os.path.exists(cls.resolve(db_path)):
                     if not cls.init_database(db_path):
                         return False
                 if not cls.verify_database_structure(db_path):
                     return False
-                logging.info(f"Datenbank {db_path} erfolgreich initialisiert")
+                logger.info(f"Datenbank {db_path} erfolgreich initialisiert")
                 
             return True
             
         except Exception as e:
-            logging.error(f"Fehler bei der Datenbankinitialisierung: {str(e)}")
+            logger.error(f"Fehler bei der Datenbankinitialisierung: {str(e)}")
             return False
 
+SCHEMA_PREFIX_PATTERN = re.compile(
+    r"\b(?:" + "|".join(DBConfig.ATTACH_ALIASES.values()) + r")\.")
+
+@lru_cache(maxsize=512)
+def strip_schema_prefixes(sql):
+    """Entfernt Schema-Präfixe wie lendings_db. für das Ein-Datei-Layout"""
+    return SCHEMA_PREFIX_PATTERN.sub('', sql)
+
+
+class PooledConnection:
+    """Dünne Hülle um eine gepoolte sqlite3-Verbindung.
+
+    ATTACH/DETACH für bereits eingehängte Datenbanken werden ignoriert und
+    close() gibt die Verbindung nur an den Pool zurück.
+    """
+    ATTACH_PATTERN = re.compile(r"^\s*ATTACH\s+(?:DATABASE\s+)?.+?\s+AS\s+(\w+)\s*;?\s*$",
+                                re.IGNORECASE | re.DOTALL)
+    DETACH_PATTERN = re.compile(r"^\s*DETACH\s+(?:DATABASE\s+)?(\w+)\s*;?\s*$", re.IGNORECASE)
+
+    def __init__(self, conn, db_path, pooled=True, strip_schemas=False):
+        self._conn = conn
+        self.db_path = db_path
+        self.pooled = pooled
+        self.strip_schemas = strip_schemas
+        self.attached = set()
+        self.last_checked = time.monotonic()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return self._conn.__exit__(exc_type, exc_value, tb)
+
+    def execute(self, sql, *args):
+        match = self.ATTACH_PATTERN.match(sql) or self.DETACH_PATTERN.match(sql)
+        if match and match.group(1) in self.attached:
+            # Bereits beim Öffnen eingehängt - nichts zu tun
+            return self._conn.execute('SELECT 1')
+        if self.strip_schemas:
+            sql = strip_schema_prefixes(sql)
+        start = time.perf_counter()
+        try:
+            cursor = self._conn.execute(sql, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.record_query(elapsed)
+        if sql_profiler.ENABLED:
+            return sql_profiler.profiler.track(self._conn, sql, args[0] if args else (), cursor, elapsed)
+        return cursor
+
+    def executemany(self, sql, *args):
+        if self.strip_schemas:
+            sql = strip_schema_prefixes(sql)
+        start = time.perf_counter()
+        try:
+            cursor = self._conn.executemany(sql, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.record_query(elapsed)
+        if sql_profiler.ENABLED:
+            return sql_profiler.profiler.track(self._conn, sql, None, cursor, elapsed)
+        return cursor
+
+    def close(self):
+        if self.pooled:
+            if self._conn.in_transaction:
+                self._conn.rollback()
+        else:
+            self._conn.close()
+
+
 class DatabaseManager:
+    """Thread-sicherer Verbindungspool.
+
+    Jeder Thread erhält pro Datenbank eine langlebige Verbindung, in die die
+    übrigen Datenbanken (DBConfig.ATTACH_ALIASES) bereits eingehängt sind.
+    Im Ein-Datei-Layout teilen sich alle Datenbanken eine Verbindung pro Thread.
+    """
     _instances = {}
-    
+    _lock = threading.Lock()
+
+    @classmethod
+    def _connect(cls, db_path, pooled=True):
+        """Öffnet eine neue Verbindung und hängt die übrigen Datenbanken ein"""
+        physical_path = DBConfig.resolve(db_path)
+        conn = sqlite3.connect(physical_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        DBConfig.apply_pragmas(conn, physical_path)
+        if physical_path != db_path:
+            # Alle Tabellen liegen in main - ATTACH entfällt
+            wrapper = PooledConnection(conn, physical_path, pooled, strip_schemas=True)
+            wrapper.attached.update(DBConfig.ATTACH_ALIASES.values())
+            return wrapper
+        wrapper = PooledConnection(conn, db_path, pooled)
+        for other_path, alias in DBConfig.ATTACH_ALIASES.items():
+            if other_path != db_path:
+                conn.execute(f"ATTACH DATABASE '{other_path}' AS {alias}")
+                DBConfig.apply_pragmas(conn, other_path, alias)
+                wrapper.attached.add(alias)
+        return wrapper
+
+    @classmethod
+    def _is_healthy(cls, wrapper):
+        """Prüft eine länger unbenutzte Verbindung mit einer Minimalabfrage"""
+        now = time.monotonic()
+        if now - wrapper.last_checked < DBConfig.POOL_HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            wrapper._conn.execute('SELECT 1').fetchone()
+            wrapper.last_checked = now
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Verbindung zu {wrapper.db_path} unbrauchbar, baue neu auf: {str(e)}")
+            return False
+
+    @classmethod
+    def _prune_dead_threads(cls):
+        """Schließt Verbindungen von Threads, die nicht mehr laufen"""
+        alive = {t.ident for t in threading.enumerate()}
+        for key in [k for k in cls._instances if k[0] not in alive]:
+            cls._close_quietly(cls._instances.pop(key))
+
+    @staticmethod
+    def _close_quietly(wrapper):
+        try:
+            wrapper._conn.close()
+        except sqlite3.Error:
+            pass
+
     @classmethod
     def get_connection(cls, db_path):
-        """Gibt eine bestehende oder neue DB-Verbindung zurück"""
-        if db_path not in cls._instances:
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
-            cls._instances[db_path] = conn
-        return cls._instances[db_path]
-    
+        """Gibt die Verbindung des aktuellen Threads zurück oder baut sie auf"""
+        key = (threading.get_ident(), DBConfig.resolve(db_path))
+        with cls._lock:
+            wrapper = cls._instances.get(key)
+            if wrapper is not None and not cls._is_healthy(wrapper):
+                cls._close_quietly(cls._instances.pop(key))
+                wrapper = None
+            if wrapper is not None:
+                return wrapper
+
+            if len(cls._instances) >= DBConfig.POOL_MAX_CONNECTIONS:
+                cls._prune_dead_threads()
+            if len(cls._instances) >= DBConfig.POOL_MAX_CONNECTIONS:
+                # Pool voll - Verbindung ohne Pooling ausgeben
+                logger.warning(f"Verbindungspool erschöpft, öffne ungepoolte Verbindung zu {db_path}")
+                return cls._connect(db_path, pooled=False)
+
+            wrapper = cls._connect(db_path)
+            cls._instances[key] = wrapper
+            return wrapper
+
+    @classmethod
+    def release_thread(cls, exception=None):
+        """Setzt die Verbindungen des aktuellen Threads am Ende des App-Kontexts zurück"""
+        ident = threading.get_ident()
+        with cls._lock:
+            wrappers = [w for k, w in cls._instances.items() if k[0] == ident]
+        for wrapper in wrappers:
+            try:
+                if wrapper._conn.in_transaction:
+                    wrapper._conn.rollback()
+            except sqlite3.Error as e:
+                logger.warning(f"Rollback für {wrapper.db_path} fehlgeschlagen: {str(e)}")
+                with cls._lock:
+                    cls._instances.pop((ident, wrapper.db_path), None)
+                cls._close_quietly(wrapper)
+
     @classmethod
     def init_db(cls, db_path):
         """Initialisiert die Datenbank mit dem entsprechenden Schema"""
@@ -501,31 +1298,84 @@ class DatabaseManager:
                 conn.commit()
             return True
         except Exception as e:
-            logging.error(f"Fehler bei DB-Initialisierung {db_path}: {str(e)}")
+            logger.error(f"Fehler bei DB-Initialisierung {db_path}: {str(e)}")
             return False
             
     @classmethod
     def close_all(cls):
         """Schließt alle DB-Verbindungen"""
-        for conn in cls._instances.values():
-            conn.close()
-        cls._instances.clear()
+        with cls._lock:
+            for wrapper in cls._instances.values():
+                cls._close_quietly(wrapper)
+            cls._instances.clear()
+
+atexit.register(DatabaseManager.close_all)
 
 # Konstanten
 ADMIN_PASSWORD = "1234"
 SECRET_KEY = "ein-zufaelliger-string-1234"
+# Ist die Variable gesetzt, verlangt /metrics "Authorization: Bearer <token>"
+METRICS_TOKEN = os.environ.get('INVENTAR_METRICS_TOKEN')
+# So viele Einzeleinträge zeigt die Systemlog-Seite höchstens an
+SYSTEM_LOGS_LIMIT = 500
 
 # Hilfsfunktionen
 def get_db_connection(db_path):
-    """Erstellt eine neue Datenbankverbindung mit verbessertem Error Handling"""
+    """Gibt die gepoolte Datenbankverbindung des aktuellen Threads zurück"""
     try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row  # Setze row_factory für alle Verbindungen
-        return conn
+        return DatabaseManager.get_connection(db_path)
     except Exception as e:
-        logging.error(f"Fehler beim Verbindungsaufbau zu {db_path}: {str(e)}")
+        logger.error(f"Fehler beim Verbindungsaufbau zu {db_path}: {str(e)}")
         raise
 
+class FilterCache:
+    """Prozesslokaler Cache für die Filterwerte der Listen (DISTINCT ort/typ/bereich).
+
+    Einträge verfallen nach TTL Sekunden oder sobald die Generation ihrer
+    Tabelle in cache_generations (System-DB) hochgezählt wurde. So greift
+    eine Invalidierung auch in den anderen Worker-Prozessen.
+    """
+    TTL = 300
+    _entries = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _generation(cls, table_name):
+        try:
+            row = get_db_connection(DBConfig.SYSTEM_DB).execute(
+                'SELECT generation FROM cache_generations WHERE name = ?', (table_name,)
+            ).fetchone()
+            return row[0] if row else 0
+        except sqlite3.Error as e:
+            logger.warning(f"Cache-Generation für {table_name} nicht lesbar: {str(e)}")
+            return None
+
+    @classmethod
+    def distinct_values(cls, db_path, table_name, column):
+        """Sortierte, nicht leere Werte einer Spalte - aus dem Cache, falls gültig"""
+        key = (table_name, column)
+        generation = cls._generation(table_name)
+        now = time.monotonic()
+        with cls._lock:
+            entry = cls._entries.get(key)
+        if entry and generation is not None and entry[1] > now and entry[2] == generation:
+            return entry[0]
+
+        values = [row[0] for row in get_db_connection(db_path).execute(
+            f'SELECT DISTINCT {column} FROM {table_name} WHERE {column} IS NOT NULL ORDER BY {column}'
+        ).fetchall()]
+        with cls._lock:
+            cls._entries[key] = (values, now + cls.TTL, generation)
+        return values
+
+    @classmethod
+    def invalidate(cls, table_name):
+        """Nach dem Commit einer Änderung aufrufen: verwirft die Werte in allen Prozessen"""
+        with cls._lock:
+            for key in [k for k in cls._entries if k[0] == table_name]:
+                del cls._entries[key]
+        cache_generations.bump(get_db_connection(DBConfig.SYSTEM_DB), table_name)
+
 def init_dbs():
     try:
         # Tools (Lager) DB
@@ -541,12 +1391,12 @@ def init_dbs():
                     defect_date DATETIME
                 );
             ''')
-            logging.info(f"Tools-Tabelle in {DBConfig.TOOLS_DB} erstellt")
+            logger.info(f"Tools-Tabelle in {DBConfig.TOOLS_DB} erstellt")
             
         # Rest der Initialisierung...
         
     except Exception as e:
-        logging.error(f"Fehler bei DB-Initialisierung: {str(e)}")
+        logger.error(f"Fehler bei DB-Initialisierung: {str(e)}")
         return False
 
 def init_test_data():
@@ -583,9 +1433,9 @@ def init_test_data():
                 ''', test_workers)
                 
                 conn.commit()
-                logging.info("Mitarbeiter-Testdaten erfolgreich eingefügt")
+                logger.info("Mitarbeiter-Testdaten erfolgreich eingefügt")
             else:
-                print("Mitarbeiter-Testdaten bereits vorhanden")
+                logger.info("Mitarbeiter-Testdaten bereits vorhanden")
 
         # Verbrauchsmaterial-Testdaten
         with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
@@ -608,25 +1458,24 @@ def init_test_data():
                 ''', test_data)
                 
                 conn.commit()
-                print("Verbrauchsmaterial-Testdaten erfolgreich eingefügt")
+                logger.info("Verbrauchsmaterial-Testdaten erfolgreich eingefügt")
             else:
-                print("Verbrauchsmaterial-Testdaten bereits vorhanden")
+                logger.info("Verbrauchsmaterial-Testdaten bereits vorhanden")
             
     except Exception as e:
-        print(f"Fehler beim Erstellen der Testdaten: {str(e)}")
-        traceback.print_exc()
+        logger.error("Fehler beim Erstellen der Testdaten: %s", e, exc_info=True)
 
 # Login-Überprüfung Decorator
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
 <<<<<<< Updated upstream
-        print(f"\n=== ADMIN CHECK ===")
-        print(f"Prüfe Admin-Status für Route: {request.path}")
+        logger.debug("ADMIN CHECK")
+        logger.debug("Prüfe Admin-Status für Route: %s", request.path)
         if not session.get('is_admin'):
-            print("Keine Admin-Berechtigung!")
+            logger.warning("Keine Admin-Berechtigung!")
         else:
-            print("Admin-Berechtigung bestätigt")
+            logger.debug("Admin-Berechtigung bestätigt")
 =======
         if not session.get('is_admin'):
             flash('Bitte melden Sie sich als Administrator an', 'error')
@@ -640,31 +1489,39 @@ def create_app():
     app = Flask(__name__)
     app.config['SECRET_KEY'] = SECRET_KEY
     
+    # Logging: JSON-Zeilen in app.log, Level über INVENTAR_LOG_LEVEL(S)
+    logging_setup.setup_logging()
+    logging_setup.init_app(app)
+    
+    # Gepoolte Verbindungen am Ende jedes App-Kontexts zurücksetzen
+    app.teardown_appcontext(DatabaseManager.release_thread)
+    
     # Initialisiere Datenbanken
     if not DBConfig.init_all_dbs():
-        logging.error("Fehler bei der Datenbankinitialisierung")
+        logger.error("Fehler bei der Datenbankinitialisierung")
         sys.exit(1)
     
-    # Logging Setup
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            TimedRotatingFileHandler(
-                'app.log',
-                when='midnight',
-                interval=1,
-                backupCount=7
-            )
-        ]
-    )
-    
     # Datenbank-Initialisierung
     with app.app_context():
         if not DBConfig.init_all_dbs():
-            logging.error("Kritischer Fehler bei der Datenbank-Initialisierung")
+            logger.error("Kritischer Fehler bei der Datenbank-Initialisierung")
             raise SystemExit(1)
+        # Effektive PRAGMA-Einstellungen protokollieren
+        DBConfig.report_pragmas()
+    
+    # Laufzeitmetriken je Endpoint, summiert über alle Prozesse (/metrics)
+    metrics.init_app(app, metrics.RequestMetrics(DBConfig.resolve(DBConfig.SYSTEM_DB)), METRICS_TOKEN)
+    # SQL-Profiler, nur mit INVENTAR_SQL_PROFILE=1 (/admin/sql_profile)
+    sql_profiler.init_app(app, DBConfig.resolve(DBConfig.SYSTEM_DB))
+    # Systemlogs werden gepuffert und von einem Hintergrund-Thread geschrieben
+    audit.init(DBConfig.resolve(DBConfig.SYSTEM_DB))
+    
+    # Hintergrundjobs; die Worker-Threads starten mit dem ersten Request des
+    # Prozesses, damit Skripte, die app importieren, keine Jobs übernehmen
+    job_queue = jobs.JobQueue(DBConfig.resolve(DBConfig.SYSTEM_DB),
+                              os.path.join(DBConfig.SRC_DIR, 'exports'))
+    app.extensions['jobs'] = job_queue
+    app.before_request(job_queue.start)
     
     return app
 
@@ -673,27 +1530,295 @@ app.debug = True  # Aktiviert Debug-Modus
 
 # Überprüfe, ob der Blueprint bereits registriert ist
 if not any(bp.name == export_bp.name for bp in app.blueprints.values()):
-    logging.info("Registriere Export Blueprint...")
+    logger.info("Registriere Export Blueprint...")
 <<<<<<< Updated upstream
 =======
     app.register_blueprint(export_bp, url_prefix='/export')
-    logging.info(f"Export Blueprint '{export_bp.name}' registriert")
+    logger.info(f"Export Blueprint '{export_bp.name}' registriert")
 >>>>>>> Stashed changes
 
 # Zeige alle registrierten Routen
 @app.before_request
 def init_app():
     if not hasattr(app, '_initialized'):
-        logging.info("Initialisiere App...")
+        logger.info("Initialisiere App...")
         # Hier kommt deine Initialisierungslogik
         app._initialized = True
 
+# Werkzeugliste in einem Durchlauf: offene Ausleihe und letzter Defekt je
+# Werkzeug werden einmal berechnet und gejoint statt pro Zeile abgefragt
+TOOL_LIST_QUERY = '''
+    WITH open_lendings AS (
+        -- SQLite liefert worker_barcode aus der Zeile mit MAX(checkout_time)
+        SELECT item_barcode, worker_barcode, MAX(checkout_time) as checkout_time
+        FROM lendings_db.lendings
+        WHERE return_time IS NULL
+        GROUP BY item_barcode
+    ),
+    last_defects AS (
+        SELECT tool_barcode, MAX(timestamp) as defect_time
+        FROM tool_status_history
+        WHERE new_status = 'Defekt'
+        GROUP BY tool_barcode
+    )
+    SELECT t.*,
+        CASE
+            WHEN t.status = 'Defekt' THEN
+                strftime('%d.%m.%Y %H:%M', COALESCE(d.defect_time, t.defect_date))
+            WHEN t.status = 'Ausgeliehen' THEN
+                strftime('%d.%m.%Y %H:%M', ol.checkout_time)
+            ELSE NULL
+        END as status_date,
+        CASE
+            WHEN t.status = 'Ausgeliehen' THEN w.name || ' ' || w.lastname
+            ELSE NULL
+        END as current_worker
+    FROM tools t
+    LEFT JOIN open_lendings ol ON ol.item_barcode = t.barcode
+    LEFT JOIN workers_db.workers w ON ol.worker_barcode = w.barcode
+    LEFT JOIN last_defects d ON d.tool_barcode = t.barcode
+    WHERE 1=1
+'''
+
+# Sortierungen der Listenansichten für KeysetPager: (Ausdruck, Spalte, NULL-Ersatz)
+TOOL_SORTS = {
+    'gegenstand': [('t.gegenstand', 'gegenstand', None), ('t.barcode', 'barcode', None)],
+    'ort': [('t.ort', 'ort', ''), ('t.gegenstand', 'gegenstand', None), ('t.barcode', 'barcode', None)],
+    'typ': [('t.typ', 'typ', ''), ('t.gegenstand', 'gegenstand', None), ('t.barcode', 'barcode', None)],
+    'status': [('t.status', 'status', ''), ('t.gegenstand', 'gegenstand', None), ('t.barcode', 'barcode', None)],
+    'barcode': [('t.barcode', 'barcode', None)]
+}
+
+WORKER_SORTS = {
+    'lastname': [('w.lastname', 'lastname', None), ('w.name', 'name', None), ('w.barcode', 'barcode', None)],
+    'name': [('w.name', 'name', None), ('w.lastname', 'lastname', None), ('w.barcode', 'barcode', None)],
+    'bereich': [('w.bereich', 'bereich', ''), ('w.lastname', 'lastname', None), ('w.barcode', 'barcode', None)],
+    'barcode': [('w.barcode', 'barcode', None)]
+}
+
+CONSUMABLE_SORTS = {
+    'bezeichnung': [('bezeichnung', 'bezeichnung', None), ('barcode', 'barcode', None)],
+    'ort': [('ort', 'ort', ''), ('bezeichnung', 'bezeichnung', None), ('barcode', 'barcode', None)],
+    'typ': [('typ', 'typ', ''), ('bezeichnung', 'bezeichnung', None), ('barcode', 'barcode', None)],
+    'bestand': [('aktueller_bestand', 'aktueller_bestand', 0), ('barcode', 'barcode', None)],
+    'barcode': [('barcode', 'barcode', None)]
+}
+
+# Ausleihhistorie: die innere Query wählt nur die ids einer Seite und kommt mit
+# den idx_lendings_history*-Indizes aus; Namen werden nur für diese Zeilen gejoint
+HISTORY_PAGE_QUERY = '''
+    SELECT l.id FROM lendings l
+    WHERE 1=1
+'''
+HISTORY_QUERY = '''
+    SELECT l.*,
+        datetime(l.checkout_time, 'localtime') as local_checkout_time,
+        datetime(l.return_time, 'localtime') as local_return_time,
+        w.name, w.lastname,
+        CASE
+            WHEN l.item_type = 'tool' THEN t.gegenstand
+            WHEN l.item_type = 'consumable' THEN c.bezeichnung
+        END as item_name,
+        CASE
+            WHEN l.item_type = 'tool' THEN t.typ
+            WHEN l.item_type = 'consumable' THEN c.typ
+        END as item_type_name
+    FROM ({page}) page
+    JOIN lendings l ON l.id = page.id
+    LEFT JOIN workers_db.workers w ON l.worker_barcode = w.barcode
+    LEFT JOIN tools_db.tools t ON l.item_barcode = t.barcode AND l.item_type = 'tool'
+    LEFT JOIN consumables_db.consumables c ON l.item_barcode = c.barcode AND l.item_type = 'consumable'
+    ORDER BY {order}
+'''
+
+HISTORY_SORTS = {
+    'checkout_time': [('l.checkout_time', 'checkout_time', None), ('l.id', 'id', None)]
+}
+
+def parse_date(value):
+    """Datum aus einem <input type="date"> oder None"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+# Dashboard-Zähler aller Datenbanken; von den Tageszählern nur die heutigen
+DASHBOARD_STATS_QUERY = '''
+    SELECT name, value FROM dashboard_stats
+    UNION ALL
+    SELECT name, value FROM workers_db.dashboard_stats
+    UNION ALL
+    SELECT name, value FROM lendings_db.dashboard_stats
+    WHERE name IN ('active_lendings', ?, ?)
+    UNION ALL
+    SELECT name, value FROM consumables_db.dashboard_stats
+'''
+
+# Volltextsuche je Typ (FTS5, siehe DBConfig.SEARCH_INDEXES); bm25 gewichtet
+# Barcode und Bezeichnung stärker als Ort/Typ/Bereich
+SEARCH_PARTS = {
+    'worker': '''
+        SELECT 'worker' as type, w.barcode, w.name || ' ' || w.lastname as label,
+               w.bereich as detail, bm25(workers_fts, 10.0, 5.0, 5.0, 1.0, 1.0) as rank
+        FROM workers_db.workers_fts
+        JOIN workers_db.workers w ON w.rowid = workers_fts.rowid
+        WHERE workers_fts MATCH :q
+    ''',
+    'tool': '''
+        SELECT 'tool' as type, t.barcode, t.gegenstand as label,
+               t.status as detail, bm25(tools_fts, 10.0, 5.0, 1.0, 1.0) as rank
+        FROM tools_db.tools_fts
+        JOIN tools_db.tools t ON t.rowid = tools_fts.rowid
+        WHERE tools_fts MATCH :q
+    ''',
+    'consumable': '''
+        SELECT 'consumable' as type, c.barcode, c.bezeichnung as label,
+               c.aktueller_bestand || ' ' || c.einheit as detail,
+               bm25(consumables_fts, 10.0, 5.0, 1.0, 1.0) as rank
+        FROM consumables_db.consumables_fts
+        JOIN consumables_db.consumables c ON c.rowid = consumables_fts.rowid
+        WHERE consumables_fts MATCH :q
+    '''
+}
+
+SEARCH_MAX_RESULTS = 50
+
+def build_fts_query(text):
+    """Macht aus einer Benutzereingabe eine FTS5-Abfrage: jedes Wort als Präfix, alle UND-verknüpft"""
+    words = re.findall(r'\w+', text or '')
+    return ' '.join(f'"{word}"*' for word in words)
+
+# Barcode-Auflösung für den Scanner: Präfixe wie in create_test_data.py
+BARCODE_PREFIXES = {'M': 'worker', 'W': 'tool', 'V': 'consumable'}
+
+# Fallback ohne passendes Präfix: je Tabelle ein Primärschlüssel-Lookup
+BARCODE_TYPE_QUERY = '''
+    SELECT 'worker' FROM workers_db.workers WHERE barcode = :barcode
+    UNION ALL
+    SELECT 'tool' FROM tools_db.tools WHERE barcode = :barcode
+    UNION ALL
+    SELECT 'consumable' FROM consumables_db.consumables WHERE barcode = :barcode
+    LIMIT 1
+'''
+
+RESOLVE_QUERIES = {
+    'worker': '''
+        SELECT w.barcode, w.name, w.lastname, w.bereich, w.email
+        FROM workers_db.workers w
+        WHERE w.barcode = :barcode
+    ''',
+    'tool': '''
+        SELECT t.barcode, t.gegenstand, t.ort, t.typ, t.status,
+               l.worker_barcode as lent_to, w.name || ' ' || w.lastname as lent_to_name,
+               l.checkout_time
+        FROM tools_db.tools t
+        LEFT JOIN lendings_db.lendings l ON l.item_barcode = t.barcode AND l.return_time IS NULL
+        LEFT JOIN workers_db.workers w ON w.barcode = l.worker_barcode
+        WHERE t.barcode = :barcode
+        ORDER BY l.checkout_time DESC
+        LIMIT 1
+    ''',
+    'consumable': '''
+        SELECT c.barcode, c.bezeichnung as gegenstand, c.ort, c.typ, c.status,
+               c.aktueller_bestand as bestand, c.mindestbestand, c.einheit
+        FROM consumables_db.consumables c
+        WHERE c.barcode = :barcode
+    '''
+}
+
+# Offene Ausleihen eines Mitarbeiters (partieller Index idx_lendings_open_worker)
+WORKER_OPEN_LENDINGS_QUERY = '''
+    SELECT l.item_barcode, l.item_type, l.amount, l.checkout_time,
+           COALESCE(t.gegenstand, c.bezeichnung) as gegenstand
+    FROM lendings_db.lendings l
+    LEFT JOIN tools_db.tools t ON t.barcode = l.item_barcode
+    LEFT JOIN consumables_db.consumables c ON c.barcode = l.item_barcode
+    WHERE l.worker_barcode = :barcode AND l.return_time IS NULL
+    ORDER BY l.checkout_time DESC
+'''
+
+def resolve_barcode(conn, barcode):
+    """Ordnet einen Barcode Mitarbeiter/Werkzeug/Material zu und liefert die Scan-Daten"""
+    params = {'barcode': barcode}
+    row = None
+    item_type = BARCODE_PREFIXES.get(barcode[:1].upper())
+    if item_type:
+        row = conn.execute(RESOLVE_QUERIES[item_type], params).fetchone()
+    if row is None:
+        found = conn.execute(BARCODE_TYPE_QUERY, params).fetchone()
+        if found is None:
+            return None
+        item_type = found[0]
+        row = conn.execute(RESOLVE_QUERIES[item_type], params).fetchone()
+
+    result = dict(row)
+    result['type'] = item_type
+    if item_type == 'worker':
+        result['open_lendings'] = [dict(r) for r in conn.execute(WORKER_OPEN_LENDINGS_QUERY, params)]
+    elif item_type == 'tool':
+        result['lent'] = result['lent_to'] is not None
+    return result
+
+def lending_error_response(error):
+    """JSON-Antwort für abgelehnte Ausleihvorgänge (409 bei Konflikt)"""
+    return jsonify({
+        'success': False,
+        'error': str(error),
+        'message': str(error),
+        'conflict': isinstance(error, LendingConflict)
+    }), error.status_code
+
+def audit_event(action_type, description, affected_item=None, item_type=None, details=None):
+    """Schreibt einen Systemlog-Eintrag im Namen des angemeldeten Benutzers (gepuffert)"""
+    audit.log(action_type, description, session.get('username', 'admin'),
+              affected_item, item_type, details)
+
+def job_response(job_id):
+    """Antwort auf das Einreihen eines Hintergrundjobs (202 + Status-URL)"""
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('job_status', job_id=job_id)
+    }), 202
+
+@jobs.handler('barcode_sheets')
+def barcode_sheets_job(job, params):
+    """Etiketten-PDFs für Werkzeuge/Material und Mitarbeiter als ZIP"""
+    import zipfile
+    import tempfile
+    import generate_barcodes
+
+    conn = get_db_connection(DBConfig.TOOLS_DB)
+    items = [dict(row) for row in conn.execute(
+        'SELECT barcode, gegenstand AS name FROM tools ORDER BY gegenstand')]
+    items += [dict(row) for row in conn.execute(
+        'SELECT barcode, bezeichnung AS name FROM consumables_db.consumables ORDER BY bezeichnung')]
+    workers = [dict(row) for row in conn.execute(
+        "SELECT barcode, name || ' ' || lastname AS name FROM workers_db.workers ORDER BY name, lastname")]
+    total = len(items) + len(workers)
+    if not total:
+        raise jobs.JobError('Keine Barcodes vorhanden')
+
+    path = job.output_path('barcodes.zip')
+    with tempfile.TemporaryDirectory() as tmp:
+        template = params.get('template', generate_barcodes.DEFAULT_TEMPLATE)
+        generate_barcodes.create_label_pdf(
+            items, 'werkzeuge_material', 'Werkzeuge und Verbrauchsmaterial', tmp, template,
+            progress=lambda done, _: job.progress(done, total, 'Werkzeuge und Material'))
+        generate_barcodes.create_label_pdf(
+            workers, 'mitarbeiter', 'Mitarbeiter', tmp, template,
+            progress=lambda done, _: job.progress(len(items) + done, total, 'Mitarbeiter'))
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name in sorted(os.listdir(tmp)):
+                archive.write(os.path.join(tmp, name), name)
+    return path, 'barcodes.zip', 'application/zip'
+
 # Routen
 @app.route('/')
 def index():
 <<<<<<< Updated upstream
-    print("\n=== INDEX ROUTE ===")
-    print("Lade Hauptseite...")
+    logger.debug("INDEX ROUTE")
+    logger.debug("Lade Hauptseite...")
     
     try:
         # Filter-Parameter
@@ -701,28 +1826,15 @@ def index():
         filter_ort = request.args.get('filter_ort')
         filter_typ = request.args.get('filter_typ')
         
-        print(f"Filter: Status={filter_status}, Ort={filter_ort}, Typ={filter_typ}")
+        logger.debug("Filter: Status=%s, Ort=%s, Typ=%s", filter_status, filter_ort, filter_typ)
         
         with get_db_connection(DBConfig.TOOLS_DB) as tools_conn:
             # Hole Filter-Optionen
-            orte = [row['ort'] for row in tools_conn.execute(
-                'SELECT DISTINCT ort FROM tools WHERE ort IS NOT NULL ORDER BY ort'
-            ).fetchall()]
-            
-            typen = [row['typ'] for row in tools_conn.execute(
-                'SELECT DISTINCT typ FROM tools WHERE typ IS NOT NULL ORDER BY typ'
-            ).fetchall()]
+            orte = FilterCache.distinct_values(DBConfig.TOOLS_DB, 'tools', 'ort')
+            typen = FilterCache.distinct_values(DBConfig.TOOLS_DB, 'tools', 'typ')
             
             # Basis-Query
-            query = '''
-                SELECT t.*, 
-                       w.name || ' ' || w.lastname as current_worker
-                FROM tools t
-                LEFT JOIN lendings_db.lendings l ON t.barcode = l.item_barcode 
-                    AND l.return_time IS NULL
-                LEFT JOIN workers_db.workers w ON l.worker_barcode = w.barcode
-                WHERE 1=1
-            '''
+            query = TOOL_LIST_QUERY
             params = []
             
             # Filter anwenden
@@ -736,17 +1848,19 @@ def index():
                 query += ' AND t.typ = ?'
                 params.append(filter_typ)
                 
-            query += ' ORDER BY t.gegenstand'
+            pager = KeysetPager.from_request(TOOL_SORTS, 'gegenstand')
+            query, params = pager.apply(query, params)
             
             # Datenbank-Verbindungen
             tools_conn.execute(f"ATTACH DATABASE '{DBConfig.LENDINGS_DB}' AS lendings_db")
             tools_conn.execute(f"ATTACH DATABASE '{DBConfig.WORKERS_DB}' AS workers_db")
             
             # Hauptabfrage ausführen
-            tools = tools_conn.execute(query, params).fetchall()
+            tools = pager.paginate(tools_conn.execute(query, params).fetchall())
             
             return render_template('index.html',
                                  tools=tools,
+                                 pager=pager,
                                  orte=orte,
                                  typen=typen,
                                  filter_status=filter_status,
@@ -754,8 +1868,7 @@ def index():
                                  filter_typ=filter_typ)
                                  
     except Exception as e:
-        print(f"Fehler beim Laden der Hauptseite: {str(e)}")
-        traceback.print_exc()
+        logger.error("Fehler beim Laden der Hauptseite: %s", e, exc_info=True)
         flash('Fehler beim Laden', 'error')
         return render_template('index.html', 
                              tools=[],
@@ -770,56 +1883,23 @@ def index():
             tools_conn.execute(f"ATTACH DATABASE '{DBConfig.LENDINGS_DB}' AS lendings_db")
             tools_conn.execute(f"ATTACH DATABASE '{DBConfig.WORKERS_DB}' AS workers_db")
             
-            query = '''
-                SELECT t.*,
-                    CASE 
-                        WHEN t.status = 'Defekt' THEN (
-                            SELECT strftime('%d.%m.%Y %H:%M', timestamp)
-                            FROM tool_status_history
-                            WHERE tool_barcode = t.barcode
-                            AND status = 'Defekt'
-                            ORDER BY timestamp DESC
-                            LIMIT 1
-                        )
-                        WHEN t.status = 'Ausgeliehen' THEN (
-                            SELECT strftime('%d.%m.%Y %H:%M', l.checkout_time)
-                            FROM lendings_db.lendings l
-                            WHERE l.item_barcode = t.barcode
-                            AND l.return_time IS NULL
-                            ORDER BY l.checkout_time DESC
-                            LIMIT 1
-                        )
-                        ELSE NULL
-                    END as status_date,
-                    CASE 
-                        WHEN t.status = 'Ausgeliehen' THEN (
-                            SELECT w.name || ' ' || w.lastname
-                            FROM lendings_db.lendings l
-                            JOIN workers_db.workers w ON l.worker_barcode = w.barcode
-                            WHERE l.item_barcode = t.barcode
-                            AND l.return_time IS NULL
-                            ORDER BY l.checkout_time DESC
-                            LIMIT 1
-                        )
-                        ELSE NULL
-                    END as current_worker
-                FROM tools t
-            '''
+            query = TOOL_LIST_QUERY
             
             if filter_status:
                 if filter_status == 'ausgeliehen':
-                    query += " WHERE t.status = 'Ausgeliehen'"
+                    query += " AND t.status = 'Ausgeliehen'"
                 elif filter_status == 'defekt':
-                    query += " WHERE t.status = 'Defekt'"
+                    query += " AND t.status = 'Defekt'"
                     
-            query += " ORDER BY t.gegenstand"
+            pager = KeysetPager.from_request(TOOL_SORTS, 'gegenstand')
+            query, params = pager.apply(query, [])
             
-            tools = tools_conn.execute(query).fetchall()
+            tools = pager.paginate(tools_conn.execute(query, params).fetchall())
             
-            return render_template('index.html', tools=tools, active_filter=filter_status)
+            return render_template('index.html', tools=tools, pager=pager, active_filter=filter_status)
             
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler: {str(e)}")
+        logger.error(f"Datenbankfehler: {str(e)}")
         flash('Fehler beim Laden der Werkzeuge', 'error')
         return redirect(url_for('index'))
 >>>>>>> Stashed changes
@@ -828,144 +1908,71 @@ def index():
 @admin_required
 def admin_panel():
     try:
-        stats = {}
-        
-        # Werkzeug-Statistiken
+        # Alle Zähler in einem Lesezugriff (per Trigger gepflegt, siehe DBConfig.DASHBOARD_COUNTERS)
+        # Lokales Datum wie in den Tageszählern der Trigger
+        today = datetime.now().strftime('%Y-%m-%d')
         with get_db_connection(DBConfig.TOOLS_DB) as conn:
-            # Gesamt
-            stats['total_tools'] = conn.execute(
-                'SELECT COUNT(*) FROM tools'
-            ).fetchone()[0]
-            
-            # Ausgeliehen
-            stats['borrowed_tools'] = conn.execute(
-                "SELECT COUNT(*) FROM tools WHERE status = 'Ausgeliehen'"
-            ).fetchone()[0]
-            
-            # Defekt
-            stats['defect_tools'] = conn.execute(
-                "SELECT COUNT(*) FROM tools WHERE status = 'Defekt'"
-            ).fetchone()[0]
-            
-            # Im Papierkorb
-            stats['deleted_tools'] = conn.execute(
-                'SELECT COUNT(*) FROM deleted_tools'
-            ).fetchone()[0]
+            counters = dict(conn.execute(
+                DASHBOARD_STATS_QUERY, (f'checkouts:{today}', f'returns:{today}')
+            ).fetchall())
         
-        # Mitarbeiter-Statistiken
-        with get_db_connection(DBConfig.WORKERS_DB) as conn:
-            # Gesamt
-            stats['total_workers'] = conn.execute(
-                'SELECT COUNT(*) FROM workers'
-            ).fetchone()[0]
-            
-            # Im Papierkorb
-            stats['deleted_workers'] = conn.execute(
-                'SELECT COUNT(*) FROM deleted_workers'
-            ).fetchone()[0]
-            
-            # Nach Bereich
-            stats['workers_by_area'] = conn.execute('''
-                SELECT bereich, COUNT(*) as count 
-                FROM workers 
-                WHERE bereich IS NOT NULL 
-                GROUP BY bereich
-            ''').fetchall()
+        stats = {name: counters.get(name, 0) for name in (
+            'total_tools', 'borrowed_tools', 'defect_tools', 'deleted_tools',
+            'total_workers', 'deleted_workers', 'active_lendings',
+            'total_consumables', 'reorder_consumables', 'empty_consumables',
+            'deleted_consumables'
+        )}
+        stats['todays_lendings'] = counters.get(f'checkouts:{today}', 0)
+        stats['todays_returns'] = counters.get(f'returns:{today}', 0)
         
-        # Ausleih-Statistiken
-        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
-            # Aktive Ausleihen
-            stats['active_lendings'] = conn.execute('''
-                SELECT COUNT(*) 
-                FROM lendings 
-                WHERE return_time IS NULL
-            ''').fetchone()[0]
-            
-            # Ausleihen heute
-            stats['todays_lendings'] = conn.execute('''
-                SELECT COUNT(*) 
-                FROM lendings 
-                WHERE date(checkout_time) = date('now', 'localtime')
-            ''').fetchone()[0]
-            
-            # Rückgaben heute
-            stats['todays_returns'] = conn.execute('''
-                SELECT COUNT(*) 
-                FROM lendings 
-                WHERE date(return_time) = date('now', 'localtime')
-            ''').fetchone()[0]
-        
-        # Verbrauchsmaterial-Statistiken
-        with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
-            # Gesamt
-            stats['total_consumables'] = conn.execute(
-                'SELECT COUNT(*) FROM consumables'
-            ).fetchone()[0]
-            
-            # Nachzubestellen
-            stats['reorder_consumables'] = conn.execute('''
-                SELECT COUNT(*) 
-                FROM consumables 
-                WHERE aktueller_bestand <= mindestbestand 
-                AND aktueller_bestand > 0
-            ''').fetchone()[0]
-            
-            # Leer
-            stats['empty_consumables'] = conn.execute('''
-                SELECT COUNT(*) 
-                FROM consumables 
-                WHERE aktueller_bestand = 0
-            ''').fetchone()[0]
-            
-            # Im Papierkorb
-            stats['deleted_consumables'] = conn.execute(
-                'SELECT COUNT(*) FROM deleted_consumables'
-            ).fetchone()[0]
+        # Mitarbeiter nach Bereich
+        stats['workers_by_area'] = sorted(
+            (name.split(':', 1)[1], count) for name, count in counters.items()
+            if name.startswith('workers_bereich:') and count > 0
+        )
         
         return render_template('admin/dashboard.html', stats=stats)
         
     except Exception as e:
-        logging.error(f"Fehler beim Laden des Dashboards: {str(e)}")
-        traceback.print_exc()
+        logger.error(f"Fehler beim Laden des Dashboards: {str(e)}", exc_info=True)
         flash('Fehler beim Laden des Dashboards', 'error')
         return redirect(url_for('index'))
 
 @app.route('/workers')
 def workers():
 <<<<<<< Updated upstream
-    print("\n=== WORKERS ROUTE ===")
+    logger.debug("WORKERS ROUTE")
     try:
         filter_bereich = request.args.get('filter_bereich')
         is_admin = session.get('is_admin', False)
         
         with get_db_connection(DBConfig.WORKERS_DB) as conn:
             # Hole alle eindeutigen Bereiche für Filter
-            bereiche = [row['bereich'] for row in conn.execute(
-                'SELECT DISTINCT bereich FROM workers WHERE bereich IS NOT NULL ORDER BY bereich'
-            ).fetchall()]
+            bereiche = FilterCache.distinct_values(DBConfig.WORKERS_DB, 'workers', 'bereich')
             
             # Basis-Query
-            query = 'SELECT * FROM workers WHERE 1=1'
+            query = 'SELECT * FROM workers w WHERE 1=1'
             params = []
             
             # Filter anwenden
             if filter_bereich:
-                query += ' AND bereich = ?'
+                query += ' AND w.bereich = ?'
                 params.append(filter_bereich)
                 
-            query += ' ORDER BY lastname, name'
+            pager = KeysetPager.from_request(WORKER_SORTS, 'lastname')
+            query, params = pager.apply(query, params)
             
-            workers = conn.execute(query, params).fetchall()
+            workers = pager.paginate(conn.execute(query, params).fetchall())
             
             return render_template('workers.html',
                                  workers=workers,
+                                 pager=pager,
                                  bereiche=bereiche,
                                  filter_bereich=filter_bereich,
                                  is_admin=is_admin)
                                  
     except Exception as e:
-        print(f"Fehler: {str(e)}")
-        traceback.print_exc()
+        logger.error("Fehler: %s", e, exc_info=True)
         flash('Fehler beim Laden', 'error')
         return render_template('workers.html', 
                              workers=[],
@@ -973,23 +1980,18 @@ def workers():
 
 @app.route('/consumables')
 def consumables():
-    print("\n=== CONSUMABLES ROUTE ===")
+    logger.debug("CONSUMABLES ROUTE")
     try:
         filter_status = request.args.get('filter_status')
         filter_ort = request.args.get('filter_ort')
         filter_typ = request.args.get('filter_typ')
         
-        print(f"Filter: Status={filter_status}, Ort={filter_ort}, Typ={filter_typ}")
+        logger.debug("Filter: Status=%s, Ort=%s, Typ=%s", filter_status, filter_ort, filter_typ)
         
         with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
             # Hole Filter-Optionen
-            orte = [row['ort'] for row in conn.execute(
-                'SELECT DISTINCT ort FROM consumables WHERE ort IS NOT NULL ORDER BY ort'
-            ).fetchall()]
-            
-            typen = [row['typ'] for row in conn.execute(
-                'SELECT DISTINCT typ FROM consumables WHERE typ IS NOT NULL ORDER BY typ'
-            ).fetchall()]
+            orte = FilterCache.distinct_values(DBConfig.CONSUMABLES_DB, 'consumables', 'ort')
+            typen = FilterCache.distinct_values(DBConfig.CONSUMABLES_DB, 'consumables', 'typ')
             
             # Basis-Query
             query = 'SELECT * FROM consumables WHERE 1=1'
@@ -1006,12 +2008,14 @@ def consumables():
                 query += ' AND typ = ?'
                 params.append(filter_typ)
                 
-            query += ' ORDER BY bezeichnung'
+            pager = KeysetPager.from_request(CONSUMABLE_SORTS, 'bezeichnung')
+            query, params = pager.apply(query, params)
             
-            consumables = conn.execute(query, params).fetchall()
+            consumables = pager.paginate(conn.execute(query, params).fetchall())
             
             return render_template('consumables.html',
                                  consumables=consumables,
+                                 pager=pager,
                                  orte=orte,
                                  typen=typen,
                                  filter_status=filter_status,
@@ -1019,8 +2023,7 @@ def consumables():
                                  filter_typ=filter_typ)
                                  
     except Exception as e:
-        print(f"Fehler: {str(e)}")
-        traceback.print_exc()
+        logger.error("Fehler: %s", e, exc_info=True)
         flash('Fehler beim Laden', 'error')
         return render_template('consumables.html', 
                              consumables=[],
@@ -1030,7 +2033,7 @@ def consumables():
 @app.route('/consumables/<barcode>')
 def consumable_details(barcode):
     """Detailansicht eines Verbrauchsmaterials"""
-    print(f"\n=== CONSUMABLE DETAILS für {barcode} ===")
+    logger.debug("CONSUMABLE DETAILS für %s", barcode)
     try:
         with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
 =======
@@ -1048,37 +2051,33 @@ def consumable_details(barcode):
                      WHERE l.worker_barcode = w.barcode 
                      AND l.return_time IS NULL) as active_lendings
                 FROM workers w
+                WHERE 1=1
             '''
             params = []
             
-            where_clauses = []
-            
             if filter_bereich:
-                where_clauses.append('w.bereich = ?')
+                query += ' AND w.bereich = ?'
                 params.append(filter_bereich)
                 
             if filter_status == 'mit_ausleihen':
-                where_clauses.append('active_lendings > 0')
-                
-            if where_clauses:
-                query += ' WHERE ' + ' AND '.join(where_clauses)
+                query += ' AND active_lendings > 0'
                 
-            query += ' ORDER BY w.name'
+            pager = KeysetPager.from_request(WORKER_SORTS, 'name')
+            query, params = pager.apply(query, params)
             
-            workers = conn.execute(query, params).fetchall()
+            workers = pager.paginate(conn.execute(query, params).fetchall())
             
             # Hole alle unique Bereiche für den Filter
-            bereiche = [b[0] for b in conn.execute(
-                'SELECT DISTINCT bereich FROM workers WHERE bereich IS NOT NULL'
-            ).fetchall()]
+            bereiche = FilterCache.distinct_values(DBConfig.WORKERS_DB, 'workers', 'bereich')
             
             return render_template('workers.html', 
                                 workers=workers,
+                                pager=pager,
                                 bereiche=bereiche,
                                 active_filter=filter_bereich or filter_status)
                                 
     except Exception as e:
-        logging.error(f"Fehler beim Laden der Mitarbeiter: {str(e)}")
+        logger.error(f"Fehler beim Laden der Mitarbeiter: {str(e)}")
         flash('Fehler beim Laden der Mitarbeiter', 'error')
         return redirect(url_for('index'))
 
@@ -1108,33 +2107,38 @@ def consumables():
                         ELSE 'Verfügbar'
                     END as status
                 FROM consumables
+                WHERE 1=1
             '''
+            params = []
             
             if filter_status:
-                query += ' WHERE status = ?'
-                consumables = conn.execute(query, (filter_status,)).fetchall()
-            else:
-                consumables = conn.execute(query).fetchall()
+                query += ' AND status = ?'
+                params.append(filter_status)
+            
+            pager = KeysetPager.from_request(CONSUMABLE_SORTS, 'bezeichnung')
+            query, params = pager.apply(query, params)
+            consumables = pager.paginate(conn.execute(query, params).fetchall())
             
             # Hole unique Orte und Typen für Filter
-            orte = [row[0] for row in conn.execute('SELECT DISTINCT ort FROM consumables WHERE ort IS NOT NULL').fetchall()]
-            typen = [row[0] for row in conn.execute('SELECT DISTINCT typ FROM consumables WHERE typ IS NOT NULL').fetchall()]
+            orte = FilterCache.distinct_values(DBConfig.CONSUMABLES_DB, 'consumables', 'ort')
+            typen = FilterCache.distinct_values(DBConfig.CONSUMABLES_DB, 'consumables', 'typ')
             
         return render_template('consumables.html', 
                              consumables=consumables,
+                             pager=pager,
                              orte=orte,
                              typen=typen,
                              active_filter=filter_status)
                              
     except Exception as e:
-        logging.error(f"Fehler beim Laden der Verbrauchsmaterialien: {str(e)}")
-        logging.error(traceback.format_exc())
+        logger.error(f"Fehler beim Laden der Verbrauchsmaterialien: {str(e)}")
+        logger.error(traceback.format_exc())
         flash('Fehler beim Laden der Verbrauchsmaterialien', 'error')
         return redirect(url_for('index'))
 
 @app.route('/consumables/<barcode>')
 def consumable_details(barcode):
-    logging.info(f"Lade Details für Verbrauchsmaterial {barcode}")
+    logger.info(f"Lade Details für Verbrauchsmaterial {barcode}")
     try:
         with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
             conn.execute(f"ATTACH DATABASE '{DBConfig.WORKERS_DB}' AS workers_db")
@@ -1203,12 +2207,11 @@ def consumable_details(barcode):
 <<<<<<< Updated upstream
                                  
     except Exception as e:
-        print(f"FEHLER beim Laden der Details: {str(e)}")
-        print(traceback.format_exc())
+        logger.error("FEHLER beim Laden der Details: %s", e, exc_info=True)
 =======
             
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler in consumable_details: {str(e)}")
+        logger.error(f"Datenbankfehler in consumable_details: {str(e)}")
 >>>>>>> Stashed changes
         flash('Fehler beim Laden der Details', 'error')
         return redirect(url_for('consumables'))
@@ -1218,7 +2221,7 @@ def consumable_details(barcode):
 @admin_required
 def edit_consumable(barcode):
     """Verbrauchsmaterial bearbeiten"""
-    print(f"\n=== EDIT CONSUMABLE für {barcode} ===")
+    logger.debug("EDIT CONSUMABLE für %s", barcode)
     try:
         with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
             if request.method == 'POST':
@@ -1256,6 +2259,8 @@ def edit_consumable(barcode):
                     barcode
                 ))
                 conn.commit()
+                FilterCache.invalidate('consumables')
+                audit_event('UPDATE', f"Verbrauchsmaterial {barcode} bearbeitet", barcode, 'consumable')
                 flash('Verbrauchsmaterial erfolgreich aktualisiert', 'success')
                 return redirect(url_for('consumable_details', barcode=barcode))
             
@@ -1266,7 +2271,7 @@ def edit_consumable(barcode):
             ).fetchone()
 =======
 def edit_consumable(barcode):
-    logging.info(f"Bearbeite Verbrauchsmaterial {barcode}, Methode: {request.method}")
+    logger.info(f"Bearbeite Verbrauchsmaterial {barcode}, Methode: {request.method}")
     try:
         with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
             conn.execute(f"ATTACH DATABASE '{DBConfig.WORKERS_DB}' AS workers_db")
@@ -1295,6 +2300,8 @@ def edit_consumable(barcode):
                 ''', (bezeichnung, typ, ort, mindestbestand, aktueller_bestand, einheit, barcode))
                 
                 conn.commit()
+                FilterCache.invalidate('consumables')
+                audit_event('UPDATE', f"Verbrauchsmaterial {barcode} bearbeitet", barcode, 'consumable')
                 flash('Verbrauchsmaterial erfolgreich aktualisiert', 'success')
                 return redirect(url_for('consumables'))
             
@@ -1314,8 +2321,7 @@ def edit_consumable(barcode):
                                 consumable=dict(consumable))
                                 
     except Exception as e:
-        print(f"FEHLER beim Bearbeiten: {str(e)}")
-        print(traceback.format_exc())
+        logger.error("FEHLER beim Bearbeiten: %s", e, exc_info=True)
         flash('Fehler beim Bearbeiten des Materials', 'error')
 =======
             
@@ -1332,7 +2338,7 @@ def edit_consumable(barcode):
                 ORDER BY l.checkout_time DESC
             ''', (barcode,)).fetchall()
             
-            logging.info(f"Geladene Historie für {barcode}: {lendings}")
+            logger.info(f"Geladene Historie für {barcode}: {lendings}")
             
             # Status berechnen
             if consumable['aktueller_bestand'] == 0:
@@ -1351,7 +2357,7 @@ def edit_consumable(barcode):
                                 is_admin=session.get('is_admin', False))
             
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler in edit_consumable: {str(e)}")
+        logger.error(f"Datenbankfehler in edit_consumable: {str(e)}")
         flash('Fehler beim Laden der Details', 'error')
 >>>>>>> Stashed changes
         return redirect(url_for('consumables'))
@@ -1359,16 +2365,16 @@ def edit_consumable(barcode):
 @app.route('/login', methods=['GET', 'POST'])
 def login():
 <<<<<<< Updated upstream
-    print("\n=== LOGIN ROUTE ===")
-    print(f"Methode: {request.method}")
+    logger.debug("LOGIN ROUTE")
+    logger.debug("Methode: %s", request.method)
     if request.method == 'POST':
-        print("Verarbeite Login-Versuch...")
+        logger.debug("Verarbeite Login-Versuch...")
         password = request.form.get('password')
-        print("Prüfe Passwort...")
+        logger.debug("Prüfe Passwort...")
         if password == ADMIN_PASSWORD:
-            print("Login erfolgreich!")
+            logger.debug("Login erfolgreich!")
 =======
-    logging.info(f"Login-Versuch, Methode: {request.method}")
+    logger.info(f"Login-Versuch, Methode: {request.method}")
     if request.method == 'POST':
         password = request.form.get('password')
         if password == ADMIN_PASSWORD:
@@ -1378,7 +2384,7 @@ def login():
             return redirect(url_for('index'))
         else:
 <<<<<<< Updated upstream
-            print("Login fehlgeschlagen - falsches Passwort")
+            logger.warning("Login fehlgeschlagen - falsches Passwort")
 =======
 >>>>>>> Stashed changes
             flash('Falsches Passwort', 'error')
@@ -1387,12 +2393,12 @@ def login():
 @app.route('/logout')
 def logout():
 <<<<<<< Updated upstream
-    print("\n=== LOGOUT ROUTE ===")
-    print("Entferne Admin-Status aus Session")
+    logger.debug("LOGOUT ROUTE")
+    logger.debug("Entferne Admin-Status aus Session")
     session.pop('is_admin', None)
-    print("Logout erfolgreich")
+    logger.debug("Logout erfolgreich")
 =======
-    logging.info("Benutzer wird abgemeldet")
+    logger.info("Benutzer wird abgemeldet")
     session.pop('is_admin', None)
 >>>>>>> Stashed changes
     flash('Erfolgreich abgemeldet', 'success')
@@ -1402,7 +2408,7 @@ def logout():
 @admin_required
 def add_consumable():
     if request.method == 'POST':
-        logging.info(f"Füge neues Verbrauchsmaterial hinzu: {request.form}")
+        logger.info(f"Füge neues Verbrauchsmaterial hinzu: {request.form}")
         try:
             barcode = request.form.get('barcode')
             bezeichnung = request.form.get('bezeichnung')
@@ -1428,16 +2434,17 @@ def add_consumable():
                 ''', (barcode, bezeichnung, ort, typ, status,
                       mindestbestand, aktueller_bestand, einheit))
                 conn.commit()
+            FilterCache.invalidate('consumables')
                 
+            audit_event('CREATE', f"Verbrauchsmaterial {bezeichnung} angelegt", barcode, 'consumable')
             flash('Verbrauchsmaterial erfolgreich hinzugefügt', 'success')
             return redirect(url_for('consumables'))
             
         except sqlite3.IntegrityError as e:
-            print(f"Integritätsfehler: {str(e)}")
+            logger.warning("Integritätsfehler: %s", e)
             flash('Barcode existiert bereits', 'error')
         except Exception as e:
-            print(f"Fehler beim Hinzufügen: {str(e)}")
-            traceback.print_exc()
+            logger.error("Fehler beim Hinzufügen: %s", e, exc_info=True)
             flash('Fehler beim Hinzufügen des Verbrauchsmaterials', 'error')
             
     return render_template('add_consumable.html')
@@ -1446,7 +2453,7 @@ def add_consumable():
 @app.route('/consumable/delete/<string:barcode>')
 @admin_required
 def delete_consumable(barcode):
-    logging.info(f"Lösche Verbrauchsmaterial {barcode}")
+    logger.info(f"Lösche Verbrauchsmaterial {barcode}")
     try:
         with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
             consumable = conn.execute(
@@ -1479,10 +2486,13 @@ def delete_consumable(barcode):
             conn.execute('DELETE FROM consumables WHERE barcode=?', (barcode,))
             conn.commit()
             
+            FilterCache.invalidate('consumables')
+            audit_event('DELETE', f"Verbrauchsmaterial {consumable['bezeichnung']} in den Papierkorb verschoben",
+                        barcode, 'consumable')
             flash('Verbrauchsmaterial in den Papierkorb verschoben', 'success')
             
     except Exception as e:
-        logging.error(f"Fehler beim Löschen: {str(e)}")
+        logger.error(f"Fehler beim Löschen: {str(e)}")
         flash('Fehler beim Lschen des Verbrauchsmaterials', 'error')
         
     return redirect(url_for('consumables'))
@@ -1491,7 +2501,7 @@ def delete_consumable(barcode):
 @admin_required
 def adjust_quantity(barcode):
     adjustment = request.form.get('adjustment', type=int)
-    logging.info(f"Passe Menge an für {barcode}: {adjustment}")
+    logger.info(f"Passe Menge an für {barcode}: {adjustment}")
     try:
         with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
             conn.execute('''
@@ -1505,8 +2515,8 @@ def adjust_quantity(barcode):
         return jsonify({'success': True})
         
     except Exception as e:
-        logging.error(f"Fehler bei Mengenanpassung für {barcode}: {str(e)}")
-        logging.error(traceback.format_exc())
+        logger.error(f"Fehler bei Mengenanpassung für {barcode}: {str(e)}")
+        logger.error(traceback.format_exc())
         raise
 
 @app.route('/admin/restore/consumable/<int:id>')
@@ -1547,10 +2557,13 @@ def restore_consumable(id):
 >>>>>>> Stashed changes
             conn.commit()
             
+            FilterCache.invalidate('consumables')
+            audit_event('RESTORE', f"Verbrauchsmaterial {item['bezeichnung']} wiederhergestellt",
+                        item['barcode'], 'consumable')
             flash('Verbrauchsmaterial wiederhergestellt', 'success')
             
     except Exception as e:
-        logging.error(f"Fehler bei Wiederherstellung: {str(e)}")
+        logger.error(f"Fehler bei Wiederherstellung: {str(e)}")
         flash('Fehler bei der Wiederherstellung', 'error')
         
     return redirect(url_for('trash'))
@@ -1573,15 +2586,16 @@ def add_tool():
                     VALUES (?, ?, ?, ?)
                 ''', (barcode, gegenstand, ort, typ))
                 conn.commit()
+            FilterCache.invalidate('tools')
                 
+            audit_event('CREATE', f"Werkzeug {gegenstand} angelegt", barcode, 'tool')
             flash('Werkzeug erfolgreich hinzugefügt', 'success')
             return redirect(url_for('index'))
             
         except sqlite3.IntegrityError:
             flash('Barcode existiert bereits', 'error')
         except Exception as e:
-            print(f"Fehler beim Hinzufügen: {str(e)}")
-            traceback.print_exc()
+            logger.error("Fehler beim Hinzufügen: %s", e, exc_info=True)
             flash('Fehler beim Hinzufügen des Werkzeugs', 'error')
             
     return render_template('add_tool.html', tool=None)
@@ -1603,7 +2617,9 @@ def edit_tool(barcode):
                     WHERE barcode=?
                 ''', (gegenstand, ort, typ, barcode))
                 conn.commit()
+                FilterCache.invalidate('tools')
                 
+                audit_event('UPDATE', f"Werkzeug {barcode} bearbeitet", barcode, 'tool')
                 flash('Werkzeug erfolgreich aktualisiert', 'success')
                 return redirect(url_for('index'))
             
@@ -1618,8 +2634,7 @@ def edit_tool(barcode):
             return render_template('tool_form.html', tool=tool)
             
     except Exception as e:
-        print(f"Fehler beim Bearbeiten: {str(e)}")
-        traceback.print_exc()
+        logger.error("Fehler beim Bearbeiten: %s", e, exc_info=True)
         flash('Fehler beim Bearbeiten des Werkzeugs', 'error')
         return redirect(url_for('index'))
 
@@ -1649,27 +2664,30 @@ def delete_tool(barcode):
                     conn.execute('DELETE FROM tools WHERE barcode=?', (barcode,))
                     conn.commit()
                     
+                    FilterCache.invalidate('tools')
+                    audit_event('DELETE', f"Werkzeug {tool['gegenstand']} in den Papierkorb verschoben",
+                                barcode, 'tool')
                     flash('Werkzeug in den Papierkorb verschoben', 'success')
                     
                 except Exception as db_error:
                     conn.rollback()
-                    logging.error(f"Datenbankfehler beim Löschen: {str(db_error)}")
+                    logger.error(f"Datenbankfehler beim Löschen: {str(db_error)}")
                     flash('Fehler beim Löschen des Werkzeugs', 'error')
             else:
                 flash('Werkzeug nicht gefunden', 'error')
                 
     except Exception as e:
-        logging.error(f"Fehler beim Löschen: {str(e)}")
+        logger.error(f"Fehler beim Löschen: {str(e)}")
         flash('Fehler beim Löschen des Werkzeugs', 'error')
         
     return redirect(url_for('index'))
 
 @app.route('/tool/<barcode>')
 def tool_details(barcode):
-    logging.info(f"Lade Details für Werkzeug {barcode}")
+    logger.info(f"Lade Details für Werkzeug {barcode}")
     try:
         with get_db_connection(DBConfig.TOOLS_DB) as conn:
-            logging.debug("Verbinde Datenbanken...")
+            logger.debug("Verbinde Datenbanken...")
             conn.execute(f"ATTACH DATABASE '{DBConfig.LENDINGS_DB}' AS lendings_db")
             conn.execute(f"ATTACH DATABASE '{DBConfig.WORKERS_DB}' AS workers_db")
             
@@ -1681,7 +2699,7 @@ def tool_details(barcode):
             ''', (barcode,)).fetchone()
             
             if not tool:
-                logging.warning(f"Werkzeug {barcode} nicht gefunden")
+                logger.warning(f"Werkzeug {barcode} nicht gefunden")
                 flash('Werkzeug nicht gefunden', 'error')
                 return redirect(url_for('index'))
             
@@ -1698,7 +2716,7 @@ def tool_details(barcode):
                 ORDER BY l.checkout_time DESC
             ''', (barcode,)).fetchall()
             
-            logging.info(f"Details für {barcode} erfolgreich geladen")
+            logger.info(f"Details für {barcode} erfolgreich geladen")
             
             # Hole Statushistorie
             status_history = conn.execute('''
@@ -1729,8 +2747,8 @@ def tool_details(barcode):
                                 is_admin=session.get('is_admin', False))
             
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler in tool_details: {str(e)}")
-        logging.error(traceback.format_exc())
+        logger.error(f"Datenbankfehler in tool_details: {str(e)}")
+        logger.error(traceback.format_exc())
         flash('Fehler beim Laden der Details', 'error')
         return redirect(url_for('index'))
 
@@ -1753,15 +2771,16 @@ def add_worker():
                     VALUES (?, ?, ?, ?, ?)
                 ''', (name, lastname, barcode, bereich, email))
                 conn.commit()
+            FilterCache.invalidate('workers')
                 
+            audit_event('CREATE', f"Mitarbeiter {name} {lastname} angelegt", barcode, 'worker')
             flash('Mitarbeiter erfolgreich hinzugefügt', 'success')
             return redirect(url_for('workers'))
             
         except sqlite3.IntegrityError:
             flash('Barcode existiert bereits', 'error')
         except Exception as e:
-            print(f"Fehler beim Hinzufügen: {str(e)}")
-            traceback.print_exc()
+            logger.error("Fehler beim Hinzufügen: %s", e, exc_info=True)
             flash('Fehler beim Hinzufügen des Mitarbeiters', 'error')
             
     return render_template('add_worker.html', worker=None)
@@ -1784,7 +2803,9 @@ def edit_worker(barcode):
                     WHERE barcode=?
                 ''', (name, lastname, bereich, email, barcode))
                 conn.commit()
+                FilterCache.invalidate('workers')
                 
+                audit_event('UPDATE', f"Mitarbeiter {barcode} bearbeitet", barcode, 'worker')
                 flash('Mitarbeiter erfolgreich aktualisiert', 'success')
                 return redirect(url_for('workers'))
             
@@ -1799,7 +2820,7 @@ def edit_worker(barcode):
             return render_template('worker_form.html', worker=worker)
             
     except Exception as e:
-        logging.error(f"Fehler beim Bearbeiten: {str(e)}")
+        logger.error(f"Fehler beim Bearbeiten: {str(e)}")
         flash('Fehler beim Bearbeiten des Mitarbeiters', 'error')
         return redirect(url_for('workers'))
 
@@ -1847,10 +2868,13 @@ def delete_worker(barcode):
 >>>>>>> Stashed changes
             conn.commit()
             
+            FilterCache.invalidate('workers')
+            audit_event('DELETE', f"Mitarbeiter {worker['name']} {worker['lastname']} gelöscht",
+                        barcode, 'worker')
             flash('Mitarbeiter erfolgreich gelöscht', 'success')
             
     except Exception as e:
-        logging.error(f"Fehler beim Löschen: {str(e)}")
+        logger.error(f"Fehler beim Löschen: {str(e)}")
         flash('Fehler beim Löschen des Mitarbeiters', 'error')
         
     return redirect(url_for('workers'))
@@ -1859,8 +2883,8 @@ def delete_worker(barcode):
 <<<<<<< Updated upstream
 @admin_required
 def worker_details(barcode):
-    print(f"\n=== WORKER DETAILS ROUTE ===")
-    print(f"Barcode: {barcode}")
+    logger.debug("WORKER DETAILS ROUTE")
+    logger.debug("Barcode: %s", barcode)
     try:
         with get_db_connection(DBConfig.WORKERS_DB) as conn:
             worker = conn.execute('''
@@ -1897,8 +2921,7 @@ def worker_details(barcode):
                              lending_history=lending_history)
                              
     except Exception as e:
-        print(f"FEHLER beim Laden der Mitarbeiterdetails: {str(e)}")
-        print(traceback.format_exc())
+        logger.error("FEHLER beim Laden der Mitarbeiterdetails: %s", e, exc_info=True)
         flash('Fehler beim Laden der Details', 'error')
         return redirect(url_for('index'))
 =======
@@ -1958,7 +2981,7 @@ def worker_details(barcode):
                              lending_history=lending_history)
                              
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler in worker_details: {str(e)}")
+        logger.error(f"Datenbankfehler in worker_details: {str(e)}")
         flash('Fehler beim Laden der Mitarbeiterdetails', 'error')
         return redirect(url_for('workers'))
 >>>>>>> Stashed changes
@@ -2003,13 +3026,16 @@ def restore_tool(id):
 >>>>>>> Stashed changes
             conn.commit()
             
+            FilterCache.invalidate('tools')
+            audit_event('RESTORE', f"Werkzeug {deleted_tool['gegenstand']} wiederhergestellt",
+                        deleted_tool['barcode'], 'tool')
             flash('Werkzeug erfolgreich wiederhergestellt', 'success')
             
     except sqlite3.Error as e:
-        logging.error(f"Datenbankfehler bei Werkzeug-Wiederherstellung: {str(e)}")
+        logger.error(f"Datenbankfehler bei Werkzeug-Wiederherstellung: {str(e)}")
         flash('Datenbankfehler bei der Wiederherstellung', 'error')
     except Exception as e:
-        logging.error(f"Fehler bei Werkzeug-Wiederherstellung: {str(e)}")
+        logger.error(f"Fehler bei Werkzeug-Wiederherstellung: {str(e)}")
         flash('Fehler bei der Wiederherstellung', 'error')
         
     return redirect(url_for('trash'))
@@ -2047,13 +3073,15 @@ def restore_worker(id):
                       item['bereich'], item['email']))
                 conn.commit()
                 
+                FilterCache.invalidate('workers')
+                audit_event('RESTORE', f"Mitarbeiter {item['name']} {item['lastname']} wiederhergestellt",
+                            item['barcode'], 'worker')
                 flash('Mitarbeiter wiederhergestellt', 'success')
             else:
                 flash('Gelöschter Mitarbeiter nicht gefunden', 'error')
                 
     except Exception as e:
-        print(f"Fehler bei Wiederherstellung: {str(e)}")
-        traceback.print_exc()
+        logger.error("Fehler bei Wiederherstellung: %s", e, exc_info=True)
         flash('Fehler bei der Wiederherstellung', 'error')
         
     return redirect(url_for('trash'))
@@ -2075,10 +3103,10 @@ def empty_trash():
             conn.execute('DELETE FROM deleted_consumables')
             conn.commit()
             
+        audit_event('DELETE', 'Papierkorb geleert')
         flash('Papierkorb geleert', 'success')
     except Exception as e:
-        print(f"Fehler beim Leeren des Papierkorbs: {str(e)}")
-        traceback.print_exc()
+        logger.error("Fehler beim Leeren des Papierkorbs: %s", e, exc_info=True)
         flash('Fehler beim Leeren des Papierkorbs', 'error')
         
     return redirect(url_for('trash'))
@@ -2113,7 +3141,7 @@ def trash():
             ).fetchall()
             
     except Exception as e:
-        logging.error(f"Fehler beim Laden des Papierkorbs: {str(e)}")
+        logger.error(f"Fehler beim Laden des Papierkorbs: {str(e)}")
         flash('Fehler beim Laden des Papierkorbs', 'error')
         
     return render_template('admin/trash.html', deleted_items=deleted_items)
@@ -2150,12 +3178,14 @@ def update_consumable(barcode):
             ''', (bezeichnung, ort, typ, mindestbestand, 
                   aktueller_bestand, einheit, status, barcode))
             conn.commit()
+        FilterCache.invalidate('consumables')
             
+        audit_event('UPDATE', f"Verbrauchsmaterial {barcode} bearbeitet", barcode, 'consumable')
         flash('Verbrauchsmaterial erfolgreich aktualisiert', 'success')
         
     except Exception as e:
-        logging.error(f"Fehler beim Update: {str(e)}")
-        logging.error(traceback.format_exc())
+        logger.error(f"Fehler beim Update: {str(e)}")
+        logger.error(traceback.format_exc())
         flash('Fehler beim Aktualisieren des Verbrauchsmaterials', 'error')
         
     return redirect(url_for('consumable_details', barcode=barcode))
@@ -2196,10 +3226,11 @@ def update_tool(barcode):
                       session.get('username', 'System')))
             
             conn.commit()
+            FilterCache.invalidate('tools')
             flash('Werkzeug erfolgreich aktualisiert', 'success')
             
     except sqlite3.Error as e:
-        logging.error(f"Fehler beim Update: {str(e)}")
+        logger.error(f"Fehler beim Update: {str(e)}")
         flash('Fehler beim Aktualisieren', 'error')
         
     return redirect(url_for('tool_details', barcode=barcode))
@@ -2224,12 +3255,13 @@ def update_worker(barcode):
                 WHERE barcode = ?
             ''', (name, lastname, bereich, email, barcode))
             conn.commit()
+        FilterCache.invalidate('workers')
             
+        audit_event('UPDATE', f"Mitarbeiter {barcode} bearbeitet", barcode, 'worker')
         flash('Mitarbeiter aktualisiert', 'success')
         
     except Exception as e:
-        print(f"Fehler beim Update: {str(e)}")
-        traceback.print_exc()
+        logger.error("Fehler beim Update: %s", e, exc_info=True)
         flash('Fehler beim Aktualisieren', 'error')
         
     return redirect(url_for('worker_details', barcode=barcode))
@@ -2242,16 +3274,16 @@ def quick_scan():
 @app.route('/api/recent_lendings')
 def get_recent_lendings():
 <<<<<<< Updated upstream
-    print("\n=== RECENT LENDINGS API ===")
-    print("Lade aktuelle Ausleihen für Frontend-Anzeige...")
+    logger.debug("RECENT LENDINGS API")
+    logger.debug("Lade aktuelle Ausleihen für Frontend-Anzeige...")
     try:
         with get_db_connection(DBConfig.LENDINGS_DB) as conn:
-            print("Verbinde zusätzliche Datenbanken...")
+            logger.debug("Verbinde zusätzliche Datenbanken...")
             conn.execute(f"ATTACH DATABASE '{DBConfig.TOOLS_DB}' AS tools_db")
             conn.execute(f"ATTACH DATABASE '{DBConfig.WORKERS_DB}' AS workers_db")
             conn.execute(f"ATTACH DATABASE '{DBConfig.CONSUMABLES_DB}' AS consumables_db")
             
-            print("Führe Abfrage aus...")
+            logger.debug("Führe Abfrage aus...")
             lendings = conn.execute('''
 =======
     """Letzte 10 Ausleihen"""
@@ -2289,7 +3321,7 @@ def get_recent_lendings():
 def process_lending():
     try:
         data = request.get_json()
-        logging.info(f"Process lending: action={data.get('action')}, "
+        logger.info(f"Process lending: action={data.get('action')}, "
                     f"barcode={data.get('item_barcode')}, "
                     f"worker={data.get('worker_barcode')}, "
                     f"amount={data.get('amount', 1)}")
@@ -2301,37 +3333,28 @@ def process_lending():
             return jsonify({'success': False, 'message': 'Kein Werkzeug/Material ausgewählt'})
 
         with get_db_connection(DBConfig.LENDINGS_DB) as conn:
-            conn.execute(f"ATTACH DATABASE '{DBConfig.TOOLS_DB}' AS tools_db")
-            conn.execute(f"ATTACH DATABASE '{DBConfig.CONSUMABLES_DB}' AS consumables_db")
-            
-            # Füge neue Ausleihe hinzu
-            conn.execute('''
-                INSERT INTO lendings 
-                (worker_barcode, item_barcode, item_type, amount)
-                VALUES (?, ?, ?, ?)
-            ''', (data['worker_barcode'], data['item_barcode'], 
-                  data['item_type'], data.get('amount', 1)))
-            
-            # Aktualisiere Status des Werkzeugs
-            if data['item_type'] == 'tool':
-                conn.execute('''
-                    UPDATE tools_db.tools 
-                    SET status = 'Ausgeliehen' 
-                    WHERE barcode = ?
-                ''', (data['item_barcode'],))
-            
-            conn.commit()
+            if data.get('item_type') == 'consumable':
+                new_stock = lending_engine.issue_consumable(
+                    conn, data['item_barcode'], data['worker_barcode'],
+                    int(data.get('amount', 1) or 1), session.get('username', 'System'))
+                return jsonify({'success': True, 'message': 'Ausgabe erfolgreich', 'new_stock': new_stock})
+            if data.get('action') == 'return':
+                lending_engine.return_tool(conn, data['item_barcode'])
+                return jsonify({'success': True, 'message': 'Rückgabe erfolgreich'})
+            lending_engine.checkout_tool(conn, data['item_barcode'], data['worker_barcode'])
             
         return jsonify({'success': True, 'message': 'Ausleihe erfolgreich'})
             
+    except LendingError as e:
+        return lending_error_response(e)
     except Exception as e:
-        logging.error(f"Fehler bei der Ausleihe: {str(e)}")
+        logger.error(f"Fehler bei der Ausleihe: {str(e)}")
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/manual_lending')
 def manual_lending():
     try:
-        logging.info("Starte Laden der Ausleihseite...")
+        logger.info("Starte Laden der Ausleihseite...")
         with get_db_connection(DBConfig.WORKERS_DB) as workers_conn:
             workers = [dict(row) for row in workers_conn.execute('''
                 SELECT barcode, name, lastname 
@@ -2376,19 +3399,19 @@ def manual_lending():
                 ORDER BY l.checkout_time DESC
                 LIMIT 10
             ''').fetchall()
-            print(f"Gefundene Ausleihen: {len(lendings)}")
+            logger.debug("Gefundene Ausleihen: %s", len(lendings))
             
         return jsonify([dict(row) for row in lendings])
     except Exception as e:
-        print(f"FEHLER beim Laden der Ausleihen: {str(e)}")
+        logger.error("FEHLER beim Laden der Ausleihen: %s", e)
         return jsonify({'error': str(e)})
 
 @app.route('/api/process_lending', methods=['POST'])
 def process_lending():
-    print("\n=== PROCESS LENDING API ===")
+    logger.debug("PROCESS LENDING API")
     try:
         data = request.get_json()
-        print(f"Empfangene Daten: {data}")
+        logger.debug("Empfangene Daten: %s", data)
         
         # Standardwerte setzen und validieren
         amount = int(data.get('amount', 1) or 1)
@@ -2402,56 +3425,37 @@ def process_lending():
                 'message': 'Fehlende Pflichtfelder'
             })
         
-        print(f"Verarbeite: Typ={item_type}, Menge={amount}, "
-              f"Worker={worker_barcode}, Item={item_barcode}")
+        logger.debug("Verarbeite: Typ=%s, Menge=%s, Worker=%s, Item=%s",
+                     item_type, amount, worker_barcode, item_barcode)
 
-        if item_type == 'consumable':
-            with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
-                item = conn.execute(
-                    'SELECT * FROM consumables WHERE barcode = ?', 
-                    (item_barcode,)
-                ).fetchone()
-                
-                if item:
-                    current_stock = item['aktueller_bestand'] or 0
-                    print(f"Aktueller Bestand: {current_stock}")
-                    
-                    if current_stock < amount:
-                        print("FEHLER: Nicht genügend Bestand")
-                        return jsonify({
-                            'success': False, 
-                            'message': 'Nicht genügend Bestand verfügbar'
-                        })
-                    
-                    new_stock = current_stock - amount
-                    print(f"Neuer Bestand wird sein: {new_stock}")
-                    
-                    # Aktualisiere Bestand
-                    conn.execute('''
-                        UPDATE consumables 
-                        SET aktueller_bestand = ?,
-                            last_updated = CURRENT_TIMESTAMP
-                        WHERE barcode = ?
-                    ''', (new_stock, item_barcode))
-                    conn.commit()
-                    
-                    return jsonify({
-                        'success': True,
-                        'new_stock': new_stock
-                    })
-                    
+        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+            if item_type == 'consumable':
+                new_stock = lending_engine.issue_consumable(
+                    conn, item_barcode, worker_barcode, amount,
+                    session.get('username', 'System'))
+                logger.debug("Neuer Bestand: %s", new_stock)
                 return jsonify({
-                    'success': False,
-                    'message': 'Verbrauchsmaterial nicht gefunden'
+                    'success': True,
+                    'new_stock': new_stock
                 })
+            
+            if data.get('action') == 'return':
+                lending_engine.return_tool(conn, item_barcode)
+                return jsonify({'success': True, 'message': 'Rückgabe erfolgreich'})
+            
+            lending_engine.checkout_tool(conn, item_barcode, worker_barcode)
+            return jsonify({'success': True, 'message': 'Ausleihe erfolgreich'})
                 
+    except LendingError as e:
+        logger.info("Vorgang abgelehnt: %s", e)
+        return lending_error_response(e)
     except Exception as e:
-        print(f"FEHLER: {str(e)}")
+        logger.error("FEHLER: %s", e)
         return jsonify({'error': str(e)})
 
 @app.route('/api/get_stock_info/<barcode>')
 def get_stock_info(barcode):
-    print(f"\n=== GET STOCK INFO für {barcode} ===")
+    logger.debug("GET STOCK INFO für %s", barcode)
     try:
         with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
             item = conn.execute(
@@ -2469,60 +3473,51 @@ def get_stock_info(barcode):
                 elif current_stock <= min_stock:
                     status = 'Nachbestellen'
                 
-                print(f"Bestand={current_stock}, Min={min_stock}, Status={status}")
+                logger.debug("Bestand=%s, Min=%s, Status=%s", current_stock, min_stock, status)
                 return jsonify({
                     'current_stock': current_stock,
                     'min_stock': min_stock,
                     'status': status
                 })
             
-            print("WARNUNG: Item nicht gefunden")
+            logger.info("Item nicht gefunden: %s", barcode)
             return jsonify({'error': 'Item nicht gefunden'})
             
     except Exception as e:
-        print(f"FEHLER: {str(e)}")
+        logger.error("FEHLER: %s", e)
         return jsonify({'error': str(e)})
 
 @app.route('/api/update_stock', methods=['POST'])
 def update_stock():
     """API-Endpunkt zum Aktualisieren des Bestands"""
-    print("\n=== UPDATE STOCK API ===")
+    logger.debug("UPDATE STOCK API")
     try:
         data = request.get_json()
         barcode = data.get('barcode')
         new_stock = int(data.get('stock', 0) or 0)  # Sicherstellen dass stock eine Zahl ist
+        # Optional: zuletzt angezeigter Bestand - verhindert, dass parallele Buchungen überschrieben werden
+        expected_stock = data.get('expected_stock')
+        if expected_stock is not None:
+            expected_stock = int(expected_stock)
         
-        print(f"Update Stock: Barcode={barcode}, Neuer Bestand={new_stock}")
+        logger.debug("Update Stock: Barcode=%s, Neuer Bestand=%s", barcode, new_stock)
         
-        with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
-            old_stock = conn.execute(
-                'SELECT aktueller_bestand FROM consumables WHERE barcode = ?', 
-                (barcode,)
-            ).fetchone()
-            
-            if old_stock:
-                old_stock = old_stock['aktueller_bestand'] or 0
-                print(f"Alter Bestand: {old_stock}")
-                
-                conn.execute('''
-                    UPDATE consumables 
-                    SET aktueller_bestand = ?,
-                        last_updated = CURRENT_TIMESTAMP
-                    WHERE barcode = ?
-                ''', (new_stock, barcode))
-                conn.commit()
-                print("Bestand erfolgreich aktualisiert")
-                
-                return jsonify({
-                    'success': True,
-                    'old_stock': old_stock,
-                    'new_stock': new_stock
-                })
-            print("WARNUNG: Item nicht gefunden")
-            return jsonify({'error': 'Item nicht gefunden'})
+        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+            old_stock, new_stock = lending_engine.set_stock(
+                conn, barcode, new_stock, session.get('username', 'System'), expected_stock)
+        logger.debug("Bestand erfolgreich aktualisiert: %s -> %s", old_stock, new_stock)
+        
+        return jsonify({
+            'success': True,
+            'old_stock': old_stock,
+            'new_stock': new_stock
+        })
             
+    except LendingError as e:
+        logger.warning("WARNUNG: %s", e)
+        return lending_error_response(e)
     except Exception as e:
-        print(f"FEHLER: {str(e)}")
+        logger.error("FEHLER: %s", e)
         return jsonify({'error': str(e)})
 
 @app.route('/manual_lending')
@@ -2567,8 +3562,7 @@ def manual_lending():
                                  tool_lendings=tool_lendings,
                                  consumable_lendings=consumable_lendings)
     except Exception as e:
-        print(f"Fehler beim Laden der manuellen Ausleihe: {str(e)}")
-        traceback.print_exc()
+        logger.error("Fehler beim Laden der manuellen Ausleihe: %s", e, exc_info=True)
         flash('Fehler beim Laden', 'error')
         return render_template('manual_lending.html', 
                              tool_lendings=[],
@@ -2576,9 +3570,9 @@ def manual_lending():
 
 @app.route('/mark_tool_defect/<barcode>', methods=['POST'])
 def mark_tool_defect(barcode):
-    print(f"\n=== MARK TOOL DEFECT für Barcode: {barcode} ===")
+    logger.debug("MARK TOOL DEFECT für Barcode: %s", barcode)
     try:
-        print("Markiere Werkzeug als defekt...")
+        logger.debug("Markiere Werkzeug als defekt...")
         with get_db_connection(DBConfig.TOOLS_DB) as conn:
 =======
                        END as item_name,
@@ -2599,7 +3593,7 @@ def mark_tool_defect(barcode):
                              active_lendings=active_lendings)
                              
     except Exception as e:
-        logging.error(f"Fehler beim Laden der Ausleihseite: {str(e)}")
+        logger.error(f"Fehler beim Laden der Ausleihseite: {str(e)}")
         flash('Fehler beim Laden der Ausleihseite', 'error')
         return redirect(url_for('index'))
 
@@ -2624,21 +3618,21 @@ def mark_tool_defect(barcode):
             ''', (barcode,))
             conn.commit()
 <<<<<<< Updated upstream
-            print("Werkzeug erfolgreich als defekt markiert")
+            logger.debug("Werkzeug erfolgreich als defekt markiert")
             
         return jsonify({'success': True})
     except Exception as e:
-        print(f"FEHLER beim Markieren als defekt: {str(e)}")
+        logger.error("FEHLER beim Markieren als defekt: %s", e)
         return jsonify({'error': str(e)})
 
 =======
             
             # Debug-Log hinzufügen
-            logging.info(f"Werkzeug {barcode} als defekt markiert mit Timestamp")
+            logger.info(f"Werkzeug {barcode} als defekt markiert mit Timestamp")
             flash('Werkzeug wurde als defekt markiert', 'success')
             
     except sqlite3.Error as e:
-        logging.error(f"Fehler beim Markieren als defekt: {str(e)}")
+        logger.error(f"Fehler beim Markieren als defekt: {str(e)}")
         flash('Fehler beim Markieren als defekt', 'error')
     return redirect(url_for('index'))
 
@@ -2655,10 +3649,10 @@ def add_defect_date_column():
                     ALTER TABLE tools 
                     ADD COLUMN defect_date DATETIME
                 ''')
-                logging.info("defect_date Spalte erfolgreich hinzugefügt")
+                logger.info("defect_date Spalte erfolgreich hinzugefügt")
                 
     except Exception as e:
-        logging.error(f"Fehler beim Hinzufügen der defect_date Spalte: {str(e)}")
+        logger.error(f"Fehler beim Hinzufügen der defect_date Spalte: {str(e)}")
 
 @app.route('/consumables/<barcode>/checkout', methods=['POST'])
 def checkout_consumable(barcode):
@@ -2670,44 +3664,15 @@ def checkout_consumable(barcode):
             flash('Ungültige Menge', 'error')
             return redirect(url_for('consumable_details', barcode=barcode))
             
-        with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
-            # Prüfe aktuellen Bestand
-            current = conn.execute('''
-                SELECT aktueller_bestand FROM consumables 
-                WHERE barcode = ?
-            ''', (barcode,)).fetchone()
-            
-            if current['aktueller_bestand'] < amount:
-                flash('Nicht genügend Bestand verfügbar', 'error')
-                return redirect(url_for('consumable_details', barcode=barcode))
-            
-            # Bestand aktualisieren
-            conn.execute('''
-                UPDATE consumables 
-                SET aktueller_bestand = aktueller_bestand - ?,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE barcode = ?
-            ''', (amount, barcode))
-            
-            # Historie eintragen
-            conn.execute('''
-                INSERT INTO consumables_history 
-                (consumable_barcode, worker_barcode, action, amount, old_stock, new_stock, changed_by)
-                VALUES (?, ?, 'checkout', ?, ?, ?, ?)
-            ''', (
-                barcode,
-                worker_barcode,
-                amount,
-                current['aktueller_bestand'],
-                current['aktueller_bestand'] - amount,
-                session.get('username', 'System')
-            ))
-            
-            conn.commit()
+        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+            lending_engine.issue_consumable(conn, barcode, worker_barcode, amount,
+                                            session.get('username', 'System'))
             flash('Ausgabe erfolgreich verbucht', 'success')
             
+    except LendingError as e:
+        flash(str(e), 'error')
     except Exception as e:
-        logging.error(f"Fehler bei Materialausgabe: {str(e)}")
+        logger.error(f"Fehler bei Materialausgabe: {str(e)}")
         flash('Fehler bei der Ausgabe', 'error')
         
     return redirect(url_for('consumable_details', barcode=barcode))
@@ -2796,14 +3761,14 @@ def search_worker(query):
                         'worker': dict(worker)
                     })
             
-            # Suche nach Name
+            # Suche nach Name über den Volltextindex (Präfixsuche je Wort)
+            match = build_fts_query(query)
             workers = conn.execute('''
-                SELECT * FROM workers 
-                WHERE name || ' ' || lastname LIKE ? 
-                OR lastname || ' ' || name LIKE ?
-                OR name LIKE ? 
-                OR lastname LIKE ?
-            ''', (f'%{query}%', f'%{query}%', f'%{query}%', f'%{query}%')).fetchall()
+                SELECT w.* FROM workers_fts
+                JOIN workers w ON w.rowid = workers_fts.rowid
+                WHERE workers_fts MATCH ?
+                ORDER BY workers_fts.rank
+            ''', (match,)).fetchall() if match else []
             
             if len(workers) == 0:
                 return jsonify({'error': 'Kein Mitarbeiter gefunden'})
@@ -2819,10 +3784,143 @@ def search_worker(query):
                 })
                 
     except Exception as e:
-        logging.error(f"Fehler bei Mitarbeitersuche: {str(e)}")
+        logger.error(f"Fehler bei Mitarbeitersuche: {str(e)}")
         return jsonify({'error': 'Datenbankfehler'})
 
 >>>>>>> Stashed changes
+@app.route('/api/resolve/<barcode>')
+def resolve_scan(barcode):
+    """Löst einen gescannten Barcode in einem Aufruf auf (Typ, Stammdaten, Ausleihstatus)"""
+    try:
+        with get_db_connection(DBConfig.SYSTEM_DB) as conn:
+            result = resolve_barcode(conn, barcode.strip())
+        if result is None:
+            return jsonify({'type': 'unknown', 'error': 'Barcode nicht gefunden'}), 404
+        return jsonify(result)
+    except sqlite3.Error as e:
+        logger.error(f"Fehler beim Auflösen von Barcode {barcode}: {str(e)}")
+        return jsonify({'error': 'Datenbankfehler'}), 500
+
+@app.route('/api/jobs/<job_id>')
+@admin_required
+def job_status(job_id):
+    """Status und Fortschritt eines Hintergrundjobs"""
+    job = current_app.extensions['jobs'].get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Job nicht gefunden oder abgelaufen'}), 404
+    if job['status'] == 'done' and job['result_name']:
+        job['download_url'] = url_for('job_download', job_id=job_id)
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/jobs/<job_id>/download')
+@admin_required
+def job_download(job_id):
+    """Ergebnisdatei eines fertigen Jobs (bis zum Ablauf abrufbar)"""
+    result = current_app.extensions['jobs'].result(job_id)
+    if result is None:
+        return jsonify({'success': False, 'message': 'Kein Ergebnis vorhanden oder abgelaufen'}), 404
+    path, name, mimetype = result
+    return send_file(path, as_attachment=True, download_name=name, mimetype=mimetype)
+
+@app.route('/api/jobs/barcode_sheets', methods=['POST'])
+@admin_required
+def start_barcode_sheets():
+    """Barcode-Blätter im Hintergrund erzeugen (?template=avery-l7160 usw.)"""
+    import generate_barcodes
+
+    template = request.args.get('template', generate_barcodes.DEFAULT_TEMPLATE)
+    if template not in generate_barcodes.LABEL_TEMPLATES:
+        return jsonify({'success': False, 'message': f'Unbekannte Etikettenvorlage: {template}'}), 400
+    try:
+        return job_response(current_app.extensions['jobs'].submit(
+            'barcode_sheets', {'template': template}, created_by=session.get('username', 'System')))
+    except sqlite3.Error as e:
+        logger.error(f"Job für Barcode-Blätter nicht eingereiht: {str(e)}")
+        return jsonify({'success': False, 'message': 'Datenbankfehler'}), 500
+
+@app.route('/api/lendings/batch', methods=['POST'])
+def process_lending_batch():
+    """Sammelbuchung: mehrere Werkzeuge/Materialien für einen Mitarbeiter in einem Aufruf"""
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list):
+        return jsonify({'success': False, 'message': 'Keine Artikel übergeben'}), 400
+
+    try:
+        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+            results = lending_engine.process_batch(
+                conn, data.get('worker_barcode'), items,
+                action=data.get('action', 'checkout'),
+                changed_by=session.get('username', 'System'))
+    except LendingError as e:
+        return lending_error_response(e)
+    except sqlite3.Error as e:
+        logger.error(f"Fehler bei der Sammelbuchung: {str(e)}")
+        return jsonify({'success': False, 'message': 'Datenbankfehler'}), 500
+
+    failed = sum(1 for r in results if not r['success'])
+    return jsonify({
+        'success': failed == 0,
+        'processed': len(results) - failed,
+        'failed': failed,
+        'results': results
+    })
+
+@app.route('/api/stock/consumption')
+def stock_consumption():
+    """Ausgegebene Mengen je Material im Zeitraum from..to (Datum oder Zeitstempel, UTC)"""
+    start = request.args.get('from')
+    end = request.args.get('to') or datetime.utcnow().strftime('%Y-%m-%d')
+    if not start:
+        return jsonify({'error': 'Parameter from fehlt'}), 400
+    try:
+        with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
+            items = stock_ledger.consumption(conn, start, end, request.args.get('barcode'))
+        return jsonify({'from': start, 'to': end, 'items': items})
+    except ValueError:
+        return jsonify({'error': 'Ungültiges Datum (JJJJ-MM-TT oder ISO-Zeitstempel)'}), 400
+    except sqlite3.Error as e:
+        logger.error(f"Fehler bei der Verbrauchsauswertung: {str(e)}")
+        return jsonify({'error': 'Datenbankfehler'}), 500
+
+@app.route('/api/stock/<barcode>')
+def stock_as_of(barcode):
+    """Bestand eines Materials zum Stichtag (?at=JJJJ-MM-TT), ohne at der aktuelle Buchsaldo"""
+    when = request.args.get('at') or datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
+            stock = stock_ledger.stock_as_of(conn, barcode, when)
+        return jsonify({'barcode': barcode, 'at': when, 'stock': stock})
+    except ValueError:
+        return jsonify({'error': 'Ungültiges Datum (JJJJ-MM-TT oder ISO-Zeitstempel)'}), 400
+    except sqlite3.Error as e:
+        logger.error(f"Fehler beim Stichtagsbestand für {barcode}: {str(e)}")
+        return jsonify({'error': 'Datenbankfehler'}), 500
+
+@app.route('/api/search')
+def search():
+    """Gemischte Suche über Mitarbeiter, Werkzeuge und Verbrauchsmaterial (Autocomplete)"""
+    match = build_fts_query(request.args.get('q'))
+    if not match:
+        return jsonify({'results': []})
+    
+    types = [t for t in request.args.get('types', '').split(',') if t in SEARCH_PARTS] or list(SEARCH_PARTS)
+    # LIMIT -1 hieße in SQLite "ohne Grenze" - daher nach unten auf 1 begrenzen
+    limit = max(1, min(request.args.get('limit', 10, type=int) or 10, SEARCH_MAX_RESULTS))
+    query = ' UNION ALL '.join(SEARCH_PARTS[t] for t in types) + ' ORDER BY rank LIMIT :limit'
+    
+    try:
+        # Verbindung zur System-DB: alle anderen Datenbanken sind eingehängt
+        with get_db_connection(DBConfig.SYSTEM_DB) as conn:
+            rows = conn.execute(query, {'q': match, 'limit': limit}).fetchall()
+        return jsonify({'results': [
+            {'type': row['type'], 'barcode': row['barcode'], 'label': row['label'], 'detail': row['detail']}
+            for row in rows
+        ]})
+    except sqlite3.Error as e:
+        logger.error(f"Fehler bei der Suche nach '{match}': {str(e)}")
+        return jsonify({'error': 'Suche nicht verfügbar'}), 503
+
 @app.route('/admin/permanent_delete/tool/<int:id>')
 @admin_required
 def permanent_delete_tool(id):
@@ -2833,12 +3931,14 @@ def permanent_delete_tool(id):
             conn.commit()
             
             if result.rowcount > 0:
+                audit_event('DELETE', f"Werkzeug aus dem Papierkorb endgültig gelöscht (ID {id})",
+                            item_type='tool')
                 flash('Werkzeug endgültig gelöscht', 'success')
             else:
                 flash('Werkzeug nicht gefunden', 'error')
             
     except Exception as e:
-        logging.error(f"Fehler beim endgültigen Löschen: {str(e)}")
+        logger.error(f"Fehler beim endgültigen Löschen: {str(e)}")
         flash('Fehler beim Löschen', 'error')
         
     return redirect(url_for('trash'))
@@ -2848,20 +3948,49 @@ def permanent_delete_tool(id):
 def system_logs():
     """Systemlogs der letzten 14 Tage anzeigen"""
     try:
+        # Gepufferte Einträge dieses Prozesses vorher schreiben
+        audit.audit_log.flush()
         with get_db_connection(DBConfig.SYSTEM_DB) as conn:
+            # Übersicht aus den Tagessummen statt über alle Rohzeilen
+            daily = conn.execute('''
+                SELECT day, action_type, events
+                FROM system_logs_daily
+                WHERE day >= date('now', '-14 days')
+                ORDER BY day DESC, action_type
+            ''').fetchall()
             logs = conn.execute('''
                 SELECT *, datetime(timestamp, 'localtime') as local_time
                 FROM system_logs 
                 WHERE timestamp >= datetime('now', '-14 days')
                 ORDER BY timestamp DESC
-            ''').fetchall()
+                LIMIT ?
+            ''', (SYSTEM_LOGS_LIMIT,)).fetchall()
             
-        return render_template('admin/logs.html', logs=logs)
+        return render_template('admin/logs.html', logs=logs, daily=daily,
+                               limit=SYSTEM_LOGS_LIMIT)
         
     except Exception as e:
-        logging.error(f"Fehler beim Laden der Logs: {str(e)}")
+        logger.error(f"Fehler beim Laden der Logs: {str(e)}")
         flash('Fehler beim Laden der Systemlogs', 'error')
-        return redirect(url_for('admin'))
+        return redirect(url_for('admin_panel'))
+
+@app.route('/admin/sql_profile', methods=['GET', 'POST'])
+@admin_required
+def sql_profile():
+    """SQL-Profil je Route anzeigen bzw. zurücksetzen (POST)"""
+    try:
+        if request.method == 'POST':
+            sql_profiler.profiler.reset()
+            flash('SQL-Profil zurückgesetzt', 'success')
+            return redirect(url_for('sql_profile'))
+        return render_template('admin/sql_profile.html',
+                               endpoints=sql_profiler.profiler.report(),
+                               enabled=sql_profiler.ENABLED,
+                               slow_ms=sql_profiler.SLOW_MS)
+    except sqlite3.Error as e:
+        logger.error(f"Fehler beim Laden des SQL-Profils: {str(e)}")
+        flash('Fehler beim Laden des SQL-Profils', 'error')
+        return redirect(url_for('admin_panel'))
 
 def init_all_databases():
     try:
@@ -2919,11 +4048,11 @@ def init_all_databases():
                 );
             ''')
             
-        logging.info("Alle Datenbanken erfolgreich initialisiert")
+        logger.info("Alle Datenbanken erfolgreich initialisiert")
         return True
         
     except Exception as e:
-        logging.error(f"Fehler bei Datenbankinitialisierung: {str(e)}")
+        logger.error(f"Fehler bei Datenbankinitialisierung: {str(e)}")
         return False
 
 def add_last_updated_column():
@@ -2933,13 +4062,13 @@ def add_last_updated_column():
                 ALTER TABLE consumables 
                 ADD COLUMN last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
             ''')
-            logging.info("last_updated Spalte erfolgreich hinzugefügt")
+            logger.info("last_updated Spalte erfolgreich hinzugefügt")
     except Exception as e:
-        logging.error(f"Fehler beim Hinzufügen der last_updated Spalte: {str(e)}")
+        logger.error(f"Fehler beim Hinzufügen der last_updated Spalte: {str(e)}")
 
 @app.route('/api/get_lendings')
 def get_lendings():
-    logging.info("Hole aktuelle Ausleihdaten")
+    logger.info("Hole aktuelle Ausleihdaten")
     try:
         with get_db_connection(DBConfig.LENDINGS_DB) as conn:
             conn.execute(f"ATTACH DATABASE '{DBConfig.TOOLS_DB}' AS tools_db")
@@ -2975,7 +4104,7 @@ def get_lendings():
             tools = [l for l in active_lendings if l['item_type'] == 'Werkzeug']
             consumables = [l for l in active_lendings if l['item_type'] == 'Verbrauchsmaterial']
             
-            logging.info(f"Gefunden: {len(tools)} Werkzeuge, {len(consumables)} Verbrauchsmaterial")
+            logger.info(f"Gefunden: {len(tools)} Werkzeuge, {len(consumables)} Verbrauchsmaterial")
             
             return jsonify({
                 'success': True,
@@ -2984,8 +4113,8 @@ def get_lendings():
             })
             
     except Exception as e:
-        logging.error(f"Fehler beim Laden der Ausleihdaten: {str(e)}")
-        logging.error(traceback.format_exc())
+        logger.error(f"Fehler beim Laden der Ausleihdaten: {str(e)}")
+        logger.error(traceback.format_exc())
         return jsonify({
             'success': False,
             'message': 'Fehler beim Laden der Daten'
@@ -2993,51 +4122,30 @@ def get_lendings():
 
 @app.route('/return_tool', methods=['POST'])
 def return_tool():
-    print("\n=== RETURN TOOL ROUTE ===")
+    logger.debug("RETURN TOOL ROUTE")
     try:
-        data = request.json
-        print(f"Versuche Rückgabe für Barcode: {data.get('barcode')}")
+        data = request.get_json(silent=True) or request.form
+        logger.debug("Versuche Rückgabe für Barcode: %s", data.get('barcode'))
         result = process_return(data['barcode'])
-        print(f"Rückgabe-Ergebnis: {result}")
+        logger.debug("Rückgabe-Ergebnis: %s", result)
         return result
     except Exception as e:
-        print(f"FEHLER bei Werkzeugrückgabe: {str(e)}")
+        logger.error("FEHLER bei Werkzeugrückgabe: %s", e)
         return jsonify({'error': str(e)}), 500
 
 def process_return(tool_barcode):
-    print(f"\n=== VERARBEITE WERKZEUGRÜCKGABE ===")
-    print(f"Barcode: {tool_barcode}")
+    logger.debug("VERARBEITE WERKZEUGRÜCKGABE")
+    logger.debug("Barcode: %s", tool_barcode)
     try:
-        with get_db_connection(DBConfig.TOOLS_DB) as tools_conn:
-            print("Prüfe Werkzeug-Status...")
-            tool = tools_conn.execute('SELECT * FROM tools WHERE barcode = ?', 
-                                    (tool_barcode,)).fetchone()
-            
-            if not tool:
-                print("FEHLER: Werkzeug nicht gefunden!")
-                return jsonify({'error': 'Werkzeug nicht gefunden'})
-            
-            print("Aktualisiere Werkzeug-Status...")
-            tools_conn.execute('UPDATE tools SET status = ? WHERE barcode = ?',
-                             ('Verfügbar', tool_barcode))
-            tools_conn.commit()
-            print("Werkzeug-Status aktualisiert")
-
-        print("Aktualisiere Ausleih-Datensatz...")
-        with get_db_connection(DBConfig.LENDINGS_DB) as lendings_conn:
-            lendings_conn.execute('''
-                UPDATE lendings 
-                SET return_time = CURRENT_TIMESTAMP
-                WHERE item_barcode = ? AND return_time IS NULL
-            ''', (tool_barcode,))
-            lendings_conn.commit()
-            print("Ausleih-Datensatz aktualisiert")
-
-        print("Rückgabe erfolgreich abgeschlossen")
+        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+            lending_engine.return_tool(conn, tool_barcode)
+        logger.debug("Rückgabe erfolgreich abgeschlossen")
         return jsonify({'success': True, 'message': 'Rückgabe erfolgreich'})
-        
+    except LendingError as e:
+        logger.info("Rückgabe abgelehnt: %s", e)
+        return lending_error_response(e)
     except Exception as e:
-        print(f"FEHLER bei Rückgabe-Verarbeitung: {str(e)}")
+        logger.error("FEHLER bei Rückgabe-Verarbeitung: %s", e)
         return jsonify({'error': 'Datenbankfehler'})
 
 @app.route('/consume_item', methods=['POST'])
@@ -3052,73 +4160,47 @@ def consume_item():
         barcode = data.get('barcode')
 >>>>>>> Stashed changes
         
-        with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
-            item = conn.execute('SELECT * FROM consumables WHERE barcode = ?', 
+        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+            item = conn.execute('SELECT * FROM consumables_db.consumables WHERE barcode = ?', 
                               (barcode,)).fetchone()
             
 <<<<<<< Updated upstream
             if item:
-                old_stock = item['aktueller_bestand']
-                new_stock = old_stock - amount
-                
-                # Prüfe ob genug Bestand vorhanden ist
-                if new_stock < 0:
-                    return jsonify({
-                        'success': False, 
-                        'message': f'Nicht genügend Bestand vorhanden. Verfügbar: {old_stock}'
-                    })
-                
-                # Aktualisiere Bestand
-                conn.execute('''
-                    UPDATE consumables 
-                    SET aktueller_bestand = ? 
-                    WHERE barcode = ?
-                ''', (new_stock, barcode))
-                
-                # Erstelle Ausgabe-Eintrag
-                with get_db_connection(DBConfig.LENDINGS_DB) as lending_conn:
-                    lending_conn.execute('''
-                        INSERT INTO lendings 
-                        (worker_barcode, item_barcode, item_type, amount, 
-                         old_stock, new_stock, return_time)
-                        VALUES (?, ?, 'consumable', ?, ?, ?, CURRENT_TIMESTAMP)
-                    ''', (worker_barcode, barcode, amount, old_stock, new_stock))
-                
-                conn.commit()
+                # Bestand, Ausgabe-Eintrag und Historie in einer Transaktion
+                lending_engine.issue_consumable(conn, barcode, worker_barcode, amount,
+                                                session.get('username', 'System'))
                 return jsonify({'success': True})
                 
+    except LendingError as e:
+        return lending_error_response(e)
     except Exception as e:
-        logging.error(f"Fehler beim Verbrauchen: {str(e)}")
+        logger.error(f"Fehler beim Verbrauchen: {str(e)}")
         return jsonify({'success': False, 'message': 'Fehler beim Verbrauchen'})
 
 @app.route('/update_consumable_stock', methods=['POST'])
 def update_consumable_stock():
-    print("\n=== UPDATE CONSUMABLE STOCK ===")
+    logger.debug("UPDATE CONSUMABLE STOCK")
     try:
-        print("Prüfe Content-Type...")
+        logger.debug("Prüfe Content-Type...")
         if request.is_json:
-            print("Verarbeite JSON-Daten")
+            logger.debug("Verarbeite JSON-Daten")
             data = request.get_json()
         else:
-            print("Verarbeite Form-Daten")
+            logger.debug("Verarbeite Form-Daten")
             data = {
                 'barcode': request.form.get('barcode'),
                 'stock': request.form.get('stock')
             }
         
-        print(f"Empfangene Daten: {data}")
+        logger.debug("Empfangene Daten: %s", data)
         barcode = data.get('barcode')
         new_stock = data.get('stock')
-        print(f"Aktualisiere Bestand für {barcode} auf {new_stock}")
+        logger.debug("Aktualisiere Bestand für %s auf %s", barcode, new_stock)
 
-        with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
-            conn.execute('''
-                UPDATE consumables 
-                SET aktueller_bestand = ? 
-                WHERE barcode = ?
-            ''', (new_stock, barcode))
-            conn.commit()
-            print("Bestand erfolgreich aktualisiert")
+        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+            lending_engine.set_stock(conn, barcode, int(new_stock),
+                                     session.get('username', 'System'))
+            logger.debug("Bestand erfolgreich aktualisiert")
 =======
         with get_db_connection(DBConfig.LENDINGS_DB) as conn:
             conn.execute(f"ATTACH DATABASE '{DBConfig.TOOLS_DB}' AS tools_db")
@@ -3157,87 +4239,86 @@ def update_consumable_stock():
             
         return jsonify({'success': True})
     except Exception as e:
-        print(f"FEHLER bei der Bestandsaktualisierung: {str(e)}")
+        logger.error("FEHLER bei der Bestandsaktualisierung: %s", e)
         return jsonify({'error': str(e)})
 
 @app.route('/history')
 def history():
+    """Ausleihhistorie seitenweise, neueste zuerst, mit Filtern"""
     try:
+        filter_type = request.args.get('filter_type')
+        filters = {
+            'filter_from': parse_date(request.args.get('filter_from')),
+            'filter_to': parse_date(request.args.get('filter_to')),
+            'filter_type': filter_type if filter_type in ('tool', 'consumable') else None,
+            'filter_worker': request.args.get('filter_worker', '').strip() or None,
+            'filter_item': request.args.get('filter_item', '').strip() or None
+        }
+        
+        query = HISTORY_PAGE_QUERY
+        params = []
+        # Eingaben sind Kalendertage in Ortszeit, checkout_time ist UTC
+        if filters['filter_from']:
+            query += " AND l.checkout_time >= datetime(?, 'utc')"
+            params.append(filters['filter_from'])
+        if filters['filter_to']:
+            query += " AND l.checkout_time < datetime(?, '+1 day', 'utc')"
+            params.append(filters['filter_to'])
+        if filters['filter_type']:
+            query += ' AND l.item_type = ?'
+            params.append(filters['filter_type'])
+        if filters['filter_worker']:
+            query += ' AND l.worker_barcode = ?'
+            params.append(filters['filter_worker'])
+        if filters['filter_item']:
+            query += ' AND l.item_barcode = ?'
+            params.append(filters['filter_item'])
+        
+        pager = KeysetPager.from_request(HISTORY_SORTS, 'checkout_time', default_direction='desc')
+        query, params = pager.apply(query, params)
+        
         with get_db_connection(DBConfig.LENDINGS_DB) as conn:
-            history = conn.execute('''
-                SELECT l.*, w.name, w.lastname,
-                    CASE 
-                        WHEN l.item_type = 'tool' THEN t.gegenstand
-                        WHEN l.item_type = 'consumable' THEN c.bezeichnung
-                    END as item_name,
-                    CASE 
-                        WHEN l.item_type = 'tool' THEN t.typ
-                        WHEN l.item_type = 'consumable' THEN c.typ
-                    END as item_type_name
-                FROM lendings l
-                LEFT JOIN workers w ON l.worker_barcode = w.barcode
-                LEFT JOIN tools t ON l.item_barcode = t.barcode AND l.item_type = 'tool'
-                LEFT JOIN consumables c ON l.item_barcode = c.barcode AND l.item_type = 'consumable'
-                ORDER BY l.checkout_time DESC
-            ''').fetchall()
-            
-        return render_template('history.html', history=history)
+            history = pager.paginate(conn.execute(
+                HISTORY_QUERY.format(page=query, order=pager.order_by()), params
+            ).fetchall())
+        
+        # Die Seite ist begrenzt (KeysetPager), das HTML geht stückweise raus
+        return stream_template('history.html', history=history, pager=pager, **filters)
     except Exception as e:
-        logging.error(f"Fehler beim Laden der Historie: {str(e)}")
+        logger.error(f"Fehler beim Laden der Historie: {str(e)}")
         flash('Fehler beim Laden der Historie', 'error')
         return redirect(url_for('index'))
 
 def process_checkout(tool_barcode, worker_barcode):
     """Verarbeitet die Ausleihe eines Werkzeugs"""
     try:
-        with get_db_connection(DBConfig.TOOLS_DB) as tools_conn:
-            # Prüfe ob das Werkzeug verfügbar ist
-            tool = tools_conn.execute('''
-                SELECT * FROM tools 
-                WHERE barcode = ? AND status = 'Verfügbar'
-            ''', (tool_barcode,)).fetchone()
-            
-            if not tool:
-                return jsonify({'error': 'Werkzeug nicht verfügbar'})
-            
-            # Markiere als ausgeliehen
-            tools_conn.execute('''
-                UPDATE tools 
-                SET status = 'Ausgeliehen' 
-                WHERE barcode = ?
-            ''', (tool_barcode,))
-            tools_conn.commit()
-        
-        # Erstelle Ausleihvorgang
-        with get_db_connection(DBConfig.LENDINGS_DB) as lendings_conn:
-            lendings_conn.execute('''
-                INSERT INTO lendings 
-                (worker_barcode, item_barcode, item_type, checkout_time)
-                VALUES (?, ?, 'tool', CURRENT_TIMESTAMP)
-            ''', (worker_barcode, tool_barcode))
-            lendings_conn.commit()
-            
+        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+            lending_engine.checkout_tool(conn, tool_barcode, worker_barcode)
         return jsonify({'success': True, 'message': 'Ausleihe erfolgreich'})
-        
+    except LendingError as e:
+        return lending_error_response(e)
     except Exception as e:
-        logging.error(f"Fehler bei Werkzeugausleihe: {str(e)}")
+        logger.error(f"Fehler bei Werkzeugausleihe: {str(e)}")
         return jsonify({'error': 'Datenbankfehler'})
 
 def get_db_connection(db_path):
-    print(f"\n=== DB VERBINDUNG ===")
-    print(f"Verbinde mit: {db_path}")
+    logger.debug("DB VERBINDUNG")
+    logger.debug("Verbinde mit: %s", db_path)
     try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        print("Verbindung erfolgreich")
+        conn = DatabaseManager.get_connection(db_path)
+        logger.debug("Verbindung erfolgreich")
         return conn
     except Exception as e:
-        print(f"FEHLER bei Datenbankverbindung: {str(e)}")
+        logger.error("FEHLER bei Datenbankverbindung: %s", e)
         raise
 
 # Am Anfang der Datei nach den Imports
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.urandom(24)
+app.teardown_appcontext(DatabaseManager.release_thread)
+metrics.init_app(app, metrics.RequestMetrics(DBConfig.resolve(DBConfig.SYSTEM_DB)), METRICS_TOKEN)
+sql_profiler.init_app(app, DBConfig.resolve(DBConfig.SYSTEM_DB))
+logging_setup.init_app(app)
 
 @app.after_request
 def after_request(response):
@@ -3248,15 +4329,15 @@ def after_request(response):
 
 @app.route('/delete_worker', methods=['POST'])
 def delete_worker():
-    print("\n=== WORKER DELETE ROUTE ===")
+    logger.debug("WORKER DELETE ROUTE")
     try:
         data = request.json
         if not data or 'barcode' not in data:
-            print("Fehler: Kein Barcode im Request")
+            logger.warning("Fehler: Kein Barcode im Request")
             return jsonify({'error': 'Barcode fehlt'}), 400
             
         worker_barcode = data['barcode']
-        print(f"Versuche Mitarbeiter mit Barcode {worker_barcode} zu löschen")
+        logger.debug("Versuche Mitarbeiter mit Barcode %s zu löschen", worker_barcode)
         
         with get_db_connection(DBConfig.WORKERS_DB) as conn:
             worker = conn.execute(
@@ -3265,7 +4346,7 @@ def delete_worker():
             ).fetchone()
             
             if not worker:
-                print(f"Mitarbeiter mit Barcode {worker_barcode} nicht gefunden")
+                logger.warning("Mitarbeiter mit Barcode %s nicht gefunden", worker_barcode)
                 return jsonify({'error': 'Mitarbeiter nicht gefunden'}), 404
             
             conn.execute('''
@@ -3283,9 +4364,10 @@ def delete_worker():
             
             conn.execute('DELETE FROM workers WHERE barcode = ?', (worker_barcode,))
             conn.commit()
+            FilterCache.invalidate('workers')
             
 <<<<<<< Updated upstream
-            print(f"Mitarbeiter {worker['name']} {worker['lastname']} erfolgreich gelöscht")
+            logger.debug("Mitarbeiter %s %s erfolgreich gelöscht", worker['name'], worker['lastname'])
             return jsonify({
                 'success': True,
                 'message': f"Mitarbeiter {worker['name']} {worker['lastname']} wurde gelöscht"
@@ -3294,7 +4376,7 @@ def delete_worker():
         return jsonify({'success': True, 'message': 'Artikel erfolgreich zurückgegeben'})
             
     except Exception as e:
-        logging.error(f"Fehler bei Rückgabe: {str(e)}")
+        logger.error(f"Fehler bei Rückgabe: {str(e)}")
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/consume_item', methods=['POST'])
@@ -3304,58 +4386,35 @@ def consume_item():
         amount = int(request.form.get('amount'))
         worker_barcode = request.form.get('worker_barcode')
         
-        with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
-            item = conn.execute('SELECT * FROM consumables WHERE barcode = ?', 
+        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+            item = conn.execute('SELECT * FROM consumables_db.consumables WHERE barcode = ?', 
                               (barcode,)).fetchone()
 >>>>>>> Stashed changes
             
             if item:
-                old_stock = item['aktueller_bestand']
-                new_stock = old_stock - amount
-                
-                # Prüfe ob genug Bestand vorhanden ist
-                if new_stock < 0:
-                    return jsonify({
-                        'success': False, 
-                        'message': f'Nicht genügend Bestand vorhanden. Verfügbar: {old_stock}'
-                    })
-                
-                # Aktualisiere Bestand
-                conn.execute('''
-                    UPDATE consumables 
-                    SET aktueller_bestand = ? 
-                    WHERE barcode = ?
-                ''', (new_stock, barcode))
-                
-                # Erstelle Ausgabe-Eintrag
-                with get_db_connection(DBConfig.LENDINGS_DB) as lending_conn:
-                    lending_conn.execute('''
-                        INSERT INTO lendings 
-                        (worker_barcode, item_barcode, item_type, amount, 
-                         old_stock, new_stock, return_time)
-                        VALUES (?, ?, 'consumable', ?, ?, ?, CURRENT_TIMESTAMP)
-                    ''', (worker_barcode, barcode, amount, old_stock, new_stock))
-                
-                conn.commit()
+                # Bestand, Ausgabe-Eintrag und Historie in einer Transaktion
+                lending_engine.issue_consumable(conn, barcode, worker_barcode, amount,
+                                                session.get('username', 'System'))
                 return jsonify({'success': True})
                 
+    except LendingError as e:
+        return lending_error_response(e)
     except Exception as e:
 <<<<<<< Updated upstream
-        print(f"Fehler beim Löschen des Mitarbeiters: {str(e)}")
-        traceback.print_exc()
+        logger.error("Fehler beim Löschen des Mitarbeiters: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/delete_consumable', methods=['POST'])
 def delete_consumable():
-    print("\n=== CONSUMABLE DELETE ROUTE ===")
+    logger.debug("CONSUMABLE DELETE ROUTE")
     try:
         data = request.json
         if not data or 'barcode' not in data:
-            print("Fehler: Kein Barcode im Request")
+            logger.warning("Fehler: Kein Barcode im Request")
             return jsonify({'error': 'Barcode fehlt'}), 400
             
         consumable_barcode = data['barcode']
-        print(f"Versuche Verbrauchsmaterial mit Barcode {consumable_barcode} zu löschen")
+        logger.debug("Versuche Verbrauchsmaterial mit Barcode %s zu löschen", consumable_barcode)
         
         with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
             consumable = conn.execute(
@@ -3364,7 +4423,7 @@ def delete_consumable():
             ).fetchone()
             
             if not consumable:
-                print(f"Verbrauchsmaterial mit Barcode {consumable_barcode} nicht gefunden")
+                logger.warning("Verbrauchsmaterial mit Barcode %s nicht gefunden", consumable_barcode)
                 return jsonify({'error': 'Verbrauchsmaterial nicht gefunden'}), 404
             
             conn.execute('''
@@ -3385,31 +4444,31 @@ def delete_consumable():
             
             conn.execute('DELETE FROM consumables WHERE barcode = ?', (consumable_barcode,))
             conn.commit()
+            FilterCache.invalidate('consumables')
             
-            print(f"Verbrauchsmaterial {consumable['bezeichnung']} erfolgreich gelöscht")
+            logger.debug("Verbrauchsmaterial %s erfolgreich gelöscht", consumable['bezeichnung'])
             return jsonify({
                 'success': True,
                 'message': f"Verbrauchsmaterial {consumable['bezeichnung']} wurde gelöscht"
             })
             
     except Exception as e:
-        print(f"Fehler beim Löschen des Verbrauchsmaterials: {str(e)}")
-        traceback.print_exc()
+        logger.error("Fehler beim Löschen des Verbrauchsmaterials: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
     install_required_packages()
     
     if init_all_databases():
-        logging.info("Datenbanken erfolgreich initialisiert")
+        logger.info("Datenbanken erfolgreich initialisiert")
         import create_test_data
         create_test_data.create_test_data()
         
-        print("\n=== FLASK APP WIRD GESTARTET ===")
-        print("Verfügbare Routen:", [str(rule) for rule in app.url_map.iter_rules()])
+        logger.info("FLASK APP WIRD GESTARTET")
+        logger.info("Verfügbare Routen: %s", [str(rule) for rule in app.url_map.iter_rules()])
         app.run(debug=True, port=5000)
 =======
-        logging.error(f"Fehler beim Verbrauchen: {str(e)}")
+        logger.error(f"Fehler beim Verbrauchen: {str(e)}")
         return jsonify({'success': False, 'message': 'Fehler beim Verbrauchen'})
 
 @app.route('/update_consumable_stock', methods=['POST'])
@@ -3432,46 +4491,73 @@ def update_consumable_stock():
             flash('Der Mindestbestand darf nicht negativ sein.', 'error')
             return redirect(url_for('consumable_details', barcode=barcode))
         
-        with get_db_connection(DBConfig.CONSUMABLES_DB) as conn:
+        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
             conn.execute('''
-                UPDATE consumables 
-                SET aktueller_bestand = ?, mindestbestand = ?
+                UPDATE consumables_db.consumables 
+                SET mindestbestand = ?
                 WHERE barcode = ?
-            ''', (aktueller_bestand, mindestbestand, barcode))
+            ''', (mindestbestand, barcode))
             conn.commit()
+            # Bestand über die Engine, damit Status und Historie mitgeführt werden
+            lending_engine.set_stock(conn, barcode, aktueller_bestand,
+                                     session.get('username', 'System'))
             
+            audit_event('UPDATE', f"Verbrauchsmaterial {barcode} bearbeitet", barcode, 'consumable')
             flash('Verbrauchsmaterial erfolgreich aktualisiert', 'success')
             return redirect(url_for('consumable_details', barcode=barcode))
             
+    except LendingError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('consumable_details', barcode=barcode))
     except Exception as e:
-        logging.error(f"Fehler beim Aktualisieren des Verbrauchsmaterials: {str(e)}")
+        logger.error(f"Fehler beim Aktualisieren des Verbrauchsmaterials: {str(e)}")
         flash('Fehler beim Aktualisieren des Verbrauchsmaterials', 'error')
         return redirect(url_for('consumables'))  # Fallback zur Übersicht bei Fehler
 
 @app.route('/history')
 def history():
+    """Ausleihhistorie seitenweise, neueste zuerst, mit Filtern"""
     try:
+        filter_type = request.args.get('filter_type')
+        filters = {
+            'filter_from': parse_date(request.args.get('filter_from')),
+            'filter_to': parse_date(request.args.get('filter_to')),
+            'filter_type': filter_type if filter_type in ('tool', 'consumable') else None,
+            'filter_worker': request.args.get('filter_worker', '').strip() or None,
+            'filter_item': request.args.get('filter_item', '').strip() or None
+        }
+        
+        query = HISTORY_PAGE_QUERY
+        params = []
+        # Eingaben sind Kalendertage in Ortszeit, checkout_time ist UTC
+        if filters['filter_from']:
+            query += " AND l.checkout_time >= datetime(?, 'utc')"
+            params.append(filters['filter_from'])
+        if filters['filter_to']:
+            query += " AND l.checkout_time < datetime(?, '+1 day', 'utc')"
+            params.append(filters['filter_to'])
+        if filters['filter_type']:
+            query += ' AND l.item_type = ?'
+            params.append(filters['filter_type'])
+        if filters['filter_worker']:
+            query += ' AND l.worker_barcode = ?'
+            params.append(filters['filter_worker'])
+        if filters['filter_item']:
+            query += ' AND l.item_barcode = ?'
+            params.append(filters['filter_item'])
+        
+        pager = KeysetPager.from_request(HISTORY_SORTS, 'checkout_time', default_direction='desc')
+        query, params = pager.apply(query, params)
+        
         with get_db_connection(DBConfig.LENDINGS_DB) as conn:
-            history = conn.execute('''
-                SELECT l.*, w.name, w.lastname,
-                    CASE 
-                        WHEN l.item_type = 'tool' THEN t.gegenstand
-                        WHEN l.item_type = 'consumable' THEN c.bezeichnung
-                    END as item_name,
-                    CASE 
-                        WHEN l.item_type = 'tool' THEN t.typ
-                        WHEN l.item_type = 'consumable' THEN c.typ
-                    END as item_type_name
-                FROM lendings l
-                LEFT JOIN workers w ON l.worker_barcode = w.barcode
-                LEFT JOIN tools t ON l.item_barcode = t.barcode AND l.item_type = 'tool'
-                LEFT JOIN consumables c ON l.item_barcode = c.barcode AND l.item_type = 'consumable'
-                ORDER BY l.checkout_time DESC
-            ''').fetchall()
-            
-        return render_template('history.html', history=history)
+            history = pager.paginate(conn.execute(
+                HISTORY_QUERY.format(page=query, order=pager.order_by()), params
+            ).fetchall())
+        
+        # Die Seite ist begrenzt (KeysetPager), das HTML geht stückweise raus
+        return stream_template('history.html', history=history, pager=pager, **filters)
     except Exception as e:
-        logging.error(f"Fehler beim Laden der Historie: {str(e)}")
+        logger.error(f"Fehler beim Laden der Historie: {str(e)}")
         flash('Fehler beim Laden der Historie', 'error')
         return redirect(url_for('index'))
 
@@ -3482,7 +4568,7 @@ if __name__ == '__main__':
     
     # Initialisiere Datenbanken
     if init_all_databases():
-        logging.info("Datenbanken erfolgreich initialisiert")
+        logger.info("Datenbanken erfolgreich initialisiert")
         # Erstelle Testdaten
         import create_test_data
         create_test_data.create_test_data()
@@ -3490,78 +4576,28 @@ if __name__ == '__main__':
         app.run(debug=True)
 >>>>>>> Stashed changes
     else:
-        logging.error("Fehler bei der Datenbankinitialisierung")
+        logger.error("Fehler bei der Datenbankinitialisierung")
 
 def process_checkout(tool_barcode, worker_barcode):
     """Verarbeitet die Ausleihe eines Werkzeugs"""
     try:
-        with get_db_connection(DBConfig.TOOLS_DB) as tools_conn:
-            # Prüfe ob das Werkzeug verfügbar ist
-            tool = tools_conn.execute('''
-                SELECT * FROM tools 
-                WHERE barcode = ? AND status = 'Verfügbar'
-            ''', (tool_barcode,)).fetchone()
-            
-            if not tool:
-                return jsonify({'error': 'Werkzeug nicht verfügbar'})
-            
-            # Markiere als ausgeliehen
-            tools_conn.execute('''
-                UPDATE tools 
-                SET status = 'Ausgeliehen' 
-                WHERE barcode = ?
-            ''', (tool_barcode,))
-            tools_conn.commit()
-        
-        # Erstelle Ausleihvorgang
-        with get_db_connection(DBConfig.LENDINGS_DB) as lendings_conn:
-            lendings_conn.execute('''
-                INSERT INTO lendings 
-                (worker_barcode, item_barcode, item_type, checkout_time)
-                VALUES (?, ?, 'tool', CURRENT_TIMESTAMP)
-            ''', (worker_barcode, tool_barcode))
-            lendings_conn.commit()
-            
+        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+            lending_engine.checkout_tool(conn, tool_barcode, worker_barcode)
         return jsonify({'success': True, 'message': 'Ausleihe erfolgreich'})
-        
+    except LendingError as e:
+        return lending_error_response(e)
     except Exception as e:
-        logging.error(f"Fehler bei Werkzeugausleihe: {str(e)}")
+        logger.error(f"Fehler bei Werkzeugausleihe: {str(e)}")
         return jsonify({'error': 'Datenbankfehler'})
 
 def process_return(tool_barcode):
     """Verarbeitet die Rückgabe eines Werkzeugs"""
     try:
-        with get_db_connection(DBConfig.TOOLS_DB) as tools_conn:
-            # Prüfe ob das Werkzeug existiert
-            tool = tools_conn.execute('''
-                SELECT * FROM tools 
-                WHERE barcode = ?
-            ''', (tool_barcode,)).fetchone()
-            
-            if not tool:
-                return jsonify({'error': 'Werkzeug nicht gefunden'})
-            
-            # Markiere als verfügbar
-            tools_conn.execute('''
-                UPDATE tools 
-                SET status = 'Verfügbar' 
-                WHERE barcode = ?
-            ''', (tool_barcode,))
-            tools_conn.commit()
-        
-        # Aktualisiere Ausleihvorgang
-        with get_db_connection(DBConfig.LENDINGS_DB) as lendings_conn:
-            lendings_conn.execute('''
-                UPDATE lendings 
-                SET return_time = CURRENT_TIMESTAMP
-                WHERE item_barcode = ? 
-                AND item_type = 'tool'
-                AND return_time IS NULL
-            ''', (tool_barcode,))
-            lendings_conn.commit()
-            
+        with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+            lending_engine.return_tool(conn, tool_barcode)
         return jsonify({'success': True, 'message': 'Rückgabe erfolgreich'})
-        
+    except LendingError as e:
+        return lending_error_response(e)
     except Exception as e:
-        logging.error(f"Fehler bei Werkzeugrückgabe: {str(e)}")
+        logger.error(f"Fehler bei Werkzeugrückgabe: {str(e)}")
         return jsonify({'error': 'Datenbankfehler'})
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""Regressions-Benchmark für die Werkzeugliste der Startseite.
+
+Erzeugt mit create_test_data.py einen Datenbestand mit 10.000 Werkzeugen in
+einem temporären Verzeichnis und vergleicht die frühere Abfrage mit
+korrelierten Unterabfragen gegen TOOL_LIST_QUERY (Ergebnis und Laufzeit).
+Gemessen wird einmal mit den Indizes aus DBConfig.INDEXES und einmal ohne sie;
+die alte Abfrage ist nur mit Indizes brauchbar, TOOL_LIST_QUERY nicht darauf
+angewiesen. Ohne Indizes muss TOOL_LIST_QUERY schneller sein, mit Indizes
+darf sie höchstens um TOLERANZ langsamer sein.
+
+Aufruf: python benchmark_index.py [anzahl_werkzeuge] [wiederholungen]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Vor dem Import von app setzen, damit keine echten Daten angefasst werden
+os.environ['INVENTAR_DB_DIR'] = tempfile.mkdtemp(prefix='inventar_bench_')
+
+from app import DBConfig, TOOL_LIST_QUERY, get_db_connection
+import create_test_data
+
+# Frühere Abfrage mit bis zu drei Unterabfragen pro Werkzeug
+LEGACY_QUERY = '''
+    SELECT t.*,
+        CASE
+            WHEN t.status = 'Defekt' THEN (
+                SELECT strftime('%d.%m.%Y %H:%M', timestamp)
+                FROM tool_status_history
+                WHERE tool_barcode = t.barcode
+                AND new_status = 'Defekt'
+                ORDER BY timestamp DESC
+                LIMIT 1
+            )
+            WHEN t.status = 'Ausgeliehen' THEN (
+                SELECT strftime('%d.%m.%Y %H:%M', l.checkout_time)
+                FROM lendings_db.lendings l
+                WHERE l.item_barcode = t.barcode
+                AND l.return_time IS NULL
+                ORDER BY l.checkout_time DESC
+                LIMIT 1
+            )
+            ELSE NULL
+        END as status_date,
+        CASE
+            WHEN t.status = 'Ausgeliehen' THEN (
+                SELECT w.name || ' ' || w.lastname
+                FROM lendings_db.lendings l
+                JOIN workers_db.workers w ON l.worker_barcode = w.barcode
+                WHERE l.item_barcode = t.barcode
+                AND l.return_time IS NULL
+                ORDER BY l.checkout_time DESC
+                LIMIT 1
+            )
+            ELSE NULL
+        END as current_worker
+    FROM tools t
+    WHERE 1=1
+'''
+
+# Erlaubter Mehraufwand gegenüber der alten Abfrage, wenn beide Indizes nutzen
+TOLERANZ = 1.5
+
+def time_query(conn, query, runs):
+    """Führt die Abfrage runs-mal aus und liefert (Laufzeiten in ms, Ergebnis)"""
+    durations = []
+    rows = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        rows = conn.execute(query + ' ORDER BY t.gegenstand').fetchall()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations, rows
+
+def project(rows):
+    return sorted((row['barcode'], row['status_date'], row['current_worker']) for row in rows)
+
+def drop_indexes():
+    """Entfernt die Indizes aus DBConfig.INDEXES aus der Benchmark-Datenbank"""
+    for db_path in (DBConfig.TOOLS_DB, DBConfig.LENDINGS_DB):
+        conn = get_db_connection(db_path)
+        for index_name in DBConfig.INDEXES.get(db_path, {}):
+            conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+        conn.commit()
+
+def compare(conn, runs, label):
+    """Misst beide Abfragen und liefert (alt_ms, neu_ms, identisch)"""
+    legacy_times, legacy_rows = time_query(conn, LEGACY_QUERY, runs)
+    new_times, new_rows = time_query(conn, TOOL_LIST_QUERY, runs)
+
+    legacy_ms = statistics.median(legacy_times)
+    new_ms = statistics.median(new_times)
+    print(f"\n{label} ({runs} Durchläufe, Median)")
+    print(f"  korrelierte Unterabfragen: {legacy_ms:8.1f} ms")
+    print(f"  TOOL_LIST_QUERY:           {new_ms:8.1f} ms")
+    print(f"  Faktor:                    {legacy_ms / max(new_ms, 0.001):8.1f}x")
+    return legacy_ms, new_ms, project(legacy_rows) == project(new_rows)
+
+def run_benchmark(tool_count=10000, runs=5):
+    print(f"Datenbestand in {DBConfig.DB_DIR}")
+    create_test_data.init_dbs()
+    create_test_data.create_test_data(tool_count)
+
+    conn = get_db_connection(DBConfig.TOOLS_DB)
+    total = conn.execute('SELECT COUNT(*) FROM tools').fetchone()[0]
+    print(f"\n{total} Werkzeuge")
+
+    legacy_ms, new_ms, same = compare(conn, runs, 'Mit Indizes')
+    if not same:
+        print("✗ Ergebnisse weichen voneinander ab")
+        return False
+    if new_ms > legacy_ms * TOLERANZ:
+        print(f"✗ TOOL_LIST_QUERY ist mehr als {TOLERANZ}x langsamer als die alte Abfrage")
+        return False
+
+    drop_indexes()
+    legacy_ms, new_ms, same = compare(conn, runs, 'Ohne Indizes')
+    if not same:
+        print("✗ Ergebnisse weichen voneinander ab")
+        return False
+    if new_ms > legacy_ms:
+        print("✗ TOOL_LIST_QUERY ist ohne Indizes langsamer als die alte Abfrage")
+        return False
+
+    print("\n✓ Ergebnisse identisch")
+    return True
+
+if __name__ == '__main__':
+    tool_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    sys.exit(0 if run_benchmark(tool_count, runs) else 1)
@@ -1,6 +1,7 @@
 import sqlite3
 import random
 import os
+import sys
 from app import DBConfig, get_db_connection
 import logging
 from datetime import datetime, timedelta
@@ -196,7 +197,8 @@ def create_random_date(start_date, end_date):
     random_number_of_days = random.randrange(days_between_dates)
     return start_date + timedelta(days=random_number_of_days)
 
-def create_test_data():
+def create_test_data(tool_count=None):
+    """Erstellt Testdaten; tool_count skaliert die Werkzeuganzahl (z.B. 10000 für Benchmarks)"""
     print("\n=== ERSTELLE TESTDATEN ===")
     try:
         # Mitarbeiter-Testdaten
@@ -259,10 +261,16 @@ def create_test_data():
                 
                 test_tools = []
                 ausgeliehene_werkzeuge = []
+                defekte_werkzeuge = []
                 tool_counter = 1
+                
+                # Anzahl je Werkzeug proportional auf tool_count hochrechnen
+                faktor = 1
+                if tool_count:
+                    faktor = tool_count / sum(anzahl for _, _, anzahl in werkzeuge)
 
                 for werkzeug, typ, anzahl in werkzeuge:
-                    for i in range(anzahl):
+                    for i in range(max(1, round(anzahl * faktor))):
                         barcode = f'W{str(tool_counter).zfill(4)}'
                         tool_counter += 1
                         
@@ -277,12 +285,20 @@ def create_test_data():
                         
                         if status == 'Ausgeliehen':
                             ausgeliehene_werkzeuge.append(barcode)
+                        elif status == 'Defekt':
+                            defekt_date = datetime.now() - timedelta(days=random.randint(1, 60))
+                            defekte_werkzeuge.append((barcode, 'Verfügbar', 'Defekt', defekt_date))
 
                 conn.executemany('''
                     INSERT OR IGNORE INTO tools 
                     (barcode, gegenstand, ort, typ, status, image_path)
                     VALUES (?, ?, ?, ?, ?, ?)
                 ''', test_tools)
+                conn.executemany('''
+                    INSERT INTO tool_status_history 
+                    (tool_barcode, old_status, new_status, changed_by, timestamp)
+                    VALUES (?, ?, ?, 'Testdaten', ?)
+                ''', defekte_werkzeuge)
                 conn.commit()
                 logging.info(f"{len(test_tools)} Werkzeug-Testdaten erfolgreich eingefügt")
 
@@ -474,4 +490,5 @@ if __name__ == "__main__":
     print("\nLösche alte Daten...")
     clear_existing_data()
     print("\nErstelle neue Testdaten...")
-    create_test_data() 
\ No newline at end of file
+    # Optional: python create_test_data.py <anzahl_werkzeuge>
+    create_test_data(int(sys.argv[1]) if len(sys.argv) > 1 else None) 
\ No newline at end of file
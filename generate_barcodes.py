@@ -1,9 +1,18 @@
 from PIL import Image, ImageDraw, ImageFont
 import barcode
 from barcode.writer import ImageWriter
+from reportlab.graphics.barcode.code128 import Code128
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+import argparse
 import sqlite3
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
 import math
+import os
+import time
 
 # Pfade zu den Datenbanken
 DB_PATH = Path.cwd()
@@ -15,6 +24,44 @@ CONSUMABLES_DB = DB_PATH / 'consumables.db'
 OUTPUT_DIR = Path('barcodes')
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+# Cache gerenderter Etiketten, adressiert über (Code, Name, Größe)
+CACHE_DIR = OUTPUT_DIR / 'cache'
+# Bei Änderungen am Etikettenlayout erhöhen - macht alle Cache-Einträge ungültig
+LABEL_VERSION = 1
+# Einträge, die so lange nicht benutzt wurden, werden gelöscht
+CACHE_MAX_AGE_DAYS = 30
+# Erst ab so vielen neu zu rendernden Etiketten lohnt der Prozesspool
+PARALLEL_MIN_LABELS = 50
+
+# Etikettenbögen (Maße in mm): Spalten x Zeilen, Etikettengröße, Ränder und
+# Abstände wie im Datenblatt des Herstellers
+LABEL_TEMPLATES = {
+    'avery-l7160': {
+        'description': 'Avery L7160, 63,5 x 38,1 mm, 21 pro Blatt',
+        'columns': 3, 'rows': 7, 'width': 63.5, 'height': 38.1,
+        'left': 7.25, 'top': 15.15, 'col_gap': 2.5, 'row_gap': 0,
+    },
+    'avery-l7163': {
+        'description': 'Avery L7163, 99,1 x 38,1 mm, 14 pro Blatt',
+        'columns': 2, 'rows': 7, 'width': 99.1, 'height': 38.1,
+        'left': 4.65, 'top': 15.15, 'col_gap': 2.5, 'row_gap': 0,
+    },
+    'avery-l7173': {
+        'description': 'Avery L7173, 99,1 x 57 mm, 10 pro Blatt',
+        'columns': 2, 'rows': 5, 'width': 99.1, 'height': 57,
+        'left': 4.65, 'top': 6, 'col_gap': 2.5, 'row_gap': 0,
+    },
+    'avery-l7651': {
+        'description': 'Avery L7651, 38,1 x 21,2 mm, 65 pro Blatt',
+        'columns': 5, 'rows': 13, 'width': 38.1, 'height': 21.2,
+        'left': 4.75, 'top': 10.7, 'col_gap': 2.5, 'row_gap': 0,
+    },
+}
+DEFAULT_TEMPLATE = 'avery-l7160'
+# Innenabstand im Etikett und größte Modulbreite (schmalster Strich) in mm
+LABEL_PADDING = 2
+MAX_BAR_WIDTH = 0.5
+
 def get_db_connection(db_path):
     """Erstellt eine neue Datenbankverbindung"""
     try:
@@ -52,8 +99,129 @@ def create_barcode_image(code, name):
     
     return final_img
 
-def create_barcode_sheet(items, filename, title):
-    """Erstellt ein A4-Blatt mit mehreren Barcodes"""
+def label_cache_path(code, name, size):
+    """Cache-Pfad eines Etiketts; ändert sich mit Code, Name, Größe oder LABEL_VERSION"""
+    key = hashlib.sha256(
+        f"{LABEL_VERSION}\0{code}\0{name}\0{size[0]}x{size[1]}".encode('utf-8')
+    ).hexdigest()
+    return CACHE_DIR / key[:2] / f"{key}.png"
+
+def render_label(code, name, size, path):
+    """Rendert ein Etikett in Zielgröße in den Cache (läuft auch im Prozesspool)"""
+    label = create_barcode_image(code, name).resize(size, Image.Resampling.LANCZOS)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Erst unter temporärem Namen schreiben, damit nie halbe Dateien im Cache liegen
+    tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+    label.save(tmp, 'PNG')
+    os.replace(tmp, path)
+    return path
+
+def _render_label(args):
+    return render_label(*args)
+
+def render_labels(items, size, workers=None, progress=None):
+    """Liefert je Item den Pfad seines Etiketts; fehlende werden gerendert.
+
+    Ab PARALLEL_MIN_LABELS fehlenden Etiketten verteilt ein Prozesspool mit
+    workers Prozessen (Standard: alle Kerne) die Arbeit.
+    """
+    paths = [label_cache_path(item['barcode'], item['name'], size) for item in items]
+    missing = {}
+    for item, path in zip(items, paths):
+        if path.exists():
+            os.utime(path)  # als benutzt markieren, siehe prune_label_cache
+        else:
+            missing[path] = (item['barcode'], item['name'], size, path)
+
+    tasks = list(missing.values())
+    done = len(items) - len(tasks)
+    workers = workers or os.cpu_count() or 1
+    if len(tasks) >= PARALLEL_MIN_LABELS and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(_render_label, tasks, chunksize=16):
+                done += 1
+                if progress:
+                    progress(done, len(items))
+    else:
+        for task in tasks:
+            _render_label(task)
+            done += 1
+            if progress:
+                progress(done, len(items))
+    return paths
+
+def prune_label_cache(max_age_days=CACHE_MAX_AGE_DAYS):
+    """Löscht Etiketten, die seit max_age_days nicht mehr verwendet wurden"""
+    if not CACHE_DIR.exists():
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for path in CACHE_DIR.glob('*/*'):
+        if path.stat().st_mtime < cutoff:
+            path.unlink()
+            removed += 1
+    return removed
+
+def _draw_label(pdf, item, x, y, width, height):
+    """Zeichnet ein Etikett mit der linken unteren Ecke bei (x, y), Maße in pt"""
+    padding = LABEL_PADDING * mm
+    inner_width = width - 2 * padding
+    font_size = min(9, height * 0.16)
+
+    # Text wie beim Rasteretikett; passt er nicht, wird der Name gekürzt, nie der Code
+    name, suffix = item['name'][:30], f" - {item['barcode']}"
+    text = name + suffix
+    while name and pdf.stringWidth(text, 'Helvetica', font_size) > inner_width:
+        name = name[:-1]
+        text = name.rstrip() + '…' + suffix
+    pdf.setFont('Helvetica', font_size)
+    pdf.drawCentredString(x + width / 2, y + padding, text)
+
+    # Code128 auf die Etikettenbreite skalieren (Ruhezonen inklusive)
+    bar_height = height - 2 * padding - font_size * 1.5
+    probe = Code128(item['barcode'], barWidth=1, barHeight=bar_height)
+    bar_width = min(inner_width / probe.width, MAX_BAR_WIDTH * mm)
+    code = Code128(item['barcode'], barWidth=bar_width, barHeight=bar_height)
+    code.drawOn(pdf, x + (width - code.width) / 2, y + padding + font_size * 1.5)
+
+def create_label_pdf(items, filename, title, output_dir=OUTPUT_DIR, template=DEFAULT_TEMPLATE,
+                     progress=None):
+    """Erstellt eine mehrseitige PDF mit Etiketten im Raster des Etikettenbogens.
+
+    Die Barcodes werden als Vektorgrafik gezeichnet - die Datei bleibt klein
+    und druckt in jeder Auflösung scharf. progress(fertig, gesamt) je Etikett.
+    """
+    if not items:
+        print(f"Keine Daten für {filename}")
+        return False
+    if template not in LABEL_TEMPLATES:
+        raise ValueError(f"Unbekannte Etikettenvorlage: {template}")
+    layout = LABEL_TEMPLATES[template]
+    width, height = layout['width'] * mm, layout['height'] * mm
+    per_page = layout['columns'] * layout['rows']
+    page_width, page_height = A4
+
+    pdf = canvas.Canvas(str(Path(output_dir) / f"{filename}.pdf"), pagesize=A4)
+    pdf.setTitle(title)
+    for i, item in enumerate(items):
+        slot = i % per_page
+        if i and not slot:
+            pdf.showPage()
+        column, row = slot % layout['columns'], slot // layout['columns']
+        x = (layout['left'] + column * (layout['width'] + layout['col_gap'])) * mm
+        top = (layout['top'] + row * (layout['height'] + layout['row_gap'])) * mm
+        _draw_label(pdf, item, x, page_height - top - height, width, height)
+        if progress:
+            progress(i + 1, len(items))
+    pdf.save()
+    return True
+
+def create_barcode_sheet(items, filename, title, output_dir=OUTPUT_DIR, progress=None, workers=None):
+    """Erstellt A4-Seiten als Rasterbild (300 dpi), eine PDF je Seite.
+
+    progress(fertig, gesamt) je Etikett; create_label_pdf ist meist die bessere Wahl.
+    """
     if not items:
         print(f"Keine Daten für {filename}")
         return False
@@ -80,19 +248,17 @@ def create_barcode_sheet(items, filename, title):
     
     current_x = 30
     current_y = 100  # Start unter dem Titel
+    page_number = 1
+    page_empty = True
     
-    for i, item in enumerate(items):
-        # Neuer Barcode
-        barcode_img = create_barcode_image(item['barcode'], item['name'])
-        
-        # Barcode auf gewünschte Größe skalieren
-        scaled_barcode = barcode_img.resize(
-            (barcode_width, barcode_height), 
-            Image.Resampling.LANCZOS
-        )
-        
+    # Etiketten in Zielgröße aus dem Cache, fehlende parallel rendern
+    labels = render_labels(items, (barcode_width, barcode_height), workers, progress)
+    
+    for i, label_path in enumerate(labels):
         # Barcode einfügen
-        page.paste(scaled_barcode, (current_x, current_y))
+        with Image.open(label_path) as label:
+            page.paste(label, (current_x, current_y))
+        page_empty = False
         
         # Position für nächsten Barcode
         current_x += barcode_width + 30
@@ -105,18 +271,25 @@ def create_barcode_sheet(items, filename, title):
             # Neue Seite wenn nötig
             if current_y + barcode_height > page_height - 30:
                 # Aktuelle Seite speichern
-                page.save(str(OUTPUT_DIR / f"{filename}_{(i+1)//30}.pdf"))
+                page.save(str(Path(output_dir) / f"{filename}_{page_number}.pdf"))
                 # Neue Seite beginnen
+                page_number += 1
                 page = Image.new('RGB', (page_width, page_height), 'white')
-                draw = ImageDraw.Draw(page)
+                page_empty = True
                 current_y = 30
     
     # Letzte Seite speichern
-    page.save(str(OUTPUT_DIR / f"{filename}_{(len(items)-1)//30 + 1}.pdf"))
+    if not page_empty:
+        page.save(str(Path(output_dir) / f"{filename}_{page_number}.pdf"))
     return True
 
-def main():
+def main(template=DEFAULT_TEMPLATE, raster=False):
     print("Starte Barcode-Generierung...")
+
+    def write_sheet(items, filename, title):
+        if raster:
+            return create_barcode_sheet(items, filename, title)
+        return create_label_pdf(items, filename, title, template=template)
     
     # Werkzeuge und Verbrauchsmaterial
     items = []
@@ -157,8 +330,8 @@ def main():
     
     # Werkzeuge und Verbrauchsmaterial PDF erstellen
     if items:
-        if create_barcode_sheet(items, 'werkzeuge_material', 'Werkzeuge und Verbrauchsmaterial'):
-            print(f"PDFs für {len(items)} Werkzeuge und Materialien erstellt")
+        if write_sheet(items, 'werkzeuge_material', 'Werkzeuge und Verbrauchsmaterial'):
+            print(f"PDF für {len(items)} Werkzeuge und Materialien erstellt")
     
     # Mitarbeiter separat
     if WORKERS_DB.exists():
@@ -171,18 +344,28 @@ def main():
                     ORDER BY name, lastname
                 ''').fetchall()
                 if workers:
-                    if create_barcode_sheet(
+                    if write_sheet(
                         [dict(worker) for worker in workers],
                         'mitarbeiter',
                         'Mitarbeiter'
                     ):
-                        print(f"PDFs für {len(workers)} Mitarbeiter erstellt")
+                        print(f"PDF für {len(workers)} Mitarbeiter erstellt")
             except Exception as e:
                 print(f"Fehler beim Laden der Mitarbeiter: {e}")
             finally:
                 conn.close()
 
+    removed = prune_label_cache()
+    if removed:
+        print(f"{removed} veraltete Etiketten aus dem Cache entfernt")
+
     print(f"\nPDF-Dateien wurden im Verzeichnis '{OUTPUT_DIR}' erstellt")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Barcode-Etiketten als PDF erstellen')
+    parser.add_argument('--template', choices=sorted(LABEL_TEMPLATES), default=DEFAULT_TEMPLATE,
+                        help='Etikettenbogen (Standard: %(default)s)')
+    parser.add_argument('--raster', action='store_true',
+                        help='Alte Rasterblätter (eine PDF pro Seite) statt Etikettenbogen')
+    args = parser.parse_args()
+    main(args.template, args.raster)
\ No newline at end of file
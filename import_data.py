@@ -0,0 +1,61 @@
+"""Massenimport von Mitarbeitern, Werkzeugen oder Verbrauchsmaterial aus xlsx/CSV.
+
+Die erste Zeile muss die Spaltennamen enthalten (z.B. barcode, name, lastname,
+bereich, email); vorhandene Barcodes werden aktualisiert, neue angelegt. Mit
+--dry-run wird alles geprüft, aber nichts gespeichert.
+
+Aufruf: python import_data.py workers|tools|consumables datei.xlsx [--dry-run]
+"""
+import argparse
+import sqlite3
+import sys
+import time
+import traceback
+from app import DBConfig, FilterCache
+from utils import bulk_import
+
+TARGET_DBS = {
+    'workers': DBConfig.WORKERS_DB,
+    'tools': DBConfig.TOOLS_DB,
+    'consumables': DBConfig.CONSUMABLES_DB
+}
+
+def run(target, path, dry_run=False):
+    conn = sqlite3.connect(DBConfig.resolve(TARGET_DBS[target]), isolation_level=None)
+    try:
+        conn.execute(f"PRAGMA busy_timeout = {DBConfig.PRAGMA_DEFAULTS['busy_timeout']}")
+        started = time.perf_counter()
+        summary = bulk_import.import_file(conn, target, path, dry_run)
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+
+    for error in summary['errors']:
+        print(f"    Zeile {error['line']}: {error['message']}")
+    if summary['error_count'] > len(summary['errors']):
+        print(f"    ... und {summary['error_count'] - len(summary['errors'])} weitere Fehler")
+    if summary['ignored_columns']:
+        print(f"    Ignorierte Spalten: {', '.join(summary['ignored_columns'])}")
+    print(f"{'✗' if summary['error_count'] else '✓'} {summary['rows']} Zeilen in {elapsed:.1f} s: "
+          f"{summary['inserted']} neu, {summary['updated']} aktualisiert, {summary['error_count']} Fehler"
+          f"{' (Probelauf, nichts gespeichert)' if dry_run else ''}")
+
+    if not dry_run and (summary['inserted'] or summary['updated']):
+        FilterCache.invalidate(bulk_import.TARGETS[target]['table'])
+    return not summary['error_count']
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Stammdaten aus xlsx/CSV importieren')
+    parser.add_argument('target', choices=sorted(TARGET_DBS), help='Zieltabelle')
+    parser.add_argument('path', help='.xlsx- oder .csv-Datei')
+    parser.add_argument('--dry-run', action='store_true', help='Nur prüfen, nichts speichern')
+    args = parser.parse_args()
+    try:
+        sys.exit(0 if run(args.target, args.path, args.dry_run) else 1)
+    except bulk_import.BulkImportError as e:
+        print(f"✗ {str(e)}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ Fehler beim Import: {str(e)}")
+        print(traceback.format_exc())
+        sys.exit(1)
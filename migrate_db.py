@@ -0,0 +1,149 @@
+"""Kopiert die fünf Einzeldatenbanken in die Ein-Datei-Datenbank (DBConfig.SINGLE_DB).
+
+Die Quellen werden per ATTACH in einer Lesetransaktion gelesen; im WAL-Modus
+kann die Anwendung währenddessen weiterlaufen. Danach INVENTAR_DB_LAYOUT=single
+setzen und die Anwendung neu starten.
+
+Aufruf: python migrate_db.py [--target PFAD] [--force]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import traceback
+from app import DBConfig
+
+SOURCES = [
+    DBConfig.WORKERS_DB,
+    DBConfig.TOOLS_DB,
+    DBConfig.LENDINGS_DB,
+    DBConfig.CONSUMABLES_DB,
+    DBConfig.SYSTEM_DB
+]
+
+# Abgeleitete Tabellen werden nicht kopiert, sondern beim Start neu aufgebaut;
+# Volltextindizes samt ihrer Schattentabellen (<name>_data, <name>_idx, ...)
+DERIVED_TABLES = {'dashboard_stats', 'stock_snapshots'}
+DERIVED_PREFIXES = tuple(fts_name for _, fts_name, _ in DBConfig.SEARCH_INDEXES.values())
+
+def source_tables(conn):
+    """Liefert (name, create_sql) aller Tabellen der eingehängten Quelle"""
+    return conn.execute('''
+        SELECT name, sql FROM src.sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+    ''').fetchall()
+
+def table_columns(conn, schema, table_name):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table_name})")]
+
+def ensure_target_schema(conn):
+    """Legt alle in DBConfig.SCHEMAS definierten Tabellen an"""
+    for db_path in SOURCES:
+        for table_name, schema in DBConfig.SCHEMAS[db_path].items():
+            conn.execute(schema)
+    conn.commit()
+
+def copy_source(conn, source, force=False):
+    """Kopiert alle Tabellen einer Quelldatenbank in main"""
+    copied = {}
+    conn.execute("ATTACH DATABASE ? AS src", (source,))
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        for table_name, create_sql in source_tables(conn):
+            if table_name in DERIVED_TABLES or table_name.startswith(DERIVED_PREFIXES):
+                continue
+            exists = conn.execute(
+                "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?",
+                (table_name,)
+            ).fetchone()
+            if not exists:
+                conn.execute(create_sql)
+            else:
+                # Trigger des Ziels (Zähler, Bestandsbuch) würden beim Kopieren doppelt
+                # buchen bzw. das Löschen verhindern; die Anwendung legt sie beim Start neu an
+                for (trigger_name,) in conn.execute(
+                    "SELECT name FROM main.sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+                    (table_name,)
+                ).fetchall():
+                    conn.execute(f"DROP TRIGGER main.{trigger_name}")
+                if conn.execute(f"SELECT 1 FROM main.{table_name} LIMIT 1").fetchone():
+                    if not force:
+                        raise RuntimeError(f"Zieltabelle {table_name} enthält bereits Daten (--force zum Überschreiben)")
+                    conn.execute(f"DELETE FROM main.{table_name}")
+
+            target_columns = set(table_columns(conn, 'main', table_name))
+            columns = [c for c in table_columns(conn, 'src', table_name) if c in target_columns]
+            column_list = ', '.join(columns)
+            conn.execute(f'''
+                INSERT INTO main.{table_name} ({column_list})
+                SELECT {column_list} FROM src.{table_name}
+            ''')
+            copied[table_name] = conn.execute(
+                f"SELECT COUNT(*) FROM src.{table_name}"
+            ).fetchone()[0]
+
+        # Vorhandene Indizes mitnehmen
+        for index_name, index_sql in conn.execute('''
+            SELECT name, sql FROM src.sqlite_master
+            WHERE type = 'index' AND sql IS NOT NULL
+        ''').fetchall():
+            if not conn.execute("SELECT 1 FROM main.sqlite_master WHERE name = ?",
+                                (index_name,)).fetchone():
+                conn.execute(index_sql)
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE src")
+    return copied
+
+def verify_counts(conn, copied):
+    """Vergleicht die Zeilenzahlen im Ziel mit den kopierten Mengen"""
+    ok = True
+    for table_name, expected in copied.items():
+        actual = conn.execute(f"SELECT COUNT(*) FROM main.{table_name}").fetchone()[0]
+        if actual != expected:
+            print(f"✗ {table_name}: {actual} statt {expected} Zeilen")
+            ok = False
+    return ok
+
+def migrate_to_single_db(target=None, force=False):
+    target = target or DBConfig.SINGLE_DB
+    print(f"Migriere nach {target}")
+    conn = sqlite3.connect(target, isolation_level=None)
+    try:
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute(f"PRAGMA busy_timeout = {DBConfig.PRAGMA_DEFAULTS['busy_timeout']}")
+        ensure_target_schema(conn)
+
+        copied = {}
+        for source in SOURCES:
+            if not os.path.exists(source) or os.path.abspath(source) == os.path.abspath(target):
+                print(f"- {os.path.basename(source)} übersprungen")
+                continue
+            result = copy_source(conn, source, force)
+            copied.update(result)
+            print(f"✓ {os.path.basename(source)}: " +
+                  ', '.join(f"{name}={count}" for name, count in result.items()))
+
+        if not verify_counts(conn, copied):
+            return False
+        conn.execute('PRAGMA optimize')
+        print("✓ Migration abgeschlossen - INVENTAR_DB_LAYOUT=single setzen und neu starten")
+        return True
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Einzeldatenbanken in eine Datei migrieren')
+    parser.add_argument('--target', help='Zieldatei (Standard: DBConfig.SINGLE_DB)')
+    parser.add_argument('--force', action='store_true', help='Vorhandene Zieldaten überschreiben')
+    args = parser.parse_args()
+    try:
+        sys.exit(0 if migrate_to_single_db(args.target, args.force) else 1)
+    except Exception as e:
+        print(f"✗ Fehler bei der Migration: {str(e)}")
+        print(traceback.format_exc())
+        sys.exit(1)
@@ -0,0 +1,69 @@
+"""Baut die Dashboard-Zähler (dashboard_stats) samt Triggern neu auf.
+
+Nötig, wenn Daten an den Triggern vorbei geändert wurden, z.B. durch einen
+Import mit einem externen SQLite-Werkzeug. Mit --check werden Abweichungen
+nur angezeigt und nichts geschrieben.
+
+Aufruf: python rebuild_stats.py [--check]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import traceback
+from app import DBConfig
+
+def read_stats(conn):
+    try:
+        return dict(conn.execute('SELECT name, value FROM dashboard_stats').fetchall())
+    except sqlite3.OperationalError:
+        return {}
+
+def rebuild(db_path, check=False):
+    """Zählt eine Datenbank neu; liefert die abweichenden Zähler als {name: (alt, neu)}"""
+    conn = sqlite3.connect(DBConfig.resolve(db_path), isolation_level=None)
+    try:
+        conn.execute(f"PRAGMA busy_timeout = {DBConfig.PRAGMA_DEFAULTS['busy_timeout']}")
+        conn.execute('BEGIN IMMEDIATE')
+        before = read_stats(conn)
+        DBConfig.rebuild_dashboard_stats(conn, db_path)
+        after = read_stats(conn)
+        conn.execute('ROLLBACK' if check else 'COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+    return {name: (before.get(name, 0), after.get(name, 0))
+            for name in set(before) | set(after)
+            if before.get(name, 0) != after.get(name, 0)}
+
+def rebuild_all(check=False):
+    ok = True
+    for db_path in DBConfig.DASHBOARD_COUNTERS:
+        if not os.path.exists(DBConfig.resolve(db_path)):
+            print(f"- {os.path.basename(db_path)} übersprungen")
+            continue
+        drift = rebuild(db_path, check)
+        if not drift:
+            print(f"✓ {os.path.basename(db_path)}: Zähler stimmen")
+            continue
+        ok = False
+        print(f"{'✗' if check else '✓'} {os.path.basename(db_path)}: {len(drift)} Zähler "
+              f"{'weichen ab' if check else 'korrigiert'}")
+        for name, (old, new) in sorted(drift.items()):
+            print(f"    {name}: {old} -> {new}")
+    return ok or not check
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Dashboard-Zähler neu aufbauen')
+    parser.add_argument('--check', action='store_true', help='Nur prüfen, nichts schreiben')
+    args = parser.parse_args()
+    try:
+        sys.exit(0 if rebuild_all(args.check) else 1)
+    except Exception as e:
+        print(f"✗ Fehler beim Neuaufbau: {str(e)}")
+        print(traceback.format_exc())
+        sys.exit(1)
@@ -1,79 +1,279 @@
-from flask import send_file, flash, redirect, url_for, current_app
+from flask import Response, flash, redirect, url_for, current_app, request, jsonify, stream_with_context, session
 from . import export_bp
 import os
 import logging
 import sqlite3
-from datetime import datetime
-import pandas as pd
+import uuid
+from werkzeug.utils import secure_filename
+from utils.excel_handler import ExcelHandler
+from utils import table_export, jobs, bulk_import, audit, cache_generations
+from utils.table_export import ExportError
+from utils.jobs import JobError
+from utils.bulk_import import BulkImportError
+
+logger = logging.getLogger(__name__)
 
 # DBConfig direkt hier definieren
 class DBConfig:
     SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    DB_DIR = os.path.join(SRC_DIR, 'db')
+    DB_DIR = os.environ.get('INVENTAR_DB_DIR', os.path.join(SRC_DIR, 'db'))
     
     WORKERS_DB = os.path.join(DB_DIR, 'workers.db')
     TOOLS_DB = os.path.join(DB_DIR, 'lager.db')
     LENDINGS_DB = os.path.join(DB_DIR, 'lendings.db')
     CONSUMABLES_DB = os.path.join(DB_DIR, 'consumables.db')
+    SYSTEM_DB = os.path.join(DB_DIR, 'system_logs.db')
 
-# ExcelHandler direkt hier definieren
-class ExcelHandler:
-    @staticmethod
-    def export_to_excel(db_path, output_dir='exports'):
-        try:
-            os.makedirs(output_dir, exist_ok=True)
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
-            
-            db_name = os.path.splitext(os.path.basename(db_path))[0]
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            excel_path = os.path.join(output_dir, f'{db_name}_{timestamp}.xlsx')
-            
-            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                for table in tables:
-                    table_name = table[0]
-                    df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-                    df.to_excel(writer, sheet_name=table_name, index=False)
-            
-            return True, excel_path
-            
-        except Exception as e:
-            return False, str(e)
+    # Wie in app.py: bei INVENTAR_DB_LAYOUT=single liegen alle Tabellen in einer Datei
+    DB_LAYOUT = os.environ.get('INVENTAR_DB_LAYOUT', 'split')
+    SINGLE_DB = os.path.join(DB_DIR, 'inventar.db')
+
+    @classmethod
+    def resolve(cls, db_path):
+        return cls.SINGLE_DB if cls.DB_LAYOUT == 'single' else db_path
+
+DB_MAP = {
+    'workers': DBConfig.WORKERS_DB,
+    'tools': DBConfig.TOOLS_DB,
+    'lendings': DBConfig.LENDINGS_DB,
+    'consumables': DBConfig.CONSUMABLES_DB
+}
+
+# Exportierbare Tabellen je Datenbank wie in app.DBConfig.SCHEMAS. Im
+# Ein-Datei-Layout liegen alle Tabellen in inventar.db; ohne diese Liste würde
+# z.B. /export_db/workers auch system_logs, jobs und lendings ausgeben.
+DB_TABLES = {
+    'workers': ('workers', 'deleted_workers'),
+    'tools': ('tools', 'deleted_tools', 'tools_history', 'tool_status_history'),
+    'lendings': ('lendings',),
+    'consumables': ('consumables', 'deleted_consumables', 'consumables_history',
+                    'stock_movements', 'stock_snapshots')
+}
+
+@export_bp.before_request
+def require_admin():
+    """Export und Import lesen bzw. überschreiben ganze Tabellen - nur für Admins"""
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'Administratorrechte erforderlich'}), 403
 
 @export_bp.route('/export_db/<db_name>', methods=['GET'])
 def export_db(db_name):
-    logging.info(f"Export-Route aufgerufen für DB: {db_name}")
+    logger.info(f"Export-Route aufgerufen für DB: {db_name}")
     try:
-        db_map = {
-            'workers': DBConfig.WORKERS_DB,
-            'tools': DBConfig.TOOLS_DB,
-            'lendings': DBConfig.LENDINGS_DB,
-            'consumables': DBConfig.CONSUMABLES_DB
-        }
-        
-        if db_name not in db_map:
+        if db_name not in DB_MAP:
             flash('Ungültige Datenbank', 'error')
             return redirect(url_for('admin_panel'))
             
         export_dir = os.path.join(current_app.root_path, 'exports')
         os.makedirs(export_dir, exist_ok=True)
         
-        success, result = ExcelHandler.export_to_excel(db_map[db_name], export_dir)
+        success, result = ExcelHandler.export_to_excel(DBConfig.resolve(DB_MAP[db_name]), export_dir,
+                                                       tables=DB_TABLES[db_name])
         
         if success:
-            return send_file(
-                result,
-                as_attachment=True,
-                download_name=f"{db_name}_export.xlsx",
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            # Datei in Chunks ausliefern und danach entfernen
+            return Response(
+                ExcelHandler.iter_file(result),
+                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                headers={'Content-Disposition': f'attachment; filename={db_name}_export.xlsx'}
             )
         else:
             flash(f'Export fehlgeschlagen: {result}', 'error')
             return redirect(url_for('admin_panel'))
             
     except Exception as e:
-        logging.error(f"Fehler beim Export: {str(e)}")
+        logger.error(f"Fehler beim Export: {str(e)}")
         flash(f'Export fehlgeschlagen: {str(e)}', 'error')
-        return redirect(url_for('admin_panel')) 
\ No newline at end of file
+        return redirect(url_for('admin_panel')) 
+
+def _table_export_params(db_name, table, args):
+    """Prüft die Query-Parameter eines Tabellenexports; wirft ExportError"""
+    if db_name not in DB_MAP:
+        raise ExportError(f"Ungültige Datenbank: {db_name}")
+    export_format = args.get('format', 'csv').lower()
+    if export_format not in table_export.FORMATS:
+        raise ExportError(f"Ungültiges Format: {export_format}")
+    delimiter = args.get('delimiter', ',')
+    if delimiter not in table_export.CSV_DELIMITERS:
+        raise ExportError("Ungültiges Trennzeichen")
+    params = {
+        'db_name': db_name,
+        'table': table,
+        'format': export_format,
+        'delimiter': delimiter,
+        'columns': [c.strip() for c in args.get('columns', '').split(',') if c.strip()],
+        'from': args.get('from'),
+        'to': args.get('to'),
+        'date_column': args.get('date_column')
+    }
+    # Tabelle, Spalten und Datum gleich prüfen, nicht erst im Job
+    _prepare_table_export(params)
+    return params
+
+def _prepare_table_export(params):
+    db_path = DBConfig.resolve(DB_MAP[params['db_name']])
+    sql, query_params, columns = table_export.prepare_query(
+        db_path, params['table'], params['columns'],
+        start=params['from'], end=params['to'], date_column=params['date_column'],
+        allowed_tables=DB_TABLES[params['db_name']])
+    return db_path, sql, query_params, columns
+
+@export_bp.route('/export_table/<db_name>/<table>', methods=['GET'])
+def export_table(db_name, table):
+    """Eine Tabelle als CSV, NDJSON oder Parquet.
+
+    Query-Parameter: format (csv|ndjson|parquet), columns (kommagetrennt),
+    from/to (JJJJ-MM-TT, beide inklusive), date_column, delimiter (, ; tab)
+    """
+    logger.info(f"Tabellenexport aufgerufen: {db_name}/{table}")
+    try:
+        params = _table_export_params(db_name, table, request.args)
+        db_path, sql, query_params, columns = _prepare_table_export(params)
+
+        mimetype, extension = table_export.FORMATS[params['format']]
+        headers = {'Content-Disposition': f'attachment; filename={table}_export.{extension}'}
+        if params['format'] == 'parquet':
+            export_dir = os.path.join(current_app.root_path, 'exports')
+            os.makedirs(export_dir, exist_ok=True)
+            path = table_export.write_parquet(db_path, sql, query_params, columns, export_dir)
+            return Response(ExcelHandler.iter_file(path), mimetype=mimetype, headers=headers)
+
+        if params['format'] == 'csv':
+            rows = table_export.iter_csv(db_path, sql, query_params, columns,
+                                         table_export.CSV_DELIMITERS[params['delimiter']])
+        else:
+            rows = table_export.iter_ndjson(db_path, sql, query_params, columns)
+        # Zeilen gehen direkt vom Cursor in die Antwort
+        return Response(stream_with_context(rows), mimetype=mimetype, headers=headers)
+
+    except ExportError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Fehler beim Tabellenexport: {str(e)}")
+        return jsonify({'success': False, 'message': f'Export fehlgeschlagen: {str(e)}'}), 500
+
+# Hintergrundvarianten: POST reiht einen Job ein (siehe utils/jobs.py),
+# das Ergebnis liegt danach unter /api/jobs/<id>/download bereit
+
+def _submit(kind, params):
+    job_id = current_app.extensions['jobs'].submit(kind, params, session.get('username', 'System'))
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('job_status', job_id=job_id)
+    }), 202
+
+@export_bp.route('/export_db/<db_name>', methods=['POST'])
+def export_db_job(db_name):
+    if db_name not in DB_MAP:
+        return jsonify({'success': False, 'message': 'Ungültige Datenbank'}), 400
+    try:
+        return _submit('export_excel', {'db_name': db_name})
+    except Exception as e:
+        logger.error(f"Export-Job nicht eingereiht: {str(e)}")
+        return jsonify({'success': False, 'message': f'Export fehlgeschlagen: {str(e)}'}), 500
+
+@export_bp.route('/export_table/<db_name>/<table>', methods=['POST'])
+def export_table_job(db_name, table):
+    try:
+        return _submit('export_table', _table_export_params(db_name, table, request.values))
+    except ExportError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Export-Job nicht eingereiht: {str(e)}")
+        return jsonify({'success': False, 'message': f'Export fehlgeschlagen: {str(e)}'}), 500
+
+@jobs.handler('export_excel')
+def run_export_excel(job, params):
+    db_name = params['db_name']
+    success, result = ExcelHandler.export_to_excel(
+        DBConfig.resolve(DB_MAP[db_name]), job.queue.output_dir, progress=job.progress,
+        tables=DB_TABLES[db_name])
+    if not success:
+        raise JobError(f"Export fehlgeschlagen: {result}")
+    return result, f"{db_name}_export.xlsx", 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+@jobs.handler('export_table')
+def run_export_table(job, params):
+    try:
+        db_path, sql, query_params, columns = _prepare_table_export(params)
+        total = table_export.count_rows(db_path, sql, query_params)
+        progress = lambda done: job.progress(done, total, f"{done} von {total} Zeilen")
+        mimetype, extension = table_export.FORMATS[params['format']]
+        name = f"{params['table']}_export.{extension}"
+
+        if params['format'] == 'parquet':
+            path = table_export.write_parquet(db_path, sql, query_params, columns,
+                                              job.queue.output_dir, progress)
+            return path, name, mimetype
+
+        if params['format'] == 'csv':
+            chunks = table_export.iter_csv(db_path, sql, query_params, columns,
+                                           table_export.CSV_DELIMITERS[params['delimiter']], progress)
+        else:
+            chunks = table_export.iter_ndjson(db_path, sql, query_params, columns, progress)
+        path = job.output_path(name)
+        with open(path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        return path, name, mimetype
+    except ExportError as e:
+        raise JobError(str(e))
+
+@export_bp.route('/import_db/<db_name>', methods=['POST'])
+def import_db(db_name):
+    """Massenimport aus xlsx/CSV als Hintergrundjob; dry_run=1 prüft nur"""
+    if db_name not in bulk_import.TARGETS:
+        return jsonify({'success': False, 'message': 'Ungültiges Importziel'}), 400
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'success': False, 'message': 'Keine Datei übergeben'}), 400
+    extension = os.path.splitext(secure_filename(upload.filename))[1].lower()
+    if extension not in ('.xlsx', '.csv', '.txt'):
+        return jsonify({'success': False, 'message': 'Nur .xlsx- oder .csv-Dateien'}), 400
+
+    try:
+        queue = current_app.extensions['jobs']
+        os.makedirs(queue.output_dir, exist_ok=True)
+        path = os.path.join(queue.output_dir, f"upload_{uuid.uuid4().hex}{extension}")
+        upload.save(path)
+        dry_run = request.form.get('dry_run', request.args.get('dry_run', '')) in ('1', 'true', 'on')
+        return _submit('import_db', {'db_name': db_name, 'path': path, 'dry_run': dry_run,
+                                     'filename': upload.filename,
+                                     'user': session.get('username', 'System')})
+    except Exception as e:
+        logger.error(f"Import-Job nicht eingereiht: {str(e)}")
+        return jsonify({'success': False, 'message': f'Import fehlgeschlagen: {str(e)}'}), 500
+
+def _invalidate_filter_cache(table):
+    """Wie FilterCache.invalidate in app.py: neue Generation, alle Prozesse laden neu"""
+    # Eigene Verbindung, der Job läuft außerhalb des App-Kontexts
+    conn = sqlite3.connect(DBConfig.resolve(DBConfig.SYSTEM_DB), timeout=30)
+    try:
+        cache_generations.bump(conn, table)
+    finally:
+        conn.close()
+
+@jobs.handler('import_db')
+def run_import_db(job, params):
+    db_name = params['db_name']
+    conn = sqlite3.connect(DBConfig.resolve(DB_MAP[db_name]), isolation_level=None, timeout=30)
+    try:
+        summary = bulk_import.import_file(
+            conn, db_name, params['path'], params['dry_run'],
+            progress=lambda rows: job.progress(None, message=f"{rows} Zeilen verarbeitet"))
+    except BulkImportError as e:
+        raise JobError(str(e))
+    finally:
+        conn.close()
+        os.remove(params['path'])
+
+    if not params['dry_run'] and (summary['inserted'] or summary['updated']):
+        _invalidate_filter_cache(bulk_import.TARGETS[db_name]['table'])
+        audit.log('IMPORT', f"Import {params['filename']} nach {db_name}", params.get('user'),
+                  item_type=db_name,
+                  details={key: summary[key] for key in ('rows', 'inserted', 'updated', 'error_count')})
+    logger.info(f"Import {params['filename']} nach {db_name}"
+                f"{' (Probelauf)' if params['dry_run'] else ''}: {summary['inserted']} neu, "
+                f"{summary['updated']} aktualisiert, {summary['error_count']} Fehler")
+    return summary
@@ -0,0 +1,62 @@
+"""Pflegt das Bestandsbuch für Verbrauchsmaterial (stock_movements/stock_snapshots).
+
+Ohne Optionen werden die fälligen Stichtagsstände geschrieben - z.B. nachts
+per Aufgabenplanung/cron; beim Start der Anwendung geschieht das ebenfalls.
+Mit --check werden Artikel angezeigt, deren Buchsaldo nicht zum Bestand
+passt, mit --reconcile werden sie per Korrekturbuchung ausgeglichen.
+
+Aufruf: python stock_snapshots.py [--check | --reconcile] [--rebuild]
+"""
+import argparse
+import sqlite3
+import sys
+import traceback
+from app import DBConfig
+from utils import stock_ledger
+
+def run(check=False, reconcile=False, rebuild=False):
+    conn = sqlite3.connect(DBConfig.resolve(DBConfig.CONSUMABLES_DB), isolation_level=None)
+    try:
+        conn.execute(f"PRAGMA busy_timeout = {DBConfig.PRAGMA_DEFAULTS['busy_timeout']}")
+        conn.execute('BEGIN IMMEDIATE')
+        drift = stock_ledger.find_drift(conn)
+        for d in drift:
+            print(f"    {d['barcode']}: Buch {d['balance']}, Bestand {d['stock']}")
+        if drift:
+            print(f"{'✓' if reconcile else '✗'} {len(drift)} Artikel "
+                  f"{'ausgeglichen' if reconcile else 'weichen ab'}")
+            if reconcile:
+                stock_ledger.reconcile(conn)
+        else:
+            print("✓ Bestandsbuch stimmt mit dem Bestand überein")
+
+        if check:
+            conn.execute('ROLLBACK')
+            return not drift
+
+        if rebuild:
+            count = stock_ledger.rebuild_snapshots(conn)
+        else:
+            count = stock_ledger.take_snapshots(conn)
+        conn.execute('COMMIT')
+        print(f"✓ {count} Stichtage geschrieben")
+        return True
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Bestandsbuch pflegen')
+    parser.add_argument('--check', action='store_true', help='Nur prüfen, nichts schreiben')
+    parser.add_argument('--reconcile', action='store_true', help='Abweichungen per Korrekturbuchung ausgleichen')
+    parser.add_argument('--rebuild', action='store_true', help='Alle Stichtagsstände neu berechnen')
+    args = parser.parse_args()
+    try:
+        sys.exit(0 if run(args.check, args.reconcile, args.rebuild) else 1)
+    except Exception as e:
+        print(f"✗ Fehler im Bestandsbuch: {str(e)}")
+        print(traceback.format_exc())
+        sys.exit(1)
@@ -0,0 +1,133 @@
+"""Belastungstest für Bestandsbuchungen auf Verbrauchsmaterial.
+
+Mehrere Prozesse mit je mehreren Threads buchen gleichzeitig Ausgaben und
+Zugänge auf denselben Artikel (utils/lending_engine.py). Am Ende muss gelten:
+- Bestand = Startbestand + Zugänge - Ausgaben (keine verlorenen Updates)
+- Bestand nie negativ, abgelehnte Ausgaben nur bei fehlendem Bestand
+- je erfolgreicher Buchung genau ein Eintrag in consumables_history
+
+Aufruf: python stress_stock.py [prozesse] [threads] [buchungen_pro_thread]
+"""
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Vor dem Import von app setzen; Kindprozesse erben das Verzeichnis über die Umgebung
+if __name__ == '__main__':
+    os.environ['INVENTAR_DB_DIR'] = tempfile.mkdtemp(prefix='inventar_stress_')
+
+from app import DBConfig, get_db_connection
+from utils import lending_engine
+
+WORKER = 'STRESS-W'
+ITEM = 'STRESS-C'
+START_STOCK = 50
+
+def prepare():
+    DBConfig.init_all_dbs()
+    with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+        conn.execute('''
+            INSERT INTO workers_db.workers (name, lastname, barcode, bereich)
+            VALUES ('Last', 'Test', ?, 'Test')
+        ''', (WORKER,))
+        conn.execute('''
+            INSERT INTO consumables_db.consumables
+            (barcode, bezeichnung, mindestbestand, aktueller_bestand)
+            VALUES (?, 'Schrauben (Belastungstest)', 10, ?)
+        ''', (ITEM, START_STOCK))
+        conn.commit()
+
+def run_thread(bookings, totals, lock):
+    """Bucht zufällig Ausgaben (1-3) und gelegentlich Zugänge (5)"""
+    counts = {'issued': 0, 'restocked': 0, 'ok': 0, 'conflicts': 0, 'errors': 0}
+    conn = get_db_connection(DBConfig.LENDINGS_DB)
+    for _ in range(bookings):
+        try:
+            if random.random() < 0.2:
+                lending_engine.move_stock(conn, ITEM, 5, 'restock', changed_by='stress')
+                counts['restocked'] += 5
+            else:
+                amount = random.randint(1, 3)
+                lending_engine.issue_consumable(conn, ITEM, WORKER, amount, 'stress')
+                counts['issued'] += amount
+            counts['ok'] += 1
+        except lending_engine.LendingConflict:
+            counts['conflicts'] += 1
+        except sqlite3.OperationalError:
+            # z.B. "database is locked" nach Ablauf von busy_timeout
+            counts['errors'] += 1
+    with lock:
+        for key, value in counts.items():
+            totals[key] += value
+
+def run_process(threads, bookings, queue):
+    totals = {'issued': 0, 'restocked': 0, 'ok': 0, 'conflicts': 0, 'errors': 0}
+    lock = threading.Lock()
+    workers = [threading.Thread(target=run_thread, args=(bookings, totals, lock))
+               for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    queue.put(totals)
+
+def check(totals):
+    with get_db_connection(DBConfig.LENDINGS_DB) as conn:
+        stock = conn.execute('SELECT aktueller_bestand FROM consumables_db.consumables WHERE barcode = ?',
+                             (ITEM,)).fetchone()[0]
+        history = conn.execute('SELECT COUNT(*), MIN(new_stock) FROM consumables_db.consumables_history '
+                               'WHERE consumable_barcode = ?', (ITEM,)).fetchone()
+        issued = conn.execute("SELECT COALESCE(SUM(amount), 0) FROM lendings "
+                              "WHERE item_barcode = ? AND item_type = 'consumable'", (ITEM,)).fetchone()[0]
+
+    expected = START_STOCK + totals['restocked'] - totals['issued']
+    print(f"Buchungen: {totals['ok']} erfolgreich, {totals['conflicts']} wegen Bestand abgelehnt, "
+          f"{totals['errors']} Sperrfehler")
+    print(f"Bestand: {stock} (erwartet {expected}), niedrigster Stand {history[1]}")
+
+    ok = True
+    if stock != expected:
+        print(f"✗ Verlorene Updates: Bestand weicht um {stock - expected} ab")
+        ok = False
+    if history[1] is not None and history[1] < 0:
+        print("✗ Bestand war negativ")
+        ok = False
+    if history[0] != totals['ok']:
+        print(f"✗ Historie unvollständig: {history[0]} Einträge für {totals['ok']} Buchungen")
+        ok = False
+    if issued != totals['issued']:
+        print(f"✗ Ausgaben in lendings ({issued}) passen nicht zu den Buchungen ({totals['issued']})")
+        ok = False
+    if ok:
+        print("✓ Bestand, Historie und Ausgaben stimmen überein")
+    return ok
+
+if __name__ == '__main__':
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    bookings = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    print(f"Testdaten in {os.environ['INVENTAR_DB_DIR']}")
+    prepare()
+
+    # spawn: keine geerbten SQLite-Verbindungen in den Kindprozessen
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    started = time.perf_counter()
+    children = [context.Process(target=run_process, args=(threads, bookings, queue))
+                for _ in range(processes)]
+    for p in children:
+        p.start()
+    results = [queue.get() for _ in children]
+    for p in children:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    totals = {key: sum(r[key] for r in results) for key in results[0]}
+    print(f"{processes} Prozesse x {threads} Threads x {bookings} Buchungen in {elapsed:.1f} s")
+    sys.exit(0 if check(totals) else 1)
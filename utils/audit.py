@@ -0,0 +1,157 @@
+"""Systemlog (Audit-Trail) mit gepuffertem Schreiben.
+
+log() legt Ereignisse nur in einen Puffer; ein Hintergrund-Thread schreibt sie
+alle FLUSH_INTERVAL Sekunden bzw. sobald BATCH_SIZE Ereignisse warten in einer
+Transaktion nach system_logs und zählt sie in system_logs_daily (Tag x Aktion)
+mit. Die Tagessummen bleiben dauerhaft, Rohzeilen älter als RETENTION_DAYS
+werden stündlich in Blöcken zu PRUNE_CHUNK Zeilen gelöscht, damit keine lange
+Schreibsperre entsteht.
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 2       # Sekunden zwischen zwei Schreibvorgängen
+BATCH_SIZE = 200         # ab so vielen wartenden Ereignissen sofort schreiben
+MAX_BUFFER = 10000       # darüber werden Ereignisse verworfen statt den Speicher zu füllen
+RETENTION_DAYS = int(os.environ.get('INVENTAR_AUDIT_RETENTION_DAYS', 365))
+PRUNE_CHUNK = 1000       # Zeilen pro Lösch-Transaktion
+PRUNE_INTERVAL = 3600    # Sekunden zwischen zwei Aufräumläufen
+
+def _utc_timestamp(moment=None):
+    """Zeitstempel im Format von CURRENT_TIMESTAMP (UTC)"""
+    return (moment or datetime.now(timezone.utc)).strftime('%Y-%m-%d %H:%M:%S')
+
+class AuditLog:
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self._buffer = deque()
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._started_pid = None
+        self._last_prune = 0
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+
+    def log(self, action_type, description, user=None, affected_item=None, item_type=None,
+            details=None):
+        """Merkt ein Ereignis zum Schreiben vor; details darf auch ein dict sein"""
+        if details is not None and not isinstance(details, str):
+            details = json.dumps(details, ensure_ascii=False, default=str)
+        event = (_utc_timestamp(), action_type, description, user, affected_item, item_type, details)
+        self.start()
+        with self._lock:
+            if len(self._buffer) >= MAX_BUFFER:
+                self._dropped += 1
+                return
+            self._buffer.append(event)
+            full = len(self._buffer) >= BATCH_SIZE
+        if full:
+            self._wakeup.set()
+
+    def start(self):
+        """Startet den Schreib-Thread dieses Prozesses (einmal pro Prozess)"""
+        if self._started_pid == os.getpid() or self.db_path is None:
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            # Nach einem fork schreibt der Elternprozess seine Ereignisse selbst
+            self._buffer.clear()
+        threading.Thread(target=self._run, name="audit-writer", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(FLUSH_INTERVAL)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                if time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+                    self.prune()
+            except sqlite3.Error as e:
+                logger.warning(f"Systemlog nicht geschrieben, neuer Versuch später: {str(e)}")
+
+    def flush(self):
+        """Schreibt alle gepufferten Ereignisse in einer Transaktion"""
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            logger.warning(f"{dropped} Systemlog-Einträge verworfen (Puffer voll)")
+        if not events or self.db_path is None:
+            return 0
+
+        daily = Counter((event[0][:10], event[1]) for event in events)
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('''
+                INSERT INTO system_logs
+                    (timestamp, action_type, description, user, affected_item, item_type, details)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', events)
+            for (day, action_type), count in daily.items():
+                updated = conn.execute('''
+                    UPDATE system_logs_daily SET events = events + ?
+                    WHERE day = ? AND action_type = ?
+                ''', (count, day, action_type)).rowcount
+                if not updated:
+                    conn.execute('''
+                        INSERT INTO system_logs_daily (day, action_type, events) VALUES (?, ?, ?)
+                    ''', (day, action_type, count))
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            # Beim nächsten Durchlauf erneut versuchen, Reihenfolge bleibt erhalten
+            with self._lock:
+                self._buffer.extendleft(reversed(events))
+            raise
+        finally:
+            conn.close()
+        return len(events)
+
+    def prune(self, retention_days=RETENTION_DAYS):
+        """Löscht Rohzeilen älter als retention_days blockweise; die Tagessummen bleiben"""
+        self._last_prune = time.monotonic()
+        cutoff = _utc_timestamp(datetime.now(timezone.utc) - timedelta(days=retention_days))
+        removed = 0
+        conn = self._connect()
+        try:
+            while True:
+                count = conn.execute('''
+                    DELETE FROM system_logs WHERE id IN (
+                        SELECT id FROM system_logs WHERE timestamp < ?
+                        ORDER BY timestamp LIMIT ?
+                    )
+                ''', (cutoff, PRUNE_CHUNK)).rowcount
+                removed += count
+                if count < PRUNE_CHUNK:
+                    break
+        finally:
+            conn.close()
+        if removed:
+            logger.info(f"{removed} Systemlog-Einträge älter als {retention_days} Tage gelöscht")
+        return removed
+
+audit_log = AuditLog()
+
+def init(db_path):
+    """Legt die Datenbank fest; der Schreib-Thread startet mit dem ersten Ereignis"""
+    audit_log.db_path = db_path
+
+def log(action_type, description, user=None, affected_item=None, item_type=None, details=None):
+    audit_log.log(action_type, description, user, affected_item, item_type, details)
@@ -0,0 +1,323 @@
+"""Massenimport von Mitarbeitern, Werkzeugen und Verbrauchsmaterial aus xlsx/CSV.
+
+Die Datei wird zeilenweise gelesen und in Blöcken zu IMPORT_BATCH_SIZE
+geprüft: ein IN-Query je Block trennt neue von vorhandenen Barcodes, danach
+gehen Einfügungen und Aktualisierungen per executemany in die Datenbank. Der
+ganze Import läuft in einer Transaktion; im Probelauf (dry_run) wird sie am
+Ende zurückgerollt, die Zusammenfassung ist dieselbe.
+
+Vorhandene Datensätze werden nur in den Spalten aktualisiert, die in der Datei
+stehen; leere Zellen lassen den bisherigen Wert stehen. Status und Verleih-
+daten von Werkzeugen fasst der Import nicht an. Bestandsänderungen bei
+Verbrauchsmaterial landen über die Trigger im Bestandsbuch.
+
+Große Importe setzen die Sync-Trigger des Volltextindex (<tabelle>_fts, siehe
+DBConfig.SEARCH_INDEXES) innerhalb der Transaktion aus und bauen den Index vor
+dem Commit einmal neu auf - das ist bei vielen Zeilen deutlich schneller.
+
+Alle Funktionen erwarten eine Verbindung mit isolation_level=None zur
+Datenbank der Zieltabelle.
+"""
+import csv
+import os
+import re
+
+# Höchstens 999 Parameter pro Query bei älteren SQLite-Versionen
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 200
+# Ab so vielen neuen Zeilen (und mindestens einem Achtel des Tabellenbestands)
+# wird der Volltextindex am Ende einmal neu aufgebaut statt zeilenweise per Trigger
+SEARCH_REBUILD_MIN_ROWS = 5000
+
+# Ziel -> Tabelle, Spalten (Typ), Pflichtspalten für neue Zeilen, Standardwerte, Aliase
+TARGETS = {
+    'workers': {
+        'table': 'workers',
+        'columns': {'barcode': str, 'name': str, 'lastname': str, 'bereich': str, 'email': str},
+        'required': ('name', 'lastname'),
+        'defaults': {},
+        'aliases': {'vorname': 'name', 'nachname': 'lastname', 'abteilung': 'bereich', 'mail': 'email'}
+    },
+    'tools': {
+        'table': 'tools',
+        'columns': {'barcode': str, 'gegenstand': str, 'ort': str, 'typ': str},
+        'required': ('gegenstand',),
+        'defaults': {'ort': 'Lager'},
+        'aliases': {'bezeichnung': 'gegenstand', 'werkzeug': 'gegenstand', 'lagerort': 'ort'}
+    },
+    'consumables': {
+        'table': 'consumables',
+        'columns': {'barcode': str, 'bezeichnung': str, 'ort': str, 'typ': str,
+                    'mindestbestand': int, 'aktueller_bestand': int, 'einheit': str},
+        'required': ('bezeichnung',),
+        'defaults': {'ort': 'Lager', 'mindestbestand': 0, 'aktueller_bestand': 0, 'einheit': 'Stück'},
+        'aliases': {'material': 'bezeichnung', 'lagerort': 'ort', 'bestand': 'aktueller_bestand',
+                    'mindestmenge': 'mindestbestand'}
+    }
+}
+
+# Wie in lending_engine: Status folgt aus Bestand und Mindestbestand
+CONSUMABLE_STATUS_SQL = '''
+    UPDATE consumables SET status = CASE
+        WHEN COALESCE(aktueller_bestand, 0) = 0 THEN 'Leer'
+        WHEN COALESCE(aktueller_bestand, 0) <= mindestbestand THEN 'Nachbestellen'
+        ELSE 'Verfügbar'
+    END
+    WHERE barcode = ?
+'''
+
+class BulkImportError(Exception):
+    """Datei nicht lesbar, Format unbekannt oder Pflichtspalten fehlen"""
+
+def _normalize(name):
+    return re.sub(r'[\s_\-]+', '', str(name or '')).lower()
+
+def _csv_encoding(path):
+    """UTF-8 (mit/ohne BOM), sonst Windows-1252 wie bei Excel-CSV üblich"""
+    try:
+        with open(path, encoding='utf-8-sig') as f:
+            for _ in f:
+                pass
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+def _read_csv(path):
+    f = open(path, newline='', encoding=_csv_encoding(path))
+    sample = f.read(64 * 1024)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(f, dialect)
+    header = next(reader, None)
+
+    def rows():
+        with f:
+            for values in reader:
+                yield reader.line_num, values
+    return header, rows()
+
+def _read_xlsx(path):
+    from openpyxl import load_workbook
+    try:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+    except Exception as e:
+        raise BulkImportError(f"Excel-Datei nicht lesbar: {str(e)}")
+    sheet_rows = workbook.active.iter_rows(values_only=True)
+    header = next(sheet_rows, None)
+
+    def rows():
+        try:
+            for line, values in enumerate(sheet_rows, start=2):
+                yield line, values
+        finally:
+            workbook.close()
+    return header, rows()
+
+def read_rows(path):
+    """Liefert (kopfzeile, zeilen); zeilen iteriert über (zeilennummer, werte)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.xlsx':
+        header, rows = _read_xlsx(path)
+    elif extension in ('.csv', '.txt'):
+        header, rows = _read_csv(path)
+    else:
+        raise BulkImportError(f"Nicht unterstütztes Dateiformat: {extension or 'ohne Endung'} "
+                              "(erwartet .xlsx oder .csv)")
+    if not header:
+        raise BulkImportError("Die Datei ist leer")
+    return header, rows
+
+def _map_header(spec, header):
+    """Ordnet die Spalten der Datei den Tabellenspalten zu: ([(index, spalte)], ignoriert)"""
+    names = {_normalize(c): c for c in spec['columns']}
+    names.update({_normalize(alias): c for alias, c in spec['aliases'].items()})
+    mapping, ignored, used = [], [], set()
+    for index, title in enumerate(header):
+        column = names.get(_normalize(title))
+        if column is None or column in used:
+            if title not in (None, ''):
+                ignored.append(str(title))
+            continue
+        mapping.append((index, column))
+        used.add(column)
+    if 'barcode' not in used:
+        raise BulkImportError("Spalte 'barcode' fehlt")
+    return mapping, ignored
+
+def _convert(value, kind):
+    """Zellwert -> str/int bzw. None für leere Zellen; ValueError bei ungültigen Zahlen"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if kind is int:
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                return None
+        try:
+            number = value if isinstance(value, int) else int(str(value))
+        except ValueError:
+            raise ValueError("ist keine ganze Zahl")
+        if number < 0:
+            raise ValueError("darf nicht negativ sein")
+        return number
+    text = str(value).strip()
+    return text or None
+
+class _Importer:
+    def __init__(self, conn, target, mapping, summary):
+        self.conn = conn
+        self.spec = TARGETS[target]
+        self.table = self.spec['table']
+        self.mapping = mapping
+        self.columns = [column for _, column in mapping]
+        self.summary = summary
+        self.seen = {}
+        self.suspended_triggers = None
+        fields = [c for c in self.columns if c != 'barcode']
+        insert_columns = list(dict.fromkeys(['barcode'] + fields + list(self.spec['defaults'])))
+        if self.table == 'consumables':
+            insert_columns.append('status')
+        self.insert_columns = insert_columns
+        self.insert_sql = (f"INSERT INTO {self.table} ({', '.join(insert_columns)}) "
+                           f"VALUES ({', '.join('?' for _ in insert_columns)})")
+        self.update_fields = fields
+        self.update_sql = (f"UPDATE {self.table} SET "
+                           f"{', '.join(f'{c} = COALESCE(?, {c})' for c in fields)} WHERE barcode = ?"
+                           if fields else None)
+
+    def error(self, line, message):
+        self.summary['error_count'] += 1
+        if len(self.summary['errors']) < MAX_REPORTED_ERRORS:
+            self.summary['errors'].append({'line': line, 'message': message})
+
+    def parse(self, line, values):
+        """Eine Zeile als {spalte: wert} oder None bei Fehlern"""
+        record = {}
+        for index, column in self.mapping:
+            value = values[index] if index < len(values) else None
+            try:
+                record[column] = _convert(value, self.spec['columns'][column])
+            except ValueError as e:
+                self.error(line, f"{column}: {value!r} {str(e)}")
+                return None
+        if not record.get('barcode'):
+            self.error(line, "Barcode fehlt")
+            return None
+        if record.get('email') and '@' not in record['email']:
+            self.error(line, f"email: {record['email']!r} ist keine E-Mail-Adresse")
+            return None
+        first = self.seen.get(record['barcode'])
+        if first is not None:
+            self.error(line, f"Barcode {record['barcode']} steht bereits in Zeile {first}")
+            return None
+        self.seen[record['barcode']] = line
+        return record
+
+    def flush(self, batch):
+        if not batch:
+            return
+        barcodes = [record['barcode'] for _, record in batch]
+        existing = {row[0] for row in self.conn.execute(
+            f"SELECT barcode FROM {self.table} WHERE barcode IN ({', '.join('?' for _ in barcodes)})",
+            barcodes)}
+
+        inserts, updates = [], []
+        for line, record in batch:
+            if record['barcode'] in existing:
+                updates.append(tuple(record[c] for c in self.update_fields) + (record['barcode'],))
+                continue
+            missing = [c for c in self.spec['required'] if not record.get(c)]
+            if missing:
+                self.error(line, f"Pflichtfeld fehlt: {', '.join(missing)}")
+                continue
+            values = {**self.spec['defaults'], **{k: v for k, v in record.items() if v is not None}}
+            if self.table == 'consumables':
+                values['status'] = ('Leer' if values['aktueller_bestand'] == 0 else
+                                    'Nachbestellen' if values['aktueller_bestand'] <= values['mindestbestand']
+                                    else 'Verfügbar')
+            inserts.append(tuple(values.get(c) for c in self.insert_columns))
+
+        if inserts:
+            self.suspend_search_index(len(inserts))
+            self.conn.executemany(self.insert_sql, inserts)
+        if updates and self.update_sql:
+            self.conn.executemany(self.update_sql, updates)
+            if self.table == 'consumables':
+                self.conn.executemany(CONSUMABLE_STATUS_SQL, [(u[-1],) for u in updates])
+        self.summary['inserted'] += len(inserts)
+        self.summary['updated'] += len(updates) if self.update_sql else 0
+
+    def suspend_search_index(self, pending):
+        """Entfernt die FTS-Trigger, sobald sich ein Neuaufbau lohnt"""
+        if self.suspended_triggers is not None:
+            return
+        inserted = self.summary['inserted'] + pending
+        if inserted < SEARCH_REBUILD_MIN_ROWS:
+            return
+        existing = self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if inserted * 8 < existing:
+            self.suspended_triggers = []
+            return
+        self.suspended_triggers = self.conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ? AND name LIKE ?",
+            (self.table, f"{self.table}_fts_%")).fetchall()
+        for name, _ in self.suspended_triggers:
+            self.conn.execute(f"DROP TRIGGER {name}")
+
+    def restore_search_index(self):
+        """Baut den Volltextindex neu auf und legt die Trigger wieder an"""
+        if not self.suspended_triggers:
+            return
+        fts_name = f"{self.table}_fts"
+        self.conn.execute(f"INSERT INTO {fts_name}({fts_name}) VALUES ('rebuild')")
+        for _, sql in self.suspended_triggers:
+            self.conn.execute(sql)
+
+def run_import(conn, target, header, rows, dry_run=False, progress=None):
+    """Importiert die Zeilen in einer Transaktion und liefert eine Zusammenfassung.
+
+    progress(gelesene_zeilen) wird nach jedem Block aufgerufen.
+    """
+    if target not in TARGETS:
+        raise BulkImportError(f"Unbekanntes Importziel: {target}")
+    mapping, ignored = _map_header(TARGETS[target], header)
+    summary = {'target': target, 'dry_run': dry_run, 'rows': 0, 'inserted': 0, 'updated': 0,
+               'error_count': 0, 'errors': [], 'ignored_columns': ignored}
+    importer = _Importer(conn, target, mapping, summary)
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        batch = []
+        for line, values in rows:
+            if not values or all(v is None or str(v).strip() == '' for v in values):
+                continue
+            summary['rows'] += 1
+            record = importer.parse(line, values)
+            if record is not None:
+                batch.append((line, record))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                importer.flush(batch)
+                batch = []
+                if progress:
+                    progress(summary['rows'])
+        importer.flush(batch)
+        if dry_run:
+            conn.execute('ROLLBACK')
+        else:
+            importer.restore_search_index()
+            conn.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    return summary
+
+def import_file(conn, target, path, dry_run=False, progress=None):
+    """Liest die Datei und importiert sie (siehe run_import)"""
+    header, rows = read_rows(path)
+    return run_import(conn, target, header, rows, dry_run, progress)
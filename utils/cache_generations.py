@@ -0,0 +1,25 @@
+"""Generationszähler in cache_generations (System-DB).
+
+Prozesslokale Caches (FilterCache in app.py) merken sich die Generation ihrer
+Tabelle; wird sie hochgezählt, laden alle Worker-Prozesse beim nächsten
+Zugriff neu.
+"""
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+BUMP_SQL = '''
+    INSERT INTO cache_generations (name, generation) VALUES (?, 1)
+    ON CONFLICT(name) DO UPDATE SET generation = generation + 1
+'''
+
+def bump(conn, name):
+    """Zählt die Generation von name hoch und committet; False bei Fehlern"""
+    try:
+        conn.execute(BUMP_SQL, (name,))
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        logger.warning(f"Cache-Generation für {name} nicht erhöht: {str(e)}")
+        return False
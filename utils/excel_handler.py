@@ -1,29 +1,93 @@
-import pandas as pd
 import sqlite3
 import os
 from datetime import datetime
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+# Zeilen pro fetchmany - bestimmt zusammen mit openpyxls Write-only-Modus
+# den Speicherbedarf, unabhängig von der Tabellengröße
+FETCH_SIZE = 1000
+# Bytes pro Chunk beim Ausliefern der fertigen Datei
+CHUNK_SIZE = 64 * 1024
+# Excel erlaubt höchstens 31 Zeichen pro Blattname
+MAX_SHEET_TITLE = 31
+
+# Alle Tabellen außer FTS-Indizes (virtuelle Tabellen und ihre Schattentabellen)
+EXPORT_TABLES_SQL = '''
+    SELECT t.name FROM sqlite_master t
+    WHERE t.type = 'table'
+    AND t.sql NOT LIKE 'CREATE VIRTUAL TABLE%'
+    AND NOT EXISTS (
+        SELECT 1 FROM sqlite_master v
+        WHERE v.type = 'table' AND v.sql LIKE 'CREATE VIRTUAL TABLE%'
+        AND substr(t.name, 1, length(v.name) + 1) = v.name || '_'
+    )
+'''
+
+def _cell_value(value):
+    """Wandelt SQLite-Werte in Werte um, die openpyxl schreiben kann"""
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    return value
 
 class ExcelHandler:
     @staticmethod
-    def export_to_excel(db_path, output_dir='exports'):
+    def export_to_excel(db_path, output_dir='exports', progress=None, tables=None):
+        """Schreibt jede Tabelle als Blatt in eine .xlsx-Datei.
+
+        tables begrenzt den Export auf diese Tabellen (im Ein-Datei-Layout
+        liegen die Tabellen aller Datenbanken in derselben Datei).
+
+        Die Zeilen werden seitenweise vom Cursor gelesen und im Write-only-Modus
+        geschrieben, es liegt also nie eine ganze Tabelle im Speicher.
+        progress(fertige_tabellen, tabellen, meldung) wird je Tabelle aufgerufen.
+        """
+        conn = None
         try:
             os.makedirs(output_dir, exist_ok=True)
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
-            
+            conn = sqlite3.connect(db_path, isolation_level=None)
+            # Ein Lesesnapshot für alle Blätter
+            conn.execute('BEGIN')
+            allowed = tables
+            tables = [row[0] for row in conn.execute(EXPORT_TABLES_SQL).fetchall()
+                      if allowed is None or row[0] in allowed]
+
             db_name = os.path.splitext(os.path.basename(db_path))[0]
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             excel_path = os.path.join(output_dir, f'{db_name}_{timestamp}.xlsx')
-            
-            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                for table in tables:
-                    table_name = table[0]
-                    df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-                    df.to_excel(writer, sheet_name=table_name, index=False)
-            
+
+            workbook = Workbook(write_only=True)
+            for done, table_name in enumerate(tables):
+                if progress:
+                    progress(done, len(tables), f"Tabelle {table_name}")
+                sheet = workbook.create_sheet(title=table_name[:MAX_SHEET_TITLE])
+                cursor = conn.execute(f'SELECT * FROM "{table_name}"')
+                sheet.append([column[0] for column in cursor.description])
+                while True:
+                    rows = cursor.fetchmany(FETCH_SIZE)
+                    if not rows:
+                        break
+                    for row in rows:
+                        sheet.append([_cell_value(value) for value in row])
+            workbook.save(excel_path)
+
             return True, excel_path
-            
+
         except Exception as e:
-            return False, str(e) 
\ No newline at end of file
+            return False, str(e)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    @staticmethod
+    def iter_file(path, chunk_size=CHUNK_SIZE, remove=True):
+        """Liefert eine Datei in Chunks (für gestreamte Antworten) und löscht sie danach"""
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    yield chunk
+        finally:
+            if remove:
+                os.remove(path)
@@ -0,0 +1,264 @@
+"""Hintergrundjobs für lange Vorgänge (Exporte, Importe, Barcode-Blätter).
+
+Jobs stehen in der Tabelle jobs der System-DB. Jeder Prozess startet
+JOB_WORKERS Threads, die sich per BEGIN IMMEDIATE den ältesten wartenden Job
+holen - alle gunicorn-Worker teilen sich so eine Warteschlange, und der
+Request ist nach dem Einreihen sofort wieder frei. Ergebnisdateien liegen im
+Exportverzeichnis, bis expires_at erreicht ist.
+
+Ein Handler wird mit @handler('art') registriert, bekommt (job, params) und
+liefert (pfad, dateiname, mimetype) für eine Ergebnisdatei, ein dict, das als
+result im Status erscheint (z.B. eine Importzusammenfassung), oder None.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = 2
+POLL_INTERVAL = 2          # Sekunden zwischen zwei Blicken in die Warteschlange
+RESULT_TTL = 24 * 3600     # Sekunden, die Ergebnisse abrufbar bleiben
+STALE_AFTER = 600          # Sekunden ohne Lebenszeichen, bis ein Job als abgebrochen gilt
+MAINTENANCE_INTERVAL = 60  # Sekunden zwischen Lebenszeichen/Aufräumen
+PROGRESS_INTERVAL = 1.0    # höchstens so oft wird Fortschritt geschrieben
+
+_handlers = {}
+
+def handler(kind):
+    """Registriert eine Funktion als Handler für Jobs der Art kind"""
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+class JobError(Exception):
+    """Fehler, dessen Meldung dem Nutzer angezeigt werden kann"""
+
+class Job:
+    """Laufender Job aus Sicht des Handlers"""
+
+    def __init__(self, queue, job_id, kind):
+        self.queue = queue
+        self.id = job_id
+        self.kind = kind
+        self._last_progress = 0
+
+    def progress(self, done, total=None, message=None):
+        """Meldet den Fortschritt (done von total bzw. Prozent), gedrosselt.
+
+        done=None setzt nur die Meldung, z.B. wenn die Gesamtzahl unbekannt ist.
+        """
+        now = time.monotonic()
+        if now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        if done is None:
+            self.queue._update(self.id, message=message)
+            return
+        percent = int(done * 100 / total) if total else int(done)
+        self.queue._update(self.id, progress=max(0, min(percent, 99)), message=message)
+
+    def output_path(self, filename):
+        """Pfad für eine Ergebnisdatei im Exportverzeichnis"""
+        return os.path.join(self.queue.output_dir, f"{self.id}_{filename}")
+
+class JobQueue:
+    def __init__(self, db_path, output_dir, workers=JOB_WORKERS):
+        self.db_path = db_path
+        self.output_dir = output_dir
+        self.workers = workers
+        self._wakeup = threading.Event()
+        self._running = set()
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _update(self, job_id, **fields):
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"UPDATE jobs SET {assignments}, heartbeat_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (*fields.values(), job_id))
+        finally:
+            conn.close()
+
+    def submit(self, kind, params=None, created_by=None):
+        """Reiht einen Job ein und liefert seine ID"""
+        if kind not in _handlers:
+            raise JobError(f"Unbekannte Jobart: {kind}")
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, params, created_by) VALUES (?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params or {}), created_by))
+        finally:
+            conn.close()
+        logger.info(f"Job {job_id} ({kind}) eingereiht")
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Status eines Jobs als dict oder None"""
+        conn = self._connect()
+        try:
+            row = conn.execute('''
+                SELECT id, kind, status, progress, message, result_name, result, error,
+                       created_at, started_at, finished_at, expires_at
+                FROM jobs WHERE id = ?
+            ''', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def result(self, job_id):
+        """(pfad, dateiname, mimetype) eines fertigen Jobs, sofern die Datei noch existiert"""
+        conn = self._connect()
+        try:
+            row = conn.execute('''
+                SELECT result_path, result_name, mimetype FROM jobs
+                WHERE id = ? AND status = 'done' AND result_path IS NOT NULL
+            ''', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row and os.path.exists(row['result_path']):
+            return tuple(row)
+        return None
+
+    def start(self):
+        """Startet die Worker-Threads dieses Prozesses (einmal pro Prozess)"""
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+        os.makedirs(self.output_dir, exist_ok=True)
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True).start()
+        threading.Thread(target=self._maintain, name="job-maintenance", daemon=True).start()
+        logger.info(f"Job-Runner gestartet: {self.workers} Threads (PID {os.getpid()})")
+
+    def _claim(self, conn):
+        """Holt den ältesten wartenden Job und markiert ihn als laufend"""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('''
+                SELECT id, kind, params FROM jobs
+                WHERE status = 'queued'
+                ORDER BY rowid
+                LIMIT 1
+            ''').fetchone()
+            if row:
+                conn.execute('''
+                    UPDATE jobs SET status = 'running', started_at = CURRENT_TIMESTAMP,
+                                    heartbeat_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (row['id'],))
+            conn.execute('COMMIT')
+            return row
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _work(self):
+        while True:
+            try:
+                conn = self._connect()
+                try:
+                    row = self._claim(conn)
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Job-Warteschlange nicht lesbar: {str(e)}")
+                row = None
+            if row is None:
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            self._run(row['id'], row['kind'], json.loads(row['params'] or '{}'))
+
+    def _run(self, job_id, kind, params):
+        with self._lock:
+            self._running.add(job_id)
+        started = time.monotonic()
+        try:
+            func = _handlers.get(kind)
+            if func is None:
+                raise JobError(f"Unbekannte Jobart: {kind}")
+            result = func(Job(self, job_id, kind), params)
+            if isinstance(result, dict):
+                self._finish(job_id, 'done', result=json.dumps(result))
+            else:
+                path, name, mimetype = result if result else (None, None, None)
+                self._finish(job_id, 'done', result_path=path, result_name=name, mimetype=mimetype)
+            logger.info(f"Job {job_id} ({kind}) fertig nach {time.monotonic() - started:.1f} s")
+        except Exception as e:
+            message = str(e) if isinstance(e, JobError) else f"Interner Fehler: {str(e)}"
+            logger.error(f"Job {job_id} ({kind}) fehlgeschlagen: {str(e)}", exc_info=not isinstance(e, JobError))
+            self._finish(job_id, 'failed', error=message)
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _finish(self, job_id, status, **fields):
+        conn = self._connect()
+        try:
+            conn.execute(f'''
+                UPDATE jobs SET status = ?, progress = CASE WHEN ? = 'done' THEN 100 ELSE progress END,
+                                finished_at = CURRENT_TIMESTAMP,
+                                expires_at = datetime('now', '+{int(RESULT_TTL)} seconds'),
+                                {', '.join(f"{name} = ?" for name in fields)}
+                WHERE id = ?
+            ''', (status, status, *fields.values(), job_id))
+        finally:
+            conn.close()
+
+    def _maintain(self):
+        while True:
+            time.sleep(MAINTENANCE_INTERVAL)
+            try:
+                self.maintain()
+            except sqlite3.Error as e:
+                logger.warning(f"Job-Wartung fehlgeschlagen: {str(e)}")
+
+    def maintain(self):
+        """Lebenszeichen für laufende Jobs, abgebrochene Jobs beenden, Abgelaufenes löschen"""
+        with self._lock:
+            running = list(self._running)
+        conn = self._connect()
+        try:
+            conn.executemany("UPDATE jobs SET heartbeat_at = CURRENT_TIMESTAMP WHERE id = ?",
+                             [(job_id,) for job_id in running])
+            # Prozess beendet, während der Job lief
+            conn.execute(f'''
+                UPDATE jobs SET status = 'failed', error = 'Abgebrochen (Prozess beendet)',
+                                finished_at = CURRENT_TIMESTAMP,
+                                expires_at = datetime('now', '+{int(RESULT_TTL)} seconds')
+                WHERE status = 'running'
+                AND heartbeat_at < datetime('now', '-{int(STALE_AFTER)} seconds')
+            ''')
+            expired = conn.execute('''
+                SELECT id, result_path FROM jobs WHERE expires_at < CURRENT_TIMESTAMP
+            ''').fetchall()
+            for row in expired:
+                if row['result_path'] and os.path.exists(row['result_path']):
+                    os.remove(row['result_path'])
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(row['id'],) for row in expired])
+        finally:
+            conn.close()
+        return len(expired)
@@ -0,0 +1,334 @@
+"""Ausleih-Engine: Ausleihe, Rückgabe und Bestandsbuchungen als je eine Transaktion.
+
+Jeder Vorgang läuft in einem BEGIN IMMEDIATE auf der gepoolten Verbindung zu
+DBConfig.LENDINGS_DB, in die tools_db, workers_db und consumables_db bereits
+eingehängt sind. Statt erst zu
+lesen und dann zu schreiben, prüfen bedingte UPDATEs den erwarteten Zustand
+(z.B. status = 'Verfügbar'); trifft ein UPDATE keine Zeile, hat ein anderer
+Scan gewonnen und der Vorgang wird als Konflikt zurückgerollt.
+
+Hinweis: Im WAL-Modus ist ein Commit über mehrere Dateien nur je Datei
+atomar. Gegen Sperrkonflikte schützt die gemeinsame Transaktion immer,
+volle Absturzsicherheit bietet das Ein-Datei-Layout (INVENTAR_DB_LAYOUT=single).
+"""
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Höchstzahl Artikel pro Sammelbuchung (/api/lendings/batch)
+BATCH_MAX_ITEMS = 100
+
+CHECKOUT_TOOL_SQL = '''
+    UPDATE tools_db.tools
+    SET status = 'Ausgeliehen'
+    WHERE barcode = ? AND status = 'Verfügbar'
+'''
+INSERT_TOOL_LENDING_SQL = '''
+    INSERT INTO lendings
+    (worker_barcode, item_barcode, item_type, checkout_time)
+    VALUES (?, ?, 'tool', CURRENT_TIMESTAMP)
+'''
+# Defekte Werkzeuge behalten ihren Status
+RELEASE_TOOL_SQL = '''
+    UPDATE tools_db.tools
+    SET status = 'Verfügbar'
+    WHERE barcode = ? AND status = 'Ausgeliehen'
+'''
+CLOSE_TOOL_LENDING_SQL = '''
+    UPDATE lendings
+    SET return_time = CURRENT_TIMESTAMP
+    WHERE item_barcode = ? AND item_type = 'tool' AND return_time IS NULL
+'''
+# stock_version markiert Buchungen der Engine: sie schreiben ihre Bewegung ins
+# Bestandsbuch selbst (mit Aktion und Mitarbeiter), der Trigger für sonstige
+# Änderungen (DBConfig.STOCK_LEDGER_TRIGGERS) greift dann nicht.
+# Bestandsänderung um :delta; der Wächter in WHERE verhindert negativen Bestand
+MOVE_STOCK_SQL = '''
+    UPDATE consumables_db.consumables
+    SET aktueller_bestand = COALESCE(aktueller_bestand, 0) + :delta,
+        stock_version = COALESCE(stock_version, 0) + 1,
+        last_updated = CURRENT_TIMESTAMP,
+        status = CASE
+            WHEN COALESCE(aktueller_bestand, 0) + :delta = 0 THEN 'Leer'
+            WHEN COALESCE(aktueller_bestand, 0) + :delta <= mindestbestand THEN 'Nachbestellen'
+            ELSE 'Verfügbar'
+        END
+    WHERE barcode = :barcode AND COALESCE(aktueller_bestand, 0) + :delta >= 0
+'''
+# Absoluter Bestand (Inventur); mit :expected nur, wenn sich nichts geändert hat
+SET_STOCK_SQL = '''
+    UPDATE consumables_db.consumables
+    SET aktueller_bestand = :new_stock,
+        stock_version = COALESCE(stock_version, 0) + 1,
+        last_updated = CURRENT_TIMESTAMP,
+        status = CASE
+            WHEN :new_stock = 0 THEN 'Leer'
+            WHEN :new_stock <= mindestbestand THEN 'Nachbestellen'
+            ELSE 'Verfügbar'
+        END
+    WHERE barcode = :barcode
+    AND (:expected IS NULL OR COALESCE(aktueller_bestand, 0) = :expected)
+'''
+INSERT_CONSUMABLE_LENDING_SQL = '''
+    INSERT INTO lendings
+    (worker_barcode, item_barcode, item_type, amount, old_stock, new_stock,
+     checkout_time, return_time)
+    VALUES (:worker_barcode, :barcode, 'consumable', :amount, :old_stock, :new_stock,
+            CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+'''
+INSERT_STOCK_MOVEMENT_SQL = '''
+    INSERT INTO consumables_db.stock_movements
+    (consumable_barcode, action, delta, worker_barcode, changed_by)
+    VALUES (:barcode, :action, :delta, :worker_barcode, :changed_by)
+'''
+INSERT_CONSUMABLE_HISTORY_SQL = '''
+    INSERT INTO consumables_db.consumables_history
+    (consumable_barcode, worker_barcode, action, amount, old_stock, new_stock, changed_by)
+    VALUES (:barcode, :worker_barcode, :action, :amount, :old_stock, :new_stock, :changed_by)
+'''
+
+class LendingError(Exception):
+    """Vorgang ungültig (z.B. unbekannter Barcode, ungültige Menge)"""
+    status_code = 400
+
+class LendingConflict(LendingError):
+    """Zustand passt nicht mehr (z.B. schon ausgeliehen, Bestand reicht nicht)"""
+    status_code = 409
+
+@contextmanager
+def immediate_transaction(conn):
+    """Schreibtransaktion, die die Sperre sofort holt; Rollback bei jedem Fehler"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+def _require_worker(conn, worker_barcode):
+    if not worker_barcode:
+        raise LendingError('Kein Mitarbeiter ausgewählt')
+    if not conn.execute('SELECT 1 FROM workers_db.workers WHERE barcode = ?',
+                        (worker_barcode,)).fetchone():
+        raise LendingError('Mitarbeiter nicht gefunden')
+
+def checkout_tool(conn, tool_barcode, worker_barcode):
+    """Leiht ein verfügbares Werkzeug aus; liefert die ID des Ausleihvorgangs"""
+    with immediate_transaction(conn):
+        _require_worker(conn, worker_barcode)
+        updated = conn.execute(CHECKOUT_TOOL_SQL, (tool_barcode,)).rowcount
+        if not updated:
+            tool = conn.execute('SELECT status FROM tools_db.tools WHERE barcode = ?',
+                                (tool_barcode,)).fetchone()
+            if tool is None:
+                raise LendingError('Werkzeug nicht gefunden')
+            raise LendingConflict(f"Werkzeug nicht verfügbar (Status: {tool['status']})")
+
+        lending_id = conn.execute(INSERT_TOOL_LENDING_SQL, (worker_barcode, tool_barcode)).lastrowid
+
+    logger.info(f"Werkzeug {tool_barcode} an {worker_barcode} ausgeliehen")
+    return lending_id
+
+def return_tool(conn, tool_barcode):
+    """Schließt die offene Ausleihe und gibt das Werkzeug wieder frei"""
+    with immediate_transaction(conn):
+        released = conn.execute(RELEASE_TOOL_SQL, (tool_barcode,)).rowcount
+        closed = conn.execute(CLOSE_TOOL_LENDING_SQL, (tool_barcode,)).rowcount
+        if not released and not closed:
+            if not conn.execute('SELECT 1 FROM tools_db.tools WHERE barcode = ?',
+                                (tool_barcode,)).fetchone():
+                raise LendingError('Werkzeug nicht gefunden')
+            raise LendingConflict('Werkzeug ist nicht ausgeliehen')
+
+    logger.info(f"Werkzeug {tool_barcode} zurückgegeben")
+    return closed
+
+def _current_stock(conn, barcode):
+    item = conn.execute('SELECT COALESCE(aktueller_bestand, 0) AS bestand '
+                        'FROM consumables_db.consumables WHERE barcode = ?', (barcode,)).fetchone()
+    if item is None:
+        raise LendingError('Verbrauchsmaterial nicht gefunden')
+    return item['bestand']
+
+def _move_stock(conn, barcode, delta, action, worker_barcode, changed_by):
+    """Bestandsbuchung samt Historie innerhalb einer offenen Transaktion"""
+    updated = conn.execute(MOVE_STOCK_SQL, {'delta': delta, 'barcode': barcode}).rowcount
+    new_stock = _current_stock(conn, barcode)
+    if not updated:
+        raise LendingConflict(f"Nicht genügend Bestand vorhanden. Verfügbar: {new_stock}")
+    entry = {'barcode': barcode, 'worker_barcode': worker_barcode, 'action': action,
+             'delta': delta, 'amount': abs(delta), 'old_stock': new_stock - delta,
+             'new_stock': new_stock, 'changed_by': changed_by}
+    conn.execute(INSERT_STOCK_MOVEMENT_SQL, entry)
+    conn.execute(INSERT_CONSUMABLE_HISTORY_SQL, entry)
+    return entry
+
+def move_stock(conn, barcode, delta, action, worker_barcode=None, changed_by='System'):
+    """Ändert den Bestand relativ (Zugang > 0, Abgang < 0); liefert den neuen Bestand"""
+    if not isinstance(delta, int) or delta == 0:
+        raise LendingError('Ungültige Menge')
+    with immediate_transaction(conn):
+        entry = _move_stock(conn, barcode, delta, action, worker_barcode, changed_by)
+    logger.info(f"Material {barcode}: {action} {delta:+d}, Bestand {entry['new_stock']}")
+    return entry['new_stock']
+
+def set_stock(conn, barcode, new_stock, changed_by='System', expected_stock=None):
+    """Setzt den Bestand absolut (Inventur); liefert (alter, neuer) Bestand.
+
+    Mit expected_stock wird nur gebucht, wenn der Bestand seit dem Anzeigen
+    unverändert ist - sonst LendingConflict statt stillem Überschreiben.
+    """
+    if not isinstance(new_stock, int) or new_stock < 0:
+        raise LendingError('Ungültiger Bestand')
+    with immediate_transaction(conn):
+        old_stock = _current_stock(conn, barcode)
+        updated = conn.execute(SET_STOCK_SQL, {'new_stock': new_stock, 'barcode': barcode,
+                                               'expected': expected_stock}).rowcount
+        if not updated:
+            raise LendingConflict(f"Bestand wurde zwischenzeitlich geändert. Aktuell: {old_stock}")
+        if new_stock != old_stock:
+            entry = {'barcode': barcode, 'worker_barcode': None, 'action': 'adjust',
+                     'delta': new_stock - old_stock, 'amount': abs(new_stock - old_stock),
+                     'old_stock': old_stock, 'new_stock': new_stock, 'changed_by': changed_by}
+            conn.execute(INSERT_STOCK_MOVEMENT_SQL, entry)
+            conn.execute(INSERT_CONSUMABLE_HISTORY_SQL, entry)
+    logger.info(f"Material {barcode}: Bestand {old_stock} -> {new_stock}")
+    return old_stock, new_stock
+
+def issue_consumable(conn, barcode, worker_barcode, amount, changed_by='System'):
+    """Gibt Material aus, sofern der Bestand reicht; liefert den neuen Bestand"""
+    if not isinstance(amount, int) or amount <= 0:
+        raise LendingError('Ungültige Menge')
+
+    with immediate_transaction(conn):
+        _require_worker(conn, worker_barcode)
+        entry = _move_stock(conn, barcode, -amount, 'checkout', worker_barcode, changed_by)
+        conn.execute(INSERT_CONSUMABLE_LENDING_SQL, entry)
+
+    logger.info(f"Material {barcode}: {amount} an {worker_barcode} ausgegeben, Bestand {entry['new_stock']}")
+    return entry['new_stock']
+
+def _in_query(conn, sql, barcodes):
+    placeholders = ', '.join('?' * len(barcodes))
+    return conn.execute(sql.format(placeholders=placeholders), barcodes).fetchall()
+
+def _parse_item(raw, default_action):
+    """Normalisiert einen Eintrag: Barcode-String oder {barcode, amount, action}"""
+    if isinstance(raw, str):
+        raw = {'barcode': raw}
+    if not isinstance(raw, dict) or not str(raw.get('barcode') or '').strip():
+        raise LendingError('Barcode fehlt')
+    # Ohne Angabe ein Stück; 0, leer oder null ist ein Fehler, keine 1
+    try:
+        amount = int(raw.get('amount', 1))
+    except (TypeError, ValueError):
+        raise LendingError('Ungültige Menge')
+    if amount <= 0:
+        raise LendingError('Ungültige Menge')
+    action = raw.get('action') or default_action
+    if action not in ('checkout', 'return'):
+        raise LendingError('Ungültige Aktion')
+    return {'barcode': str(raw['barcode']).strip(), 'amount': amount, 'action': action}
+
+def process_batch(conn, worker_barcode, items, action='checkout', changed_by='System'):
+    """Bucht einen ganzen Warenkorb in einer Transaktion; liefert ein Ergebnis je Artikel.
+
+    Alle Barcodes werden mit je einer IN-Abfrage geprüft, die gültigen
+    Buchungen per executemany geschrieben. Ungültige Artikel werden
+    übersprungen und im Ergebnis gemeldet, der Rest wird trotzdem gebucht.
+    """
+    if not items:
+        raise LendingError('Keine Artikel übergeben')
+    if len(items) > BATCH_MAX_ITEMS:
+        raise LendingError(f'Höchstens {BATCH_MAX_ITEMS} Artikel pro Vorgang')
+
+    results = []
+    parsed = []
+    for raw in items:
+        try:
+            parsed.append(_parse_item(raw, action))
+        except LendingError as e:
+            parsed.append(None)
+            results.append({'barcode': raw.get('barcode') if isinstance(raw, dict) else raw,
+                            'success': False, 'message': str(e)})
+            continue
+        results.append(None)
+
+    with immediate_transaction(conn):
+        # Die Schreibsperre ist ab hier gehalten: geprüfte Zustände bleiben bis zum Commit gültig
+        if any(item and item['action'] == 'checkout' for item in parsed):
+            _require_worker(conn, worker_barcode)
+
+        barcodes = list({item['barcode'] for item in parsed if item})
+        tools = {row['barcode']: row['status'] for row in _in_query(
+            conn, 'SELECT barcode, status FROM tools_db.tools WHERE barcode IN ({placeholders})', barcodes)}
+        stock = {row['barcode']: row['bestand'] for row in _in_query(
+            conn, 'SELECT barcode, COALESCE(aktueller_bestand, 0) AS bestand FROM consumables_db.consumables '
+                  'WHERE barcode IN ({placeholders})', barcodes)}
+        open_lendings = {row['item_barcode'] for row in _in_query(
+            conn, "SELECT item_barcode FROM lendings WHERE item_type = 'tool' "
+                  "AND return_time IS NULL AND item_barcode IN ({placeholders})", barcodes)}
+
+        checkouts, returns, issues = [], [], []
+        for index, item in enumerate(parsed):
+            if item is None:
+                continue
+            barcode = item['barcode']
+            result = {'barcode': barcode, 'action': item['action'], 'success': False}
+            results[index] = result
+
+            if barcode in tools:
+                result['type'] = 'tool'
+                status = tools[barcode]
+                if item['action'] == 'checkout':
+                    if status != 'Verfügbar':
+                        result['message'] = f"Werkzeug nicht verfügbar (Status: {status})"
+                        continue
+                    checkouts.append((worker_barcode, barcode))
+                    tools[barcode] = 'Ausgeliehen'
+                else:
+                    if status != 'Ausgeliehen' and barcode not in open_lendings:
+                        result['message'] = 'Werkzeug ist nicht ausgeliehen'
+                        continue
+                    returns.append((barcode,))
+                    tools[barcode] = 'Verfügbar'
+                    open_lendings.discard(barcode)
+            elif barcode in stock:
+                result['type'] = 'consumable'
+                if item['action'] != 'checkout':
+                    result['message'] = 'Verbrauchsmaterial kann nicht zurückgegeben werden'
+                    continue
+                if stock[barcode] < item['amount']:
+                    result['message'] = f"Nicht genügend Bestand vorhanden. Verfügbar: {stock[barcode]}"
+                    continue
+                old_stock = stock[barcode]
+                stock[barcode] -= item['amount']
+                result['new_stock'] = stock[barcode]
+                issues.append({'barcode': barcode, 'worker_barcode': worker_barcode,
+                               'action': 'checkout', 'delta': -item['amount'],
+                               'amount': item['amount'], 'old_stock': old_stock,
+                               'new_stock': stock[barcode], 'changed_by': changed_by})
+            else:
+                result['message'] = 'Barcode nicht gefunden'
+                continue
+
+            result['success'] = True
+
+        if checkouts:
+            conn.executemany(CHECKOUT_TOOL_SQL, [(barcode,) for _, barcode in checkouts])
+            conn.executemany(INSERT_TOOL_LENDING_SQL, checkouts)
+        if returns:
+            conn.executemany(RELEASE_TOOL_SQL, returns)
+            conn.executemany(CLOSE_TOOL_LENDING_SQL, returns)
+        if issues:
+            conn.executemany(MOVE_STOCK_SQL, issues)
+            conn.executemany(INSERT_STOCK_MOVEMENT_SQL, issues)
+            conn.executemany(INSERT_CONSUMABLE_LENDING_SQL, issues)
+            conn.executemany(INSERT_CONSUMABLE_HISTORY_SQL, issues)
+
+    logger.info(f"Sammelbuchung für {worker_barcode}: {len(checkouts)} ausgeliehen, "
+                f"{len(returns)} zurückgegeben, {len(issues)} Material ausgegeben")
+    return results
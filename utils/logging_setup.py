@@ -0,0 +1,135 @@
+"""Strukturiertes Logging: JSON-Zeilen über QueueHandler/QueueListener.
+
+Request-Threads legen Einträge nur in eine Queue; ein Listener-Thread
+formatiert und schreibt sie - in app.log als JSON-Zeile, auf die Konsole als
+Text. Das Level kommt aus INVENTAR_LOG_LEVEL (Standard WARNING, d.h. die
+Debug-Ausgaben der Routen kosten im Betrieb nur die Levelprüfung), einzelne
+Logger lassen sich mit INVENTAR_LOG_LEVELS="app=DEBUG,utils.jobs=INFO" anders
+einstellen. Jeder Eintrag trägt die Request-ID (Header X-Request-ID oder neu
+erzeugt), die auch in der Antwort zurückgegeben wird.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+LOG_FILE = 'app.log'
+BACKUP_DAYS = 7  # so viele rotierte Tagesdateien bleiben liegen
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(request_id)s - %(message)s'
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+_context = threading.local()
+_listener = None
+
+class ContextFilter(logging.Filter):
+    """Hängt Request-ID und Endpoint des aufrufenden Threads an den Eintrag"""
+
+    def filter(self, record):
+        record.request_id = getattr(_context, 'request_id', None) or '-'
+        record.endpoint = getattr(_context, 'endpoint', None)
+        return True
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        if getattr(record, 'request_id', '-') != '-':
+            entry['request_id'] = record.request_id
+        if getattr(record, 'endpoint', None):
+            entry['endpoint'] = record.endpoint
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class _QueueHandler(QueueHandler):
+    """Wie QueueHandler, lässt aber den Traceback als eigenes Feld stehen"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def _start_listener(log_queue, handlers):
+    global _listener
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+def shutdown():
+    """Schreibt die Queue leer und beendet den Listener (auch per atexit)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def setup_logging(log_file=LOG_FILE, level=None, levels=None):
+    """Richtet die Pipeline einmal pro Prozess ein; weitere Aufrufe ändern nichts"""
+    if _listener is not None:
+        return
+    level = (level or os.environ.get('INVENTAR_LOG_LEVEL', 'WARNING')).upper()
+    levels = os.environ.get('INVENTAR_LOG_LEVELS', '') if levels is None else levels
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(TEXT_FORMAT))
+    logfile = TimedRotatingFileHandler(log_file, when='midnight', backupCount=BACKUP_DAYS,
+                                       encoding='utf-8')
+    logfile.setFormatter(JsonFormatter())
+    handlers = (console, logfile)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    for item in levels.split(','):
+        name, _, logger_level = item.partition('=')
+        if name.strip() and logger_level.strip():
+            logging.getLogger(name.strip()).setLevel(logger_level.strip().upper())
+
+    _start_listener(log_queue, handlers)
+    # Der Listener-Thread überlebt kein fork (gunicorn --preload) - neu starten
+    os.register_at_fork(after_in_child=lambda: _start_listener(log_queue, handlers))
+    atexit.register(shutdown)
+
+def init_app(app):
+    """Vergibt jedem Request eine ID für die Logeinträge"""
+    from flask import request
+
+    def before():
+        incoming = request.headers.get('X-Request-ID', '')
+        _context.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex[:16]
+        _context.endpoint = request.endpoint
+
+    def after(response):
+        if getattr(_context, 'request_id', None):
+            response.headers['X-Request-ID'] = _context.request_id
+        return response
+
+    def teardown(exception=None):
+        _context.request_id = None
+        _context.endpoint = None
+
+    app.before_request_funcs.setdefault(None, []).insert(0, before)
+    app.after_request(after)
+    app.teardown_request(teardown)
@@ -0,0 +1,220 @@
+"""Laufzeitmetriken der Requests im Prometheus-Textformat (/metrics).
+
+Je Endpoint werden Antwortzeit (Histogramm), Statuscodes, Datenbankzeit und
+Anzahl der Queries erfasst. Jeder Prozess sammelt zunächst im Speicher und
+addiert die Zuwächse alle FLUSH_INTERVAL Sekunden auf die Zähler in der
+Tabelle request_metrics der System-DB - so zeigt /metrics die Summe über alle
+gunicorn-Worker, egal welcher Worker die Abfrage beantwortet.
+
+Die DB-Zeit meldet PooledConnection über record_query(); gezählt wird nur,
+was im Thread eines laufenden Requests ausgeführt wird.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Obergrenzen der Histogramm-Klassen in Sekunden
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FLUSH_INTERVAL = 10  # Sekunden zwischen zwei Schreibvorgängen je Prozess
+
+_local = threading.local()
+
+def record_query(seconds):
+    """Verbucht eine Query für den laufenden Request dieses Threads"""
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += seconds
+
+def _bucket(duration):
+    """Label der kleinsten Klasse, in die duration fällt"""
+    for bound in LATENCY_BUCKETS:
+        if duration <= bound:
+            return str(bound)
+    return '+Inf'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class RequestMetrics:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+
+    def begin_request(self):
+        _local.start = time.perf_counter()
+        _local.stats = [0, 0.0]
+
+    def end_request(self, endpoint, method, status):
+        """Verbucht den Request dieses Threads; False, wenn keiner läuft"""
+        stats = getattr(_local, 'stats', None)
+        if stats is None:
+            return False
+        duration = time.perf_counter() - _local.start
+        _local.stats = None
+        key = (endpoint or '<unbekannt>', method, int(status), _bucket(duration))
+        with self._lock:
+            entry = self._pending.setdefault(key, [0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] += stats[1]
+            entry[3] += stats[0]
+        return True
+
+    def start(self):
+        """Startet den Schreib-Thread dieses Prozesses (einmal pro Prozess)"""
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            # Nach einem fork gehören die Zähler dem Elternprozess
+            self._pending = {}
+        threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """Addiert die gesammelten Zuwächse auf die Zähler in der Datenbank"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                for key, (requests, duration, db_seconds, queries) in pending.items():
+                    updated = conn.execute('''
+                        UPDATE request_metrics
+                        SET requests = requests + ?, duration_seconds = duration_seconds + ?,
+                            db_seconds = db_seconds + ?, db_queries = db_queries + ?
+                        WHERE endpoint = ? AND method = ? AND status = ? AND le = ?
+                    ''', (requests, duration, db_seconds, queries, *key)).rowcount
+                    if not updated:
+                        conn.execute('''
+                            INSERT INTO request_metrics
+                                (endpoint, method, status, le, requests, duration_seconds,
+                                 db_seconds, db_queries)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ''', (*key, requests, duration, db_seconds, queries))
+                conn.execute('COMMIT')
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Metriken nicht gespeichert, neuer Versuch später: {str(e)}")
+            with self._lock:
+                for key, values in pending.items():
+                    entry = self._pending.setdefault(key, [0, 0.0, 0.0, 0])
+                    for i, value in enumerate(values):
+                        entry[i] += value
+            return 0
+        return len(pending)
+
+    def render(self):
+        """Alle Zähler im Prometheus-Textformat"""
+        self.flush()
+        conn = self._connect()
+        try:
+            rows = conn.execute('''
+                SELECT endpoint, method, status, le, requests, duration_seconds,
+                       db_seconds, db_queries
+                FROM request_metrics
+                ORDER BY endpoint, method
+            ''').fetchall()
+        finally:
+            conn.close()
+
+        statuses, buckets, totals = {}, {}, {}
+        for endpoint, method, status, le, requests, duration, db_seconds, queries in rows:
+            route = (endpoint, method)
+            statuses[route + (status,)] = statuses.get(route + (status,), 0) + requests
+            per_bucket = buckets.setdefault(route, {})
+            per_bucket[le] = per_bucket.get(le, 0) + requests
+            total = totals.setdefault(route, [0, 0.0, 0.0, 0])
+            total[0] += requests
+            total[1] += duration
+            total[2] += db_seconds
+            total[3] += queries
+
+        def labels(endpoint, method, **extra):
+            pairs = {'endpoint': endpoint, 'method': method, **extra}
+            return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs.items())
+
+        lines = [
+            '# HELP inventar_http_requests_total Anzahl Requests je Endpoint und Statuscode',
+            '# TYPE inventar_http_requests_total counter',
+        ]
+        for (endpoint, method, status), count in sorted(statuses.items()):
+            lines.append(f'inventar_http_requests_total{{{labels(endpoint, method, status=status)}}} {count}')
+
+        lines += [
+            '# HELP inventar_http_request_duration_seconds Antwortzeit je Endpoint',
+            '# TYPE inventar_http_request_duration_seconds histogram',
+        ]
+        for route in sorted(totals):
+            cumulative = 0
+            for le in [str(bound) for bound in LATENCY_BUCKETS] + ['+Inf']:
+                cumulative += buckets[route].get(le, 0)
+                lines.append(f'inventar_http_request_duration_seconds_bucket'
+                             f'{{{labels(*route, le=le)}}} {cumulative}')
+            lines.append(f'inventar_http_request_duration_seconds_sum{{{labels(*route)}}} {totals[route][1]:.6f}')
+            lines.append(f'inventar_http_request_duration_seconds_count{{{labels(*route)}}} {totals[route][0]}')
+
+        lines += [
+            '# HELP inventar_db_seconds_total Zeit in Datenbankabfragen je Endpoint',
+            '# TYPE inventar_db_seconds_total counter',
+        ]
+        for route in sorted(totals):
+            lines.append(f'inventar_db_seconds_total{{{labels(*route)}}} {totals[route][2]:.6f}')
+        lines += [
+            '# HELP inventar_db_queries_total Anzahl Datenbankabfragen je Endpoint',
+            '# TYPE inventar_db_queries_total counter',
+        ]
+        for route in sorted(totals):
+            lines.append(f'inventar_db_queries_total{{{labels(*route)}}} {totals[route][3]}')
+        return '\n'.join(lines) + '\n'
+
+def init_app(app, metrics, token=None):
+    """Hängt die Messung an app und stellt /metrics bereit.
+
+    Mit token verlangt /metrics den Header Authorization: Bearer <token>.
+    """
+    from flask import Response, abort, request
+
+    def before():
+        metrics.start()
+        metrics.begin_request()
+
+    def after(response):
+        metrics.end_request(request.endpoint, request.method, response.status_code)
+        return response
+
+    def teardown(exception=None):
+        # Ohne Antwort (unbehandelte Ausnahme im Debug-Modus) als 500 zählen
+        metrics.end_request(request.endpoint, request.method, 500)
+
+    def metrics_view():
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    # Als erster before_request-Hook, damit die Zeit der übrigen Hooks mitzählt
+    app.before_request_funcs.setdefault(None, []).insert(0, before)
+    app.after_request(after)
+    app.teardown_request(teardown)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    app.extensions['metrics'] = metrics
@@ -0,0 +1,147 @@
+"""Keyset-Pagination für die Listenansichten (/, /workers, /consumables, /history).
+
+Statt OFFSET merkt sich der Cursor die Sortierwerte der letzten Zeile einer
+Seite; die nächste Seite beginnt per Zeilenwert-Vergleich direkt dahinter.
+Jede Sortierung endet auf einer eindeutigen Spalte (barcode), damit keine
+Zeilen doppelt erscheinen oder verloren gehen.
+"""
+import base64
+import json
+from flask import request, url_for
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class KeysetPager:
+    """Baut Keyset-Bedingungen in eine Listen-Query ein und liefert die Navigation.
+
+    sort_options: {name: [(ausdruck, spalte, ersatzwert), ...]}; ersatzwert
+    ist None für NOT-NULL-Spalten, sonst der Wert, auf den NULL für Vergleich
+    und Sortierung abgebildet wird.
+    """
+
+    def __init__(self, sort_options, default_sort, sort=None, direction='asc',
+                 cursor=None, backwards=False, per_page=DEFAULT_PAGE_SIZE):
+        self.sort_options = sort_options
+        self.sort = sort if sort in sort_options else default_sort
+        self.direction = 'desc' if direction == 'desc' else 'asc'
+        self.per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+        self.backwards = backwards
+        self.key = self._decode(cursor)
+        self.has_next = False
+        self.has_prev = False
+        self.next_cursor = None
+        self.prev_cursor = None
+
+    @classmethod
+    def from_request(cls, sort_options, default_sort, default_direction='asc'):
+        """Liest sort, dir, after/before und per_page aus den Query-Parametern"""
+        before = request.args.get('before')
+        try:
+            per_page = int(request.args.get('per_page', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            per_page = DEFAULT_PAGE_SIZE
+        return cls(sort_options, default_sort,
+                   sort=request.args.get('sort'),
+                   direction=request.args.get('dir', default_direction),
+                   cursor=before or request.args.get('after'),
+                   backwards=bool(before),
+                   per_page=per_page)
+
+    @property
+    def columns(self):
+        return self.sort_options[self.sort]
+
+    def _expressions(self):
+        return [f"COALESCE({expr}, ?)" if default is not None else expr
+                for expr, _, default in self.columns]
+
+    def _defaults(self):
+        return [default for _, _, default in self.columns if default is not None]
+
+    def _decode(self, cursor):
+        """Cursor gehört nur zur Sortierung, mit der er erzeugt wurde"""
+        if not cursor:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (ValueError, TypeError, UnicodeDecodeError):
+            return None
+        if not isinstance(data, dict) or not isinstance(data.get('k'), list):
+            return None
+        if (data.get('s') != self.sort or data.get('d') != self.direction
+                or len(data['k']) != len(self.columns)):
+            return None
+        return data['k']
+
+    def _encode(self, row):
+        key = []
+        for _, column, default in self.columns:
+            value = row[column]
+            key.append(default if value is None else value)
+        data = {'s': self.sort, 'd': self.direction, 'k': key}
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def _descending(self):
+        return (self.direction == 'desc') != self.backwards
+
+    def order_by(self):
+        """ORDER BY der aktuellen Seite für eine äußere Query (nur Spalten ohne NULL-Ersatz)"""
+        order = 'DESC' if self._descending() else 'ASC'
+        return ', '.join(f"{expr} {order}" for expr, _, _ in self.columns)
+
+    def apply(self, query, params):
+        """Hängt Keyset-Bedingung, ORDER BY und LIMIT an eine Query mit WHERE an"""
+        expressions = self._expressions()
+        params = list(params)
+        descending = self._descending()
+
+        if self.key is not None:
+            operator = '<' if descending else '>'
+            query += f" AND ({', '.join(expressions)}) {operator} ({', '.join('?' * len(self.key))})"
+            params += self._defaults() + self.key
+
+        order = 'DESC' if descending else 'ASC'
+        query += ' ORDER BY ' + ', '.join(f"{expr} {order}" for expr in expressions)
+        params += self._defaults()
+        query += ' LIMIT ?'
+        params.append(self.per_page + 1)
+        return query, params
+
+    def paginate(self, rows):
+        """Schneidet die Zusatzzeile ab und setzt die Cursor für vor/zurück"""
+        rows = list(rows)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if self.backwards:
+            rows.reverse()
+            self.has_prev, self.has_next = has_more, True
+        else:
+            self.has_prev, self.has_next = self.key is not None, has_more
+        if rows:
+            self.prev_cursor = self._encode(rows[0]) if self.has_prev else None
+            self.next_cursor = self._encode(rows[-1]) if self.has_next else None
+        return rows
+
+    def _url(self, **changes):
+        args = request.args.to_dict()
+        for name in ('after', 'before'):
+            args.pop(name, None)
+        args.update({k: v for k, v in changes.items() if v is not None})
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    def next_url(self):
+        return self._url(after=self.next_cursor) if self.next_cursor else None
+
+    def prev_url(self):
+        return self._url(before=self.prev_cursor) if self.prev_cursor else None
+
+    def sort_url(self, sort):
+        """Gleiche Spalte erneut gewählt: Richtung umkehren"""
+        direction = 'desc' if sort == self.sort and self.direction == 'asc' else 'asc'
+        return self._url(sort=sort, dir=direction)
+
+    def sort_indicator(self, sort):
+        if sort != self.sort:
+            return '↕'
+        return '↑' if self.direction == 'asc' else '↓'
@@ -0,0 +1,221 @@
+"""Optionaler SQL-Profiler: Zeit, Zeilen und Abfrageplan je Statement und Route.
+
+Eingeschaltet wird er mit INVENTAR_SQL_PROFILE=1. Dann liefert
+PooledConnection.execute einen ProfiledCursor, der neben der Ausführung auch
+die Fetches mitmisst und die gelieferten Zeilen zählt. Überschreitet eine
+Ausführung SLOW_MS, wird einmal je Statement und Route der EXPLAIN QUERY PLAN
+festgehalten. Wie bei den Metriken sammelt jeder Prozess im Speicher und
+addiert alle FLUSH_INTERVAL Sekunden auf die Tabelle sql_profile der System-DB.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from flask import has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get('INVENTAR_SQL_PROFILE') == '1'
+SLOW_MS = float(os.environ.get('INVENTAR_SQL_SLOW_MS', 50))
+FLUSH_INTERVAL = 10  # Sekunden zwischen zwei Schreibvorgängen je Prozess
+
+def _endpoint():
+    """Route des laufenden Requests, sonst der Thread (z.B. job-worker-0)"""
+    if has_request_context():
+        return request.endpoint or '<unbekannt>'
+    return f"<{threading.current_thread().name}>"
+
+def _format_plan(rows):
+    """EXPLAIN QUERY PLAN als eingerückter Baum"""
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return '\n'.join(lines)
+
+class _Execution:
+    """Eine Ausführung eines Statements, inklusive der späteren Fetches"""
+    __slots__ = ('key', 'conn', 'sql', 'params', 'seconds', 'slow')
+
+    def __init__(self, key, conn, sql, params):
+        self.key = key
+        self.conn = conn
+        self.sql = sql
+        self.params = params
+        self.seconds = 0.0
+        self.slow = False
+
+class ProfiledCursor:
+    """Hülle um einen sqlite3-Cursor, die Fetch-Zeit und Zeilen mitzählt"""
+
+    def __init__(self, profiler, cursor, execution):
+        self._profiler = profiler
+        self._cursor = cursor
+        self._execution = execution
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def _timed(self, fetch, *args):
+        start = time.perf_counter()
+        result = fetch(*args)
+        self._profiler.add(self._execution, time.perf_counter() - start, rows=result)
+        return result
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+class SqlProfiler:
+    def __init__(self):
+        self.db_path = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def track(self, conn, sql, params, cursor, seconds):
+        """Verbucht eine Ausführung und liefert den Cursor als ProfiledCursor.
+
+        params=None (executemany) verzichtet auf den Abfrageplan.
+        """
+        execution = _Execution((_endpoint(), ' '.join(sql.split())), conn, sql, params)
+        self.add(execution, seconds, calls=1, rows=cursor.rowcount if cursor.rowcount > 0 else 0)
+        return ProfiledCursor(self, cursor, execution)
+
+    def add(self, execution, seconds, calls=0, rows=0):
+        """Zeit und Zeilen einer Ausführung aufaddieren; rows als Zahl, Liste oder Zeile"""
+        if not isinstance(rows, int):
+            rows = len(rows) if isinstance(rows, list) else int(rows is not None)
+        execution.seconds += seconds
+        became_slow = not execution.slow and execution.seconds * 1000 >= SLOW_MS
+        with self._lock:
+            entry = self._pending.setdefault(execution.key, [0, 0.0, 0.0, 0, 0, None])
+            entry[0] += calls
+            entry[1] += seconds
+            entry[2] = max(entry[2], execution.seconds)
+            entry[3] += rows
+            need_plan = became_slow and entry[5] is None
+            if became_slow:
+                entry[4] += 1
+        if became_slow:
+            execution.slow = True
+        if need_plan and execution.params is not None:
+            plan = self._explain(execution)
+            with self._lock:
+                self._pending.setdefault(execution.key, [0, 0.0, 0.0, 0, 0, None])[5] = plan
+
+    @staticmethod
+    def _explain(execution):
+        try:
+            rows = execution.conn.execute(
+                'EXPLAIN QUERY PLAN ' + execution.sql, execution.params).fetchall()
+        except sqlite3.Error as e:
+            return f"Kein Plan: {str(e)}"
+        return _format_plan(rows) or None
+
+    def start(self):
+        """Startet den Schreib-Thread dieses Prozesses (einmal pro Prozess)"""
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._pending = {}
+        threading.Thread(target=self._flush_loop, name="sql-profile-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """Addiert die gesammelten Werte auf sql_profile in der System-DB"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self.db_path is None:
+            return 0
+        try:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                for (endpoint, statement), (calls, seconds, max_seconds, rows, slow, plan) in pending.items():
+                    updated = conn.execute('''
+                        UPDATE sql_profile
+                        SET calls = calls + ?, total_seconds = total_seconds + ?,
+                            max_seconds = MAX(max_seconds, ?), rows = rows + ?,
+                            slow_calls = slow_calls + ?, plan = COALESCE(?, plan),
+                            last_seen = CURRENT_TIMESTAMP
+                        WHERE endpoint = ? AND statement = ?
+                    ''', (calls, seconds, max_seconds, rows, slow, plan, endpoint, statement)).rowcount
+                    if not updated:
+                        conn.execute('''
+                            INSERT INTO sql_profile
+                                (endpoint, statement, calls, total_seconds, max_seconds,
+                                 rows, slow_calls, plan)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ''', (endpoint, statement, calls, seconds, max_seconds, rows, slow, plan))
+                conn.execute('COMMIT')
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # Profildaten sind verzichtbar - verwerfen statt endlos anzusammeln
+            logger.warning(f"SQL-Profil nicht gespeichert: {str(e)}")
+            return 0
+        return len(pending)
+
+    def report(self):
+        """Gespeichertes Profil, nach Route gruppiert und nach Gesamtzeit sortiert"""
+        self.flush()
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute('''
+                SELECT endpoint, statement, calls, total_seconds, max_seconds, rows,
+                       slow_calls, plan, datetime(last_seen, 'localtime') AS last_seen
+                FROM sql_profile
+                ORDER BY total_seconds DESC
+            ''').fetchall()
+        finally:
+            conn.close()
+        endpoints = {}
+        for row in rows:
+            group = endpoints.setdefault(row['endpoint'], {
+                'endpoint': row['endpoint'], 'calls': 0, 'total_seconds': 0.0, 'statements': []})
+            group['calls'] += row['calls']
+            group['total_seconds'] += row['total_seconds']
+            group['statements'].append(dict(row))
+        return sorted(endpoints.values(), key=lambda g: g['total_seconds'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._pending = {}
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        try:
+            conn.execute('DELETE FROM sql_profile')
+        finally:
+            conn.close()
+
+profiler = SqlProfiler()
+
+def init_app(app, db_path):
+    """Profildaten nach db_path schreiben; der Schreib-Thread startet nur, wenn eingeschaltet"""
+    profiler.db_path = db_path
+    if ENABLED:
+        app.before_request(profiler.start)
+        logger.info(f"SQL-Profiler aktiv (langsam ab {SLOW_MS:g} ms)")
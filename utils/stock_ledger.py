@@ -0,0 +1,200 @@
+"""Bestandsbuch für Verbrauchsmaterial: Bewegungen und Stichtagsstände.
+
+Jede Bestandsänderung ist eine Zeile in stock_movements (nur anhängbar, siehe
+DBConfig.STOCK_LEDGER_TRIGGERS). Zum Ende jeder Periode hält stock_snapshots
+den Stand je Artikel fest; ein Stand zu einem Stichtag addiert daher nur die
+Bewegungen seit dem letzten Snapshot statt die ganze Historie.
+
+Alle Funktionen erwarten eine Verbindung zu DBConfig.CONSUMABLES_DB.
+"""
+from datetime import date, datetime, timedelta, timezone
+
+# Stichtage im Abstand von SNAPSHOT_INTERVAL_DAYS, ausgerichtet an SNAPSHOT_EPOCH (Sonntag)
+SNAPSHOT_INTERVAL_DAYS = 7
+SNAPSHOT_EPOCH = date(2000, 1, 2)
+
+# Ein Snapshot umfasst alle Bewegungen bis einschließlich snapshot_date
+SNAPSHOT_SQL = '''
+    INSERT OR REPLACE INTO stock_snapshots (consumable_barcode, snapshot_date, stock)
+    SELECT consumable_barcode, :day, SUM(stock)
+    FROM (
+        SELECT consumable_barcode, stock FROM stock_snapshots
+        WHERE snapshot_date = :previous
+        UNION ALL
+        SELECT consumable_barcode, SUM(delta) FROM stock_movements
+        WHERE created_at >= COALESCE(date(:previous, '+1 day'), '')
+        AND created_at < date(:day, '+1 day')
+        GROUP BY consumable_barcode
+    )
+    GROUP BY consumable_barcode
+'''
+
+STOCK_AS_OF_SQL = '''
+    WITH snapshot AS (
+        SELECT snapshot_date, stock FROM stock_snapshots
+        WHERE consumable_barcode = :barcode AND snapshot_date <= date(:when, '-1 day')
+        ORDER BY snapshot_date DESC
+        LIMIT 1
+    )
+    SELECT COALESCE((SELECT stock FROM snapshot), 0) + COALESCE((
+        SELECT SUM(delta) FROM stock_movements
+        WHERE consumable_barcode = :barcode
+        AND created_at >= COALESCE((SELECT date(snapshot_date, '+1 day') FROM snapshot), '')
+        AND created_at <= :when
+    ), 0)
+'''
+
+STOCK_LEVELS_AS_OF_SQL = '''
+    WITH snapshot AS (
+        SELECT MAX(snapshot_date) AS day FROM stock_snapshots
+        WHERE snapshot_date <= date(:when, '-1 day')
+    )
+    SELECT consumable_barcode, SUM(stock) AS stock
+    FROM (
+        SELECT consumable_barcode, stock FROM stock_snapshots
+        WHERE snapshot_date = (SELECT day FROM snapshot)
+        UNION ALL
+        SELECT consumable_barcode, SUM(delta) FROM stock_movements
+        WHERE created_at >= COALESCE((SELECT date(day, '+1 day') FROM snapshot), '')
+        AND created_at <= :when
+        GROUP BY consumable_barcode
+    )
+    GROUP BY consumable_barcode
+    ORDER BY consumable_barcode
+'''
+
+CONSUMPTION_SQL = '''
+    SELECT consumable_barcode, -SUM(delta) AS amount, COUNT(*) AS movements
+    FROM stock_movements
+    WHERE action = 'checkout'
+    AND created_at >= :start AND created_at <= :end
+    {barcode_filter}
+    GROUP BY consumable_barcode
+    ORDER BY amount DESC
+'''
+
+# Übernahme aus consumables_history; Lücken zwischen zwei Einträgen
+# (Änderungen ohne Historie) werden als 'adjust' davor eingefügt
+BACKFILL_SQL = '''
+    INSERT INTO stock_movements
+    (consumable_barcode, action, delta, worker_barcode, changed_by, created_at)
+    SELECT consumable_barcode, action, delta, worker_barcode, changed_by, created_at
+    FROM (
+        WITH history AS (
+            SELECT *, LAG(new_stock) OVER (
+                PARTITION BY consumable_barcode ORDER BY timestamp, id
+            ) AS previous_stock
+            FROM consumables_history
+        )
+        SELECT consumable_barcode,
+               CASE WHEN previous_stock IS NULL THEN 'opening' ELSE 'adjust' END AS action,
+               old_stock - COALESCE(previous_stock, 0) AS delta,
+               NULL AS worker_barcode, 'backfill' AS changed_by,
+               timestamp AS created_at, id, 0 AS seq
+        FROM history
+        WHERE old_stock != COALESCE(previous_stock, 0)
+        UNION ALL
+        SELECT consumable_barcode, action, new_stock - old_stock,
+               worker_barcode, changed_by, timestamp, id, 1
+        FROM history
+        WHERE new_stock != old_stock
+    )
+    ORDER BY created_at, id, seq
+'''
+
+# Artikel, deren Buchsaldo nicht zum aktuellen Bestand passt
+DRIFT_SQL = '''
+    SELECT c.barcode, COALESCE(l.balance, 0) AS balance,
+           COALESCE(c.aktueller_bestand, 0) AS stock, l.balance IS NULL AS unbooked
+    FROM consumables c
+    LEFT JOIN (
+        SELECT consumable_barcode, SUM(delta) AS balance
+        FROM stock_movements
+        GROUP BY consumable_barcode
+    ) l ON l.consumable_barcode = c.barcode
+    WHERE COALESCE(c.aktueller_bestand, 0) != COALESCE(l.balance, 0)
+'''
+
+def _period_end(day):
+    """Letzter Stichtag am oder vor day"""
+    return day - timedelta(days=(day - SNAPSHOT_EPOCH).days % SNAPSHOT_INTERVAL_DAYS)
+
+def _timestamp(when, end_of_day=True):
+    """Zeitstempel im Format von CURRENT_TIMESTAMP (UTC); ein reines Datum meint Tagesende bzw. -anfang.
+
+    Zeichenketten werden als ISO-Datum bzw. -Zeitstempel gelesen (auch mit T
+    oder Zeitzone); ValueError, wenn das nicht geht - sonst verglichen
+    ungültige Werte als Text still falsch mit created_at.
+    """
+    if isinstance(when, str):
+        if len(when) == 10:
+            when = date.fromisoformat(when)
+        else:
+            when = datetime.fromisoformat(when)
+    if isinstance(when, datetime):
+        if when.tzinfo is not None:
+            when = when.astimezone(timezone.utc).replace(tzinfo=None)
+        return when.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(when, date):
+        when = when.isoformat()
+        return f"{when} 23:59:59" if end_of_day else f"{when} 00:00:00"
+    raise ValueError(f"Kein Datum: {when!r}")
+
+def take_snapshots(conn, until=None):
+    """Schreibt alle fälligen Stichtagsstände bis until (Standard: gestern); liefert deren Anzahl"""
+    until = _period_end(until or datetime.utcnow().date() - timedelta(days=1))
+    previous = conn.execute('SELECT MAX(snapshot_date) FROM stock_snapshots').fetchone()[0]
+    if previous:
+        day = date.fromisoformat(previous) + timedelta(days=SNAPSHOT_INTERVAL_DAYS)
+    else:
+        first = conn.execute('SELECT MIN(created_at) FROM stock_movements').fetchone()[0]
+        if first is None:
+            return 0
+        day = _period_end(date.fromisoformat(first[:10]))
+
+    count = 0
+    while day <= until:
+        conn.execute(SNAPSHOT_SQL, {'day': day.isoformat(), 'previous': previous})
+        previous = day.isoformat()
+        day += timedelta(days=SNAPSHOT_INTERVAL_DAYS)
+        count += 1
+    return count
+
+def rebuild_snapshots(conn, until=None):
+    """Verwirft alle Snapshots und baut sie aus den Bewegungen neu auf"""
+    conn.execute('DELETE FROM stock_snapshots')
+    return take_snapshots(conn, until)
+
+def stock_as_of(conn, barcode, when):
+    """Bestand eines Artikels zum Zeitpunkt when (Datum = Tagesende)"""
+    return conn.execute(STOCK_AS_OF_SQL, {'barcode': barcode, 'when': _timestamp(when)}).fetchone()[0]
+
+def stock_levels_as_of(conn, when):
+    """Bestand aller Artikel zum Zeitpunkt when als {barcode: bestand}"""
+    return {row[0]: row[1] for row in conn.execute(STOCK_LEVELS_AS_OF_SQL, {'when': _timestamp(when)})}
+
+def consumption(conn, start, end, barcode=None):
+    """Ausgegebene Mengen je Artikel im Zeitraum [start, end]"""
+    query = CONSUMPTION_SQL.format(
+        barcode_filter='AND consumable_barcode = :barcode' if barcode else '')
+    params = {'start': _timestamp(start, end_of_day=False), 'end': _timestamp(end), 'barcode': barcode}
+    return [dict(zip(('barcode', 'amount', 'movements'), row)) for row in conn.execute(query, params)]
+
+def find_drift(conn):
+    """Artikel, deren Buchsaldo vom aktuellen Bestand abweicht"""
+    return [dict(zip(('barcode', 'balance', 'stock', 'unbooked'), row)) for row in conn.execute(DRIFT_SQL)]
+
+def reconcile(conn, changed_by='abgleich'):
+    """Gleicht Abweichungen mit einer Korrekturbuchung aus; liefert die Zahl der Buchungen"""
+    drift = find_drift(conn)
+    conn.executemany('''
+        INSERT INTO stock_movements (consumable_barcode, action, delta, changed_by)
+        VALUES (?, ?, ?, ?)
+    ''', [(d['barcode'], 'opening' if d['unbooked'] else 'adjust',
+           d['stock'] - d['balance'], changed_by) for d in drift])
+    return len(drift)
+
+def backfill(conn):
+    """Befüllt ein leeres Bestandsbuch aus consumables_history und gleicht mit dem Bestand ab"""
+    added = conn.execute(BACKFILL_SQL).rowcount
+    return added + reconcile(conn, 'backfill')
@@ -0,0 +1,191 @@
+"""Export einzelner Tabellen als CSV, NDJSON oder Parquet.
+
+Die Zeilen werden seitenweise vom Cursor gelesen. CSV und NDJSON gehen direkt
+in die Antwort; Parquet wird in Zeilengruppen in eine temporäre Datei
+geschrieben, weil das Format am Ende einen Footer mit den Metadaten braucht.
+"""
+import csv
+import io
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import date, timedelta
+
+FETCH_SIZE = 1000
+# Zeilen pro Parquet-Zeilengruppe (begrenzt den Speicherbedarf beim Schreiben)
+PARQUET_ROW_GROUP = 10000
+
+# Format -> (Mimetype, Dateiendung)
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+CSV_DELIMITERS = {',': ',', ';': ';', 'tab': '\t'}
+
+# Spalte für from/to, wenn keine angegeben ist; sonst 'timestamp'
+DATE_COLUMNS = {
+    'lendings': 'checkout_time',
+    'stock_movements': 'created_at',
+}
+
+class ExportError(ValueError):
+    """Ungültige Exportanfrage (unbekannte Tabelle, Spalte, Datum, Format)"""
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _plain(value):
+    """BLOBs als Hex-Text, alles andere unverändert"""
+    return value.hex() if isinstance(value, bytes) else value
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f"Ungültiges Datum für {name}: {value} (erwartet JJJJ-MM-TT)")
+
+def prepare_query(db_path, table, columns=None, start=None, end=None, date_column=None,
+                  allowed_tables=None):
+    """Prüft Tabelle und Spalten und baut die Export-Query.
+
+    start/end sind Daten (JJJJ-MM-TT), beide Tage zählen ganz mit. Mit
+    allowed_tables sind nur diese Tabellen exportierbar. Liefert
+    (sql, params, [(spalte, deklarierter_typ), ...]).
+    """
+    if allowed_tables is not None and table not in allowed_tables:
+        raise ExportError(f"Unbekannte Tabelle: {table}")
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if table not in tables:
+            raise ExportError(f"Unbekannte Tabelle: {table}")
+        available = {row[1]: (row[2] or '') for row in conn.execute(f'PRAGMA table_info({_quote(table)})')}
+    finally:
+        conn.close()
+
+    columns = columns or list(available)
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise ExportError(f"Unbekannte Spalten: {', '.join(unknown)}")
+
+    sql = f"SELECT {', '.join(_quote(c) for c in columns)} FROM {_quote(table)}"
+    params = {}
+    if start or end:
+        date_column = date_column or DATE_COLUMNS.get(table, 'timestamp')
+        if date_column not in available:
+            raise ExportError(f"Tabelle {table} hat keine Datumsspalte {date_column}")
+        # Halboffenes Intervall [start, end + 1 Tag): erfasst auch Zeitstempel
+        # mit Sekundenbruchteilen am letzten Tag, nutzt aber denselben Index wie BETWEEN
+        conditions = []
+        if start:
+            conditions.append(f"{_quote(date_column)} >= :start")
+            params['start'] = _parse_date(start, 'from').isoformat()
+        if end:
+            conditions.append(f"{_quote(date_column)} < :end")
+            params['end'] = (_parse_date(end, 'to') + timedelta(days=1)).isoformat()
+        sql += f" WHERE {' AND '.join(conditions)} ORDER BY {_quote(date_column)}"
+
+    return sql, params, [(c, available[c]) for c in columns]
+
+def count_rows(db_path, sql, params):
+    """Anzahl der Zeilen, die die Export-Query liefert (für Fortschrittsanzeigen)"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+    finally:
+        conn.close()
+
+def _batches(db_path, sql, params, progress=None):
+    """Zeilen in Blöcken zu FETCH_SIZE aus einem Lesesnapshot; progress(zeilen) nach jedem Block"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute('BEGIN')
+        cursor = conn.execute(sql, params)
+        done = 0
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            yield rows
+            done += len(rows)
+            if progress:
+                progress(done)
+    finally:
+        conn.close()
+
+def iter_csv(db_path, sql, params, columns, delimiter=',', progress=None):
+    """CSV mit BOM, damit Excel Umlaute richtig erkennt"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter)
+    buffer.write('\ufeff')
+    writer.writerow([name for name, _ in columns])
+    for rows in _batches(db_path, sql, params, progress):
+        writer.writerows([_plain(v) for v in row] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def iter_ndjson(db_path, sql, params, columns, progress=None):
+    """Ein JSON-Objekt pro Zeile"""
+    names = [name for name, _ in columns]
+    for rows in _batches(db_path, sql, params, progress):
+        yield ''.join(
+            json.dumps(dict(zip(names, map(_plain, row))), ensure_ascii=False) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+def _arrow_type(pa, declared):
+    """Arrow-Typ nach den Affinitätsregeln von SQLite"""
+    declared = declared.upper()
+    if 'INT' in declared:
+        return pa.int64()
+    if any(t in declared for t in ('REAL', 'FLOA', 'DOUB')):
+        return pa.float64()
+    if 'BLOB' in declared:
+        return pa.binary()
+    return pa.string()
+
+def write_parquet(db_path, sql, params, columns, output_dir=None, progress=None):
+    """Schreibt das Ergebnis als Parquet-Datei und liefert deren Pfad"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Parquet-Export benötigt pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([(name, _arrow_type(pa, declared)) for name, declared in columns])
+    # Textspalten nehmen alles auf, was SQLite dort gespeichert hat
+    text = [schema.field(i).type == pa.string() for i in range(len(columns))]
+
+    def to_table(rows):
+        arrays = []
+        for i, field in enumerate(schema):
+            values = [row[i] for row in rows]
+            if text[i]:
+                values = [None if v is None else str(_plain(v)) for v in values]
+            arrays.append(pa.array(values, type=field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    fd, path = tempfile.mkstemp(suffix='.parquet', dir=output_dir)
+    os.close(fd)
+    try:
+        with pq.ParquetWriter(path, schema) as writer:
+            pending = []
+            for rows in _batches(db_path, sql, params, progress):
+                pending.extend(rows)
+                if len(pending) >= PARQUET_ROW_GROUP:
+                    writer.write_table(to_table(pending))
+                    pending = []
+            if pending:
+                writer.write_table(to_table(pending))
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        os.remove(path)
+        raise ExportError(f"Werte passen nicht zum Spaltentyp: {str(e)}")
+    except Exception:
+        os.remove(path)
+        raise
+    return path